@@ -0,0 +1,139 @@
+# Whole-graph summaries computed in bulk passes and stored in the node_degree,
+# node_component and analytics_findings tables (see database.init_db), so reports
+# such as unused fields are indexed reads. refresh() runs after every import.
+
+from array import array
+from typing import Dict, List, Optional
+
+from models import NodeType, EdgeType
+import database
+
+# Report name -> what its rows are; rows are ordered by score, highest first
+REPORTS = {
+    "unused_fields": "Fields no layout object or relationship uses",
+    "unreachable_occurrences": "Table occurrences no layout reaches through relationships",
+    "isolated_nodes": "Nodes without any edge",
+    "hotspots": "Most used nodes, by incoming UsedBy edges",
+}
+
+def refresh() -> Dict[str, int]:
+    # Recomputes everything in one transaction and returns the row count per report
+    with database.session() as conn:
+        for table in ("node_degree", "node_component", "analytics_findings"):
+            conn.execute(f"DELETE FROM {table}")
+
+        # In- and out-degree per node and edge type in one grouped pass over edges
+        conn.execute(
+            "INSERT INTO node_degree (node_id, edge_type, in_degree, out_degree) "
+            "SELECT node_id, type, SUM(inbound), SUM(outbound) FROM ("
+            "SELECT to_id AS node_id, type, 1 AS inbound, 0 AS outbound FROM edges "
+            "UNION ALL SELECT from_id, type, 0, 1 FROM edges"
+            ") GROUP BY node_id, type"
+        )
+        conn.executemany("INSERT INTO node_component (node_id, component) VALUES (?, ?)", _components(conn))
+
+        used_by = EdgeType.USED_BY.value
+        conn.execute(
+            "INSERT INTO analytics_findings (report, node_id, score) "
+            "SELECT 'unused_fields', n.id, 0 FROM nodes n WHERE n.type = ? AND NOT EXISTS ("
+            "SELECT 1 FROM node_degree d WHERE d.node_id = n.id AND d.edge_type = ? AND d.in_degree > 0)",
+            (NodeType.FIELD.value, used_by),
+        )
+        conn.execute(
+            "INSERT INTO analytics_findings (report, node_id, score) "
+            "SELECT 'hotspots', node_id, in_degree FROM node_degree WHERE edge_type = ? AND in_degree > 0",
+            (used_by,),
+        )
+        conn.execute(
+            "INSERT INTO analytics_findings (report, node_id, score) "
+            "SELECT 'isolated_nodes', n.id, 0 FROM nodes n "
+            "WHERE NOT EXISTS (SELECT 1 FROM node_degree d WHERE d.node_id = n.id)"
+        )
+        # Occurrences linked, in either direction, by RelTable -> Relationship -> RelTable
+        # edges, walked from every occurrence a layout is based on
+        conn.execute(
+            "WITH RECURSIVE pairs(a, b) AS ("
+            "SELECT l.from_id, r.to_id FROM edges l "
+            "JOIN nodes rel ON rel.id = l.to_id AND rel.type = :relationship "
+            "JOIN edges r ON r.from_id = rel.id AND r.type = :parent "
+            "WHERE l.type = :parent"
+            "), links(a, b) AS MATERIALIZED ("
+            "SELECT a, b FROM pairs UNION ALL SELECT b, a FROM pairs"
+            "), reached(id) AS ("
+            "SELECT e.from_id FROM edges e JOIN nodes n ON n.id = e.to_id "
+            "WHERE e.type = :used_by AND n.type = :layout "
+            "UNION SELECT links.b FROM reached JOIN links ON links.a = reached.id"
+            ") "
+            "INSERT INTO analytics_findings (report, node_id, score) "
+            "SELECT 'unreachable_occurrences', n.id, 0 FROM nodes n "
+            "WHERE n.type = :rel_table AND n.id NOT IN (SELECT id FROM reached)",
+            {"relationship": NodeType.RELATIONSHIP.value, "parent": EdgeType.PARENT.value, "used_by": used_by,
+             "layout": NodeType.LAYOUT.value, "rel_table": NodeType.REL_TABLE.value},
+        )
+
+        # Pages showing these reports must not be served from caches of the old ones
+        database.bump_version(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) "
+            "SELECT 'analytics_version', value FROM meta WHERE key = 'graph_version'"
+        )
+        counts = dict(conn.execute("SELECT report, COUNT(*) FROM analytics_findings GROUP BY report").fetchall())
+    return {report: counts.get(report, 0) for report in REPORTS}
+
+def _components(conn) -> List[tuple]:
+    # Union-find over all edges, ignoring direction. Each node's component is the
+    # smallest node id in it, so ids stay meaningful between refreshes.
+    ids = array("q", (r[0] for r in conn.execute("SELECT id FROM nodes ORDER BY id")))
+    position = {node_id: i for i, node_id in enumerate(ids)}
+    parent = array("q", range(len(ids)))
+
+    def find(i: int) -> int:
+        root = i
+        while parent[root] != root:
+            root = parent[root]
+        while parent[i] != root:
+            parent[i], i = root, parent[i]
+        return root
+
+    for from_id, to_id in conn.execute("SELECT from_id, to_id FROM edges"):
+        a, b = find(position[from_id]), find(position[to_id])
+        if a != b:
+            # The smaller position (and so the smaller id) becomes the root
+            parent[max(a, b)] = min(a, b)
+    return [(ids[i], ids[find(i)]) for i in range(len(ids))]
+
+def is_stale() -> bool:
+    # True when the graph changed since the last refresh (or there never was one)
+    return database.get_meta("analytics_version") != database.get_meta("graph_version")
+
+def report_counts() -> Dict[str, int]:
+    with database.session() as conn:
+        counts = dict(conn.execute("SELECT report, COUNT(*) FROM analytics_findings GROUP BY report").fetchall())
+    return {report: counts.get(report, 0) for report in REPORTS}
+
+def findings(report: str, type_value: Optional[str] = None, limit: int = 100, offset: int = 0) -> List:
+    # Rows of a report with each node's header and the table or layout it belongs to
+    sql = (
+        "SELECT n.id, n.name, n.type, n.filemaker_id, f.score, ("
+        "SELECT p.name FROM edges e JOIN nodes p ON p.id = e.from_id "
+        "WHERE e.to_id = n.id AND e.type IN (?, ?) ORDER BY e.id LIMIT 1"
+        ") AS owner "
+        "FROM analytics_findings f JOIN nodes n ON n.id = f.node_id WHERE f.report = ?"
+    )
+    params: list = [EdgeType.CONTAINS.value, EdgeType.PARENT.value, report]
+    if type_value:
+        sql += " AND n.type = ?"
+        params.append(type_value)
+    sql += " ORDER BY f.score DESC, n.id LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    with database.session() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def component_sizes(limit: int = 20) -> List:
+    # Largest connected components first, as (component, size)
+    with database.session() as conn:
+        return conn.execute(
+            "SELECT component, COUNT(*) AS size FROM node_component GROUP BY component "
+            "ORDER BY size DESC, component LIMIT ?",
+            (limit,),
+        ).fetchall()
@@ -0,0 +1,231 @@
+# Machine-oriented queries over the graph, shared by the /api/v1 routes in app.py
+# and the MCP tool server (mcp_server.py). Every operation takes batches where it
+# makes sense, returns compact JSON-ready dicts projected to the requested fields,
+# and yields them one by one so large results can be streamed.
+
+import inspect
+import itertools
+import json
+from collections import defaultdict
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import Node, NodeType, EdgeType
+import database
+
+NODE_FIELDS = ("id", "name", "type", "filemaker_id", "details", "attributes")
+DEFAULT_FIELDS = ("id", "name", "type", "filemaker_id")
+
+MAX_BATCH = 1000   # ids per call
+MAX_LIMIT = 1000   # rows per search or traversal page
+MAX_DEPTH = 10
+CHUNK_SIZE = 200   # ids per query while streaming a batch
+
+class ApiError(ValueError):
+    # Invalid arguments; the message is meant for the caller
+    pass
+
+# --- Arguments ---
+# Values arrive either as JSON (lists, numbers) or as query-string text ("1,2,3")
+
+def _list(value: Any, name: str) -> List[Any]:
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [value]
+
+def _ids(value: Any, name: str = "ids") -> List[int]:
+    try:
+        ids = [int(v) for v in _list(value, name)]
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} must be integers")
+    if not ids:
+        raise ApiError(f"{name} is required")
+    if len(ids) > MAX_BATCH:
+        raise ApiError(f"at most {MAX_BATCH} {name} per call")
+    return ids
+
+def _int(value: Any, name: str, default: int, low: int, high: int) -> int:
+    if value is None or value == "":
+        return default
+    try:
+        return min(max(int(value), low), high)
+    except (TypeError, ValueError):
+        raise ApiError(f"{name} must be an integer")
+
+def _fields(value: Any) -> Tuple[str, ...]:
+    fields = tuple(_list(value, "fields")) or DEFAULT_FIELDS
+    unknown = [f for f in fields if f not in NODE_FIELDS]
+    if unknown:
+        raise ApiError(f"unknown fields {unknown}, expected some of {list(NODE_FIELDS)}")
+    return fields
+
+def _node_type(value: Any) -> Optional[NodeType]:
+    if not value:
+        return None
+    try:
+        return NodeType(value)
+    except ValueError:
+        raise ApiError(f"unknown node type {value!r}, expected one of {[t.value for t in NodeType]}")
+
+def _edge_types(value: Any) -> Optional[List[EdgeType]]:
+    try:
+        return [EdgeType(t) for t in _list(value, "edge_types")] or None
+    except ValueError:
+        raise ApiError(f"unknown edge type, expected some of {[t.value for t in EdgeType]}")
+
+def _direction(value: Any, default: str) -> str:
+    direction = value or default
+    if direction not in ("in", "out", "both"):
+        raise ApiError("direction must be one of in, out, both")
+    return direction
+
+# --- Projection ---
+
+def _project(nodes: List[Node], fields: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    attributes: Dict[int, Dict[str, Any]] = defaultdict(dict)
+    if "attributes" in fields and nodes:
+        for r in database.node_attributes_many([n.id for n in nodes]):
+            values = attributes[r["node_id"]]
+            # A key that occurs more than once (e.g. a field on several layouts) becomes a list
+            if r["key"] in values:
+                existing = values[r["key"]]
+                values[r["key"]] = (existing if isinstance(existing, list) else [existing]) + [r["value"]]
+            else:
+                values[r["key"]] = r["value"]
+
+    projected = []
+    for node in nodes:
+        out: Dict[str, Any] = {}
+        for f in fields:
+            if f == "type":
+                out[f] = node.type.value
+            elif f == "details":
+                out[f] = node.details
+            elif f == "attributes":
+                out[f] = attributes.get(node.id, {})
+            else:
+                out[f] = getattr(node, f)
+        projected.append(out)
+    return projected
+
+def _chunks(items: List[Any]) -> Iterator[List[Any]]:
+    for start in range(0, len(items), CHUNK_SIZE):
+        yield items[start:start + CHUNK_SIZE]
+
+# --- Operations ---
+
+def get_nodes(ids: Any, fields: Any = None) -> Iterator[Dict[str, Any]]:
+    # In the order asked for; unknown ids come back as {"id": ..., "missing": true}
+    node_ids, fields = _ids(ids), _fields(fields)
+    for chunk in _chunks(node_ids):
+        nodes = Node.load_many(chunk, with_details="details" in fields)
+        found = dict(zip([n.id for n in nodes.values()], _project(list(nodes.values()), fields)))
+        for node_id in chunk:
+            yield found.get(node_id) or {"id": node_id, "missing": True}
+
+def get_nodes_by_filemaker_id(filemaker_ids: Any, type: Any = None, fields: Any = None) -> Iterator[Dict[str, Any]]:
+    # Every node with one of the FileMaker ids; pass a type, since ids repeat across kinds
+    ids = [str(i) for i in _list(filemaker_ids, "filemaker_ids")]
+    if not ids:
+        raise ApiError("filemaker_ids is required")
+    if len(ids) > MAX_BATCH:
+        raise ApiError(f"at most {MAX_BATCH} filemaker_ids per call")
+    node_type, fields = _node_type(type), _fields(fields)
+    for chunk in _chunks(ids):
+        yield from _project(Node.load_many_by_filemaker_id(chunk, node_type, "details" in fields), fields)
+
+def neighbors(ids: Any, direction: Any = None, edge_types: Any = None, fields: Any = None,
+        ) -> Iterator[Dict[str, Any]]:
+    # One record per id: {"id", "parents": [...], "children": [...]}, each neighbor
+    # projected like a node plus its "edge_type" and "edge_id"
+    node_ids, fields = _ids(ids), _fields(fields)
+    direction = _direction(direction, "both")
+    wanted = set(_edge_types(edge_types) or EdgeType)
+    with_details = "details" in fields
+
+    def listed(grouped, node_id: int) -> List[Dict[str, Any]]:
+        entries = [e for e in grouped.get(node_id, []) if e[1] in wanted]
+        return [
+            dict(projected, edge_type=edge_type.value, edge_id=edge_id)
+            for projected, (_, edge_type, edge_id) in zip(_project([e[0] for e in entries], fields), entries)
+        ]
+
+    for chunk in _chunks(node_ids):
+        parents = Node.parents_of_many(chunk, with_details) if direction in ("in", "both") else {}
+        children = Node.children_of_many(chunk, with_details) if direction in ("out", "both") else {}
+        for node_id in chunk:
+            record: Dict[str, Any] = {"id": node_id}
+            if direction in ("in", "both"):
+                record["parents"] = listed(parents, node_id)
+            if direction in ("out", "both"):
+                record["children"] = listed(children, node_id)
+            yield record
+
+def search(q: Any, type: Any = None, limit: Any = None, offset: Any = None, fields: Any = None,
+        ) -> Iterator[Dict[str, Any]]:
+    # Full-text matches, best first, each with its "snippet" and "rank"
+    if not q or not str(q).strip():
+        raise ApiError("q is required")
+    node_type, fields = _node_type(type), _fields(fields)
+    rows = database.search(str(q), node_type.value if node_type else None,
+                           _int(limit, "limit", 50, 1, MAX_LIMIT), _int(offset, "offset", 0, 0, 2**31))
+    nodes = [Node._from_row(r) for r in rows]
+    if "details" in fields:
+        loaded = Node.load_many([n.id for n in nodes])
+        nodes = [loaded.get(n.id, n) for n in nodes]
+    for projected, r in zip(_project(nodes, fields), rows):
+        yield dict(projected, snippet=r["snippet"], rank=r["rank"])
+
+def traverse(id: Any, direction: Any = None, edge_types: Any = None, max_depth: Any = None,
+             limit: Any = None, offset: Any = None, fields: Any = None) -> Iterator[Dict[str, Any]]:
+    # Nodes reachable from id, nearest first, each with its "depth", the id "path"
+    # that reached it and the "edge_type" of the last step
+    start_id = _ids(id, "id")[0]
+    fields = _fields(fields)
+    node = Node.load(start_id)
+    if node is None:
+        raise ApiError(f"no node with id {start_id}")
+    results = node.traverse(
+        _direction(direction, "out"), _edge_types(edge_types), _int(max_depth, "max_depth", 5, 1, MAX_DEPTH),
+        limit=_int(limit, "limit", MAX_LIMIT, 1, MAX_LIMIT), offset=_int(offset, "offset", 0, 0, 2**31),
+    )
+    for chunk in _chunks(results):
+        for projected, (_, depth, path, edge_type) in zip(_project([r[0] for r in chunk], fields), chunk):
+            yield dict(projected, depth=depth, path=path, edge_type=edge_type.value)
+
+OPERATIONS: Dict[str, Callable[..., Iterator[Dict[str, Any]]]] = {
+    "get_nodes": get_nodes,
+    "get_nodes_by_filemaker_id": get_nodes_by_filemaker_id,
+    "neighbors": neighbors,
+    "search": search,
+    "traverse": traverse,
+}
+
+def call(operation: str, arguments: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    # Runs an operation up to its first record, so bad arguments raise ApiError here
+    # rather than partway through a streamed response
+    fn = OPERATIONS.get(operation)
+    if fn is None:
+        raise ApiError(f"unknown operation {operation!r}, expected one of {sorted(OPERATIONS)}")
+    try:
+        inspect.signature(fn).bind(**arguments)
+    except TypeError as e:
+        raise ApiError(f"bad arguments for {operation}: {e}")
+    records = fn(**arguments)
+    try:
+        first = next(records)
+    except StopIteration:
+        return iter(())
+    return itertools.chain([first], records)
+
+# --- Encoding ---
+
+def dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+def ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    for record in records:
+        yield dumps(record) + "\n"
@@ -1,11 +1,22 @@
 # app.py
-from flask import Flask, render_template_string, request, abort, url_for
+from flask import Flask, Response, g, render_template, request, abort, url_for, jsonify
+import analytics
+import api
 import database
-from models import Node
+from models import Node, EdgeType
+from page_cache import PageCache
+from snapshot import GraphSnapshot
 from collections import defaultdict
+import os
 
 database.init_db()  # no reset; use your parser first to populate
 
+# With GRAPH_SNAPSHOT=1 (or --snapshot) node pages are served from an in-memory copy
+# of the graph that reloads itself whenever the database changes
+graph = GraphSnapshot() if os.environ.get("GRAPH_SNAPSHOT") else None
+# Snapshots of solution databases (see select_solution), created on first use
+solution_graphs: dict = {}
+
 app = Flask(__name__)
 
 BASE_HTML = """
@@ -27,8 +38,19 @@ BASE_HTML = """
   </style>
 </head>
 <body>
+  {% if solutions %}
+  <div class="row muted">
+    Solution:
+    <a href="{{ url_for('index', solution='') }}">{% if not solution %}<b>default</b>{% else %}default{% endif %}</a>
+    {% for s in solutions %}
+      · <a href="{{ url_for('index', solution=s) }}">{% if s == solution %}<b>{{ s }}</b>{% else %}{{ s }}{% endif %}</a>
+    {% endfor %}
+  </div>
+  {% endif %}
+
   <form action="{{ url_for('index') }}" method="get" class="row">
-    <input type="text" name="q" placeholder="Search by name..." value="{{ q or '' }}">
+    {% if solution %}<input type="hidden" name="solution" value="{{ solution }}">{% endif %}
+    <input type="text" name="q" placeholder='Search, e.g. invoice* or "due date"' value="{{ q or '' }}">
     <button>Search</button>
     <a class="muted" href="{{ url_for('index') }}" style="margin-left:8px;">clear</a>
   </form>
@@ -37,6 +59,9 @@ BASE_HTML = """
     <a href="{{ url_for('index') }}">
         <button type="button">← Back to Index</button>
     </a>
+    <a href="{{ url_for('report_page', report='unused_fields') }}" style="margin-left:8px;">Unused fields</a>
+    <a href="{{ url_for('report_page', report='unreachable_occurrences') }}" style="margin-left:8px;">Unreachable occurrences</a>
+    <a href="{{ url_for('report_page', report='hotspots') }}" style="margin-left:8px;">Hotspots</a>
   </div>
 
   {{ body|safe }}
@@ -51,6 +76,10 @@ NODE_HTML = """
   <span class="muted">#{{ node.id }}</span>
 </h2>
 
+<div class="row">
+  <a href="{{ url_for('impact_page', node_id=node.id) }}">Impact analysis →</a>
+</div>
+
 <h3>Details</h3>
 <pre>{{ node.details | tojson(indent=2) }}</pre>
 
@@ -87,7 +116,46 @@ NODE_HTML = """
 
 INDEX_HTML = """
 <h2>Nodes</h2>
-{% if grouped %}
+{% if counts %}
+  {% for t, count in counts.items() %}
+    <details class="type-group" data-type="{{ t }}">
+      <summary><h3 style="display:inline">{{ t }} <span class="muted">({{ count }})</span></h3></summary>
+      <ul></ul>
+      <button type="button" class="more" hidden>Load more</button>
+    </details>
+  {% endfor %}
+  <script>
+    // Groups load a page at a time from /api/nodes when opened
+    async function loadPage(group) {
+      const params = new URLSearchParams({type: group.dataset.type, after: group.dataset.after || 0});
+      const res = await fetch("{{ url_for('api_nodes') }}?" + params);
+      const page = await res.json();
+      const list = group.querySelector("ul");
+      for (const n of page.nodes) {
+        const li = document.createElement("li");
+        const a = document.createElement("a");
+        a.href = n.url;
+        a.textContent = n.name;
+        const id = document.createElement("span");
+        id.className = "muted";
+        id.textContent = " #" + n.id;
+        li.append(a, id);
+        list.append(li);
+      }
+      group.dataset.after = page.next_after || "";
+      group.querySelector(".more").hidden = !page.next_after;
+    }
+    for (const group of document.querySelectorAll(".type-group")) {
+      group.addEventListener("toggle", () => {
+        if (group.open && !group.dataset.loaded) {
+          group.dataset.loaded = "1";
+          loadPage(group);
+        }
+      });
+      group.querySelector(".more").addEventListener("click", () => loadPage(group));
+    }
+  </script>
+{% elif grouped %}
   {% for t, group in grouped.items() %}
     <h3>{{ t }} <span class="muted">({{ group|length }})</span></h3>
     <ul>
@@ -95,6 +163,7 @@ INDEX_HTML = """
       <li>
         <a href="{{ url_for('node_page', node_id=r['id']) }}">{{ r['name'] }}</a>
         <span class="muted">#{{ r['id'] }}</span>
+        {% if r['snippet'] %}<span class="muted">— {{ r['snippet'] }}</span>{% endif %}
       </li>
     {% endfor %}
     </ul>
@@ -104,33 +173,360 @@ INDEX_HTML = """
 {% endif %}
 """
 
+IMPACT_HTML = """
+<h2>
+  Impact of <a href="{{ url_for('node_page', node_id=node.id) }}">{{ node.name }}</a>
+  <span class="pill">{{ node.type.value }}</span>
+</h2>
+
+<form action="{{ url_for('impact_page', node_id=node.id) }}" method="get" class="row">
+  <select name="direction">
+    {% for d, label in [("in", "Depends on this (parents)"), ("out", "Under this (children)"), ("both", "Both")] %}
+      <option value="{{ d }}" {% if d == direction %}selected{% endif %}>{{ label }}</option>
+    {% endfor %}
+  </select>
+  <input type="text" name="types" placeholder="Edge types, e.g. UsedBy,Parent" value="{{ types }}">
+  <input type="number" name="depth" min="1" max="{{ max_depth }}" value="{{ depth }}">
+  <button>Walk</button>
+</form>
+
+{% if results %}
+  <ul>
+  {% for n, d, path, rel in results %}
+    <li>
+      <a href="{{ url_for('node_page', node_id=n.id) }}">{{ n.name }}</a>
+      <span class="pill">{{ n.type.value }}</span>
+      <span class="pill">{{ rel.value }}</span>
+      <span class="muted">depth {{ d }} · path {{ path|join(" → ") }}</span>
+    </li>
+  {% endfor %}
+  </ul>
+{% else %}
+  <div class="muted">Nothing reachable.</div>
+{% endif %}
+
+<div class="row">
+  {% if page > 1 %}
+    <a href="{{ url_for('impact_page', node_id=node.id, direction=direction, types=types, depth=depth, page=page - 1) }}">← Previous</a>
+  {% endif %}
+  {% if has_next %}
+    <a href="{{ url_for('impact_page', node_id=node.id, direction=direction, types=types, depth=depth, page=page + 1) }}" style="margin-left:8px;">Next →</a>
+  {% endif %}
+</div>
+"""
+
+REPORT_HTML = """
+<h2>{{ description }} <span class="pill">{{ total }}</span></h2>
+{% if stale %}
+  <div class="muted row">The graph changed since these were computed; re-run the import to refresh them.</div>
+{% endif %}
+
+<form action="{{ url_for('report_page', report=report) }}" method="get" class="row">
+  <input type="text" name="type" placeholder="Node type, e.g. Field" value="{{ type_value or '' }}">
+  <button>Filter</button>
+</form>
+
+{% if rows %}
+  <ul>
+  {% for r in rows %}
+    <li>
+      <a href="{{ url_for('node_page', node_id=r['id']) }}">{{ r['name'] }}</a>
+      <span class="pill">{{ r['type'] }}</span>
+      {% if r['owner'] %}<span class="muted">in {{ r['owner'] }}</span>{% endif %}
+      {% if r['score'] %}<span class="pill">{{ r['score']|int }}</span>{% endif %}
+    </li>
+  {% endfor %}
+  </ul>
+{% else %}
+  <div class="muted">Nothing to report.</div>
+{% endif %}
+
+<div class="row">
+  {% if page > 1 %}
+    <a href="{{ url_for('report_page', report=report, type=type_value, page=page - 1) }}">← Previous</a>
+  {% endif %}
+  {% if has_next %}
+    <a href="{{ url_for('report_page', report=report, type=type_value, page=page + 1) }}" style="margin-left:8px;">Next →</a>
+  {% endif %}
+</div>
+"""
+
+# Compiled once here; render_template_string would compile them again on every render
+BASE_TEMPLATE = app.jinja_env.from_string(BASE_HTML)
+NODE_TEMPLATE = app.jinja_env.from_string(NODE_HTML)
+INDEX_TEMPLATE = app.jinja_env.from_string(INDEX_HTML)
+IMPACT_TEMPLATE = app.jinja_env.from_string(IMPACT_HTML)
+REPORT_TEMPLATE = app.jinja_env.from_string(REPORT_HTML)
+
+NODE_PAGE_SIZE = 500
+SEARCH_PAGE_SIZE = 200
+IMPACT_PAGE_SIZE = 100
+IMPACT_MAX_DEPTH = 10
+REPORT_PAGE_SIZE = 200
+
+# Rendered responses per database, reused until its graph version changes
+PAGE_CACHE_SIZE = 1000
+page_cache = PageCache(PAGE_CACHE_SIZE)
+
+# Responses that do not depend on the graph, so they get no validators and no caching
+UNCACHED_ENDPOINTS = {"api_cache"}
+
+# Responses whose type follows the Accept header; their ETags and cache entries are
+# kept per negotiated type, and they carry Vary: Accept
+NEGOTIATED_ENDPOINTS = {"api_v1"}
+
+# Optional: stable order of sections
+TYPE_ORDER = ["BaseTable", "Field", "RelTable", "Relationship", "Account", "Unknown"]
+
+def _in_type_order(by_type: dict) -> dict:
+    return {t: by_type[t] for t in TYPE_ORDER if t in by_type} | {t: v for t, v in by_type.items() if t not in TYPE_ORDER}
+
+@app.before_request
+def select_solution():
+    # ?solution=<name> serves that solution's database instead of the default one;
+    # links on its pages keep the parameter (see keep_solution)
+    name = request.args.get("solution")
+    if not name:
+        return None
+    try:
+        db_path = database.solution_path(name)
+    except ValueError:
+        abort(404)
+    if not os.path.exists(db_path):
+        abort(404)
+    g.solution = name
+    g.database = database.use_database(db_path)
+    g.database.__enter__()
+    return None
+
+@app.teardown_request
+def release_solution(exc) -> None:
+    if "database" in g:
+        g.database.__exit__(None, None, None)
+
+@app.url_defaults
+def keep_solution(endpoint: str, values: dict) -> None:
+    if g.get("solution") and "solution" not in values:
+        values["solution"] = g.solution
+
+@app.context_processor
+def solution_context() -> dict:
+    return {"solution": g.get("solution"), "solutions": database.list_solutions()}
+
+def current_graph():
+    # The snapshot of the database this request reads, when snapshots are enabled
+    if graph is None or not g.get("solution"):
+        return graph
+    db_path = database.current_db_path()
+    return solution_graphs.setdefault(db_path, GraphSnapshot(db_path))
+
+def _variant() -> str:
+    # The response type this request negotiated, when its endpoint negotiates one
+    if request.endpoint in NEGOTIATED_ENDPOINTS and request.accept_mimetypes.best == "application/x-ndjson":
+        return "-ndjson"
+    return ""
+
+@app.before_request
+def serve_from_cache():
+    # Every page is a function of the graph version, so the version is the ETag and
+    # its time the Last-Modified; a matching conditional request skips rendering
+    if request.method not in ("GET", "HEAD") or request.endpoint in UNCACHED_ENDPOINTS:
+        return None
+    g.graph_version, g.graph_modified = database.graph_version()
+    g.etag = f"g{g.graph_version}{_variant()}"
+    if request.if_none_match:
+        if request.if_none_match.contains(g.etag):
+            return Response(status=304)
+    elif request.if_modified_since is not None and int(g.graph_modified) <= request.if_modified_since.timestamp():
+        return Response(status=304)
+
+    cached = page_cache.get((request.full_path, _variant()), g.graph_version, database.current_db_path())
+    if cached is not None:
+        g.cached = True
+        body, mimetype = cached
+        return Response(body, mimetype=mimetype)
+    return None
+
+@app.after_request
+def add_validators(response: Response) -> Response:
+    version = g.get("graph_version")
+    if version is None:
+        return response
+    response.set_etag(g.etag)
+    if request.endpoint in NEGOTIATED_ENDPOINTS:
+        response.vary.add("Accept")
+    if g.graph_modified:
+        response.last_modified = g.graph_modified
+    # Browsers may keep the page but must revalidate it, which is a cheap 304
+    response.cache_control.no_cache = True
+    if response.status_code == 200 and not g.get("cached") and not response.is_streamed:
+        page_cache.put((request.full_path, _variant()), version, (response.get_data(), response.mimetype),
+                       database.current_db_path())
+    return response
+
+@app.route("/api/cache")
+def api_cache():
+    return jsonify(page_cache.stats())
+
 @app.route("/")
 def index():
     q = request.args.get("q", "").strip()
-    rows = database.node_find("name LIKE ?", (f"%{q}%",)) if q else database.node_find()
+    if not q:
+        # Only the per-type counts are rendered; each group's nodes load on demand
+        counts = _in_type_order({r["type"]: r["count"] for r in database.node_type_counts()})
+        body = render_template(INDEX_TEMPLATE, counts=counts)
+        return render_template(BASE_TEMPLATE, title="Graph Browser", q=q, body=body)
+
+    rows = database.search(q, limit=SEARCH_PAGE_SIZE)
 
     # Group by type
     grouped = defaultdict(list)
     for r in rows:
         grouped[r["type"]].append(r)
+    grouped = _in_type_order(grouped)
 
-    # Optional: stable order of sections
-    order = ["BaseTable", "Field", "RelTable", "Relationship", "Account", "Unknown"]
-    grouped = {t: grouped[t] for t in order if t in grouped} | {t: v for t, v in grouped.items() if t not in order}
+    body = render_template(INDEX_TEMPLATE, grouped=grouped)
+    return render_template(BASE_TEMPLATE, title="Graph Browser", q=q, body=body)
 
-    body = render_template_string(INDEX_HTML, grouped=grouped)
-    return render_template_string(BASE_HTML, title="Graph Browser", q=q, body=body)
 
+@app.route("/api/nodes")
+def api_nodes():
+    type_value = request.args.get("type", "")
+    after = max(request.args.get("after", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", NODE_PAGE_SIZE, type=int), 1), NODE_PAGE_SIZE)
+    rows = database.node_headers_by_type(type_value, after, limit)
+    return jsonify(
+        type=type_value,
+        nodes=[{
+            "id": r["id"],
+            "name": r["name"],
+            "url": url_for("node_page", node_id=r["id"]),
+        } for r in rows],
+        next_after=rows[-1]["id"] if len(rows) == limit else None,
+    )
+
+
+@app.route("/api/search")
+def api_search():
+    q = request.args.get("q", "").strip()
+    limit = min(max(request.args.get("limit", 50, type=int), 1), SEARCH_PAGE_SIZE)
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    rows = database.search(q, request.args.get("type") or None, limit, offset)
+    return jsonify(
+        q=q,
+        offset=offset,
+        results=[{
+            "id": r["id"],
+            "name": r["name"],
+            "type": r["type"],
+            "filemaker_id": r["filemaker_id"],
+            "snippet": r["snippet"],
+            "rank": r["rank"],
+        } for r in rows],
+    )
+
+
+@app.route("/api/v1/<operation>", methods=["GET", "POST"])
+def api_v1(operation: str):
+    # The operations in api.OPERATIONS. Arguments come from the query string or, for
+    # batches too long for a URL, a JSON object body. With stream=1 (or Accept:
+    # application/x-ndjson) records are sent one JSON object per line as they are read.
+    if operation not in api.OPERATIONS:
+        abort(404)
+    arguments = request.args.to_dict()
+    arguments.pop("solution", None)  # chosen by select_solution
+    if request.method == "POST":
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify(error="expected a JSON object body"), 400
+        arguments.update(body)
+    stream = str(arguments.pop("stream", "")).lower() in ("1", "true") \
+        or request.accept_mimetypes.best == "application/x-ndjson"
+    try:
+        records = api.call(operation, arguments)
+    except api.ApiError as e:
+        return jsonify(error=str(e)), 400
+    if stream:
+        # The rest is read after this request's context is gone, so name its database
+        db_path = database.current_db_path()
+
+        def scoped():
+            with database.use_database(db_path):
+                yield from api.ndjson(records)
+
+        return Response(scoped(), mimetype="application/x-ndjson")
+    return Response(api.dumps({"results": list(records)}), mimetype="application/json")
 
 @app.route("/node/<int:node_id>")
 def node_page(node_id: int):
-    node = Node.load(node_id)
+    snapshot = current_graph()
+    if snapshot is not None:
+        node, parents, children = snapshot.node_view(node_id)
+    else:
+        # The three reads are independent, so they run side by side. Neighbor lists
+        # only show names, so their details are never read.
+        node, parents, children = database.run_concurrently(
+            lambda: Node.load(node_id),
+            lambda: Node.parents_of_many([node_id], with_details=False)[node_id],   # [(Node, EdgeType, edge_id)]
+            lambda: Node.children_of_many([node_id], with_details=False)[node_id],  # [(Node, EdgeType, edge_id)]
+        )
+    if not node:
+        abort(404)
+    body = render_template(NODE_TEMPLATE, node=node, parents=parents, children=children)
+    return render_template(BASE_TEMPLATE, title=node.name, q="", body=body)
+
+@app.route("/node/<int:node_id>/impact")
+def impact_page(node_id: int):
+    snapshot = current_graph()
+    node = snapshot.load(node_id) if snapshot is not None else Node.load(node_id)
     if not node:
         abort(404)
-    parents = node.get_parents()    # [(Node, EdgeType, edge_id)]
-    children = node.get_children()  # [(Node, EdgeType, edge_id)]
-    body = render_template_string(NODE_HTML, node=node, parents=parents, children=children)
-    return render_template_string(BASE_HTML, title=node.name, q="", body=body)
+
+    direction = request.args.get("direction", "in")
+    if direction not in ("in", "out", "both"):
+        abort(400)
+    types = request.args.get("types", "").strip()
+    try:
+        edge_types = [EdgeType(t.strip()) for t in types.split(",") if t.strip()]
+    except ValueError:
+        abort(400)
+    depth = min(max(request.args.get("depth", 5, type=int), 1), IMPACT_MAX_DEPTH)
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    # Fetch one extra row to know whether there is a next page
+    window = dict(limit=IMPACT_PAGE_SIZE + 1, offset=(page - 1) * IMPACT_PAGE_SIZE)
+    if snapshot is not None:
+        results = snapshot.traverse(node.id, direction, edge_types, depth, **window)
+    else:
+        results = node.traverse(direction, edge_types, depth, **window)
+    has_next = len(results) > IMPACT_PAGE_SIZE
+
+    body = render_template(
+        IMPACT_TEMPLATE, node=node, results=results[:IMPACT_PAGE_SIZE], direction=direction,
+        types=types, depth=depth, max_depth=IMPACT_MAX_DEPTH, page=page, has_next=has_next,
+    )
+    return render_template(BASE_TEMPLATE, title=f"Impact · {node.name}", q="", body=body)
+
+@app.route("/reports/<report>")
+def report_page(report: str):
+    if report not in analytics.REPORTS:
+        abort(404)
+    type_value = request.args.get("type", "").strip() or None
+    page = max(request.args.get("page", 1, type=int), 1)
+
+    # Fetch one extra row to know whether there is a next page
+    rows = analytics.findings(report, type_value, limit=REPORT_PAGE_SIZE + 1, offset=(page - 1) * REPORT_PAGE_SIZE)
+    has_next = len(rows) > REPORT_PAGE_SIZE
+
+    body = render_template(
+        REPORT_TEMPLATE, report=report, description=analytics.REPORTS[report],
+        total=analytics.report_counts()[report], stale=analytics.is_stale(),
+        rows=rows[:REPORT_PAGE_SIZE], type_value=type_value, page=page, has_next=has_next,
+    )
+    return render_template(BASE_TEMPLATE, title=analytics.REPORTS[report], q="", body=body)
 
 if __name__ == "__main__":
+    import sys
+    if "--snapshot" in sys.argv[1:]:
+        graph = GraphSnapshot()
     app.run(debug=True, port=5000)
@@ -0,0 +1,130 @@
+# ASGI entry point for the graph browser, e.g. with uvicorn:
+#
+#   uvicorn asgi:application --port 5000
+#
+# The Flask app itself stays WSGI. Each request runs on a worker thread, with its own
+# thread-local database connection, while the event loop keeps accepting connections,
+# so a slow page no longer holds up the others.
+
+import asyncio
+import io
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from app import app
+
+REQUEST_THREADS = 32
+_executor = ThreadPoolExecutor(REQUEST_THREADS, thread_name_prefix="request")
+
+def _environ(scope: Dict[str, Any], body: bytes) -> Dict[str, Any]:
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf8").decode("latin1"),
+        "PATH_INFO": scope["path"].encode("utf8").decode("latin1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin1").upper().replace("-", "_")
+        value = value.decode("latin1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+# Chunks held between the worker thread producing a response and the event loop
+# sending it; a slow client makes the worker wait instead of buffering the body
+STREAM_BUFFER = 16
+
+class _Abandoned(Exception):
+    pass
+
+def _call_app(environ: Dict[str, Any], put: Callable[[Any], None]) -> None:
+    # Runs the app on this worker thread and hands over (status, headers) and then
+    # each body chunk as the app yields it. Iterating on one thread keeps the
+    # response's thread-local database selection and connection in place.
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        put((int(status.split(" ", 1)[0]), [(k.lower().encode("latin1"), v.encode("latin1")) for k, v in headers]))
+        return put
+
+    try:
+        result = app(environ, start_response)
+        try:
+            for chunk in result:
+                if chunk:
+                    put(chunk)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    except _Abandoned:
+        pass
+    finally:
+        try:
+            put(None)
+        except _Abandoned:
+            pass
+
+async def application(scope: Dict[str, Any], receive, send) -> None:
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                _executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(STREAM_BUFFER)
+    abandoned = threading.Event()
+
+    def put(item: Any) -> None:
+        if abandoned.is_set():
+            raise _Abandoned()
+        asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+
+    worker = loop.run_in_executor(_executor, _call_app, _environ(scope, body), put)
+    try:
+        started = await queue.get()
+        if started is None:
+            # The app failed before starting a response; its error comes from the worker
+            await worker
+            return
+        status, headers = started
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        # Each chunk goes out as the app produces it, so streamed responses stay streamed
+        while (chunk := await queue.get()) is not None:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        if not worker.done():
+            # The client went away: stop the app at its next chunk
+            abandoned.set()
+            while not queue.empty():
+                queue.get_nowait()
+        await worker
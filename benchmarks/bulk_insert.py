@@ -0,0 +1,59 @@
+# Compares rows/sec of the per-row node_insert/edge_insert path against bulk_insert()
+#
+#   python -m benchmarks.bulk_insert --tables 50 --fields 100
+
+import argparse
+import os
+import tempfile
+import time
+
+import database
+
+def synthetic_rows(tables: int, fields: int):
+    # BaseTable -> Field shaped rows, like a BaseTableCatalog import
+    for t in range(tables):
+        table = {"@id": str(t), "@name": f"Table {t}"}
+        yield "BaseTable", table, [
+            {"@id": str(f), "@name": f"Field {f}", "@dataType": "Text", "@fieldType": "Normal"}
+            for f in range(fields)
+        ]
+
+def load(tables: int, fields: int) -> int:
+    rows = 0
+    for _, table, table_fields in synthetic_rows(tables, fields):
+        table_id = database.node_insert(table["@name"], "BaseTable", table, table["@id"])
+        rows += 1
+        for field in table_fields:
+            field_id = database.node_insert(field["@name"], "Field", field, field["@id"])
+            database.edge_insert("Contains", table_id, field_id)
+            rows += 2
+    return rows
+
+def run(label: str, tables: int, fields: int, bulk: bool) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "graph.db")
+        database.init_db(reset=True, db_path=database.DB_PATH)
+
+        start = time.perf_counter()
+        if bulk:
+            with database.bulk_insert():
+                rows = load(tables, fields)
+        else:
+            rows = load(tables, fields)
+        elapsed = time.perf_counter() - start
+        database.close_connections()
+        print(f"{label:<10} {rows:>9} rows  {elapsed:8.2f}s  {rows / elapsed:12.0f} rows/sec")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=50)
+    parser.add_argument("--fields", type=int, default=100, help="fields per table")
+    parser.add_argument("--per-row-tables", type=int, default=5,
+                        help="tables for the per-row run, which is much slower")
+    args = parser.parse_args()
+
+    run("per-row", args.per_row_tables, args.fields, bulk=False)
+    run("bulk", args.tables, args.fields, bulk=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+# Helpers shared by the benchmarks
+
+def percentile(samples, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
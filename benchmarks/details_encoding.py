@@ -0,0 +1,73 @@
+# DB size, stored details size, import time and node load latency for each details
+# encoding, on a generated Design Report imported with parser-old.py, so the details
+# are the field, layout and layout object payloads a real import stores
+#
+#   python -m benchmarks.details_encoding --nodes 100000
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import database
+from models import Node
+from benchmarks.common import percentile
+from benchmarks.generate_report import sizes_for_nodes, write_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run(encoding: str, xml: str, tmp: str, samples: int) -> dict:
+    db = os.path.join(tmp, f"{encoding}.db")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "parser-old.py"), xml, "--db", db, "--details-encoding", encoding],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+    import_time = time.perf_counter() - start
+
+    with database.use_database(db):
+        with database.session() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            max_id = conn.execute("SELECT MAX(id) FROM nodes").fetchone()[0]
+            details = conn.execute("SELECT SUM(length(details)) FROM nodes").fetchone()[0]
+        size = os.path.getsize(db)
+
+        rng = random.Random(7)
+        latencies = []
+        for _ in range(samples):
+            node_id = rng.randint(1, max_id)
+            t0 = time.perf_counter()
+            Node.load(node_id).details
+            latencies.append((time.perf_counter() - t0) * 1000)
+    database.close_connections()
+
+    return {"size": size, "details": details, "import": import_time,
+            "p50": statistics.median(latencies), "p99": percentile(latencies, 99)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=20000, help="approximate nodes in the generated report")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--encodings", default=",".join(
+        e for e in database.DETAILS_ENCODINGS if e != "zstd" or database.zstandard is not None))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml = os.path.join(tmp, "report.xml")
+        with open(xml, "w", encoding="utf-8") as out:
+            counts = write_report(out, **sizes_for_nodes(args.nodes))
+        print(f"report: {sum(counts.values())} nodes, {os.path.getsize(xml) / 2**20:.1f} MB")
+        baseline = None
+        for encoding in args.encodings.split(","):
+            r = run(encoding, xml, tmp, args.samples)
+            baseline = baseline or r["details"]
+            print(f"{encoding:<6} {r['size'] / 2**20:9.1f} MB  details {r['details'] / 2**20:7.1f} MB "
+                  f"({r['details'] / baseline:6.1%})  import {r['import']:7.2f}s  "
+                  f"load p50 {r['p50']:6.3f} ms  p99 {r['p99']:6.3f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+# Writes a synthetic FileMaker Design Report with the sections mapping.json reads,
+# shaped like a real one: base tables with fields, several table occurrences per
+# table joined by relationships, and layouts with field objects, some in portals.
+#
+#   python -m benchmarks.generate_report data/Synthetic.xml --nodes 100000
+#   python -m benchmarks.generate_report data/Synthetic.xml --tables 50 --fields 100 --layouts 200
+
+import argparse
+import random
+from typing import Dict, IO
+from xml.sax.saxutils import escape, quoteattr
+
+def sizes_for_nodes(nodes: int) -> Dict[str, int]:
+    # Per base table: 40 fields, 2 extra occurrences, 2 relationships and 1 layout of
+    # 150 objects, i.e. about 200 nodes; gives roughly the requested total
+    tables = max(1, round(nodes / 200))
+    return {"tables": tables, "fields": 40, "occurrences": 3, "relationships": 2 * tables,
+            "layouts": tables, "objects": 150}
+
+def _attrs(**attrs: object) -> str:
+    return "".join(f" {k.rstrip('_')}={quoteattr(str(v))}" for k, v in attrs.items())
+
+def write_report(out: IO[str], tables: int, fields: int, occurrences: int, relationships: int,
+                 layouts: int, objects: int, portal_every: int = 10, seed: int = 1) -> Dict[str, int]:
+    # Writes straight to out, so the report can be far larger than memory. Returns
+    # the number of nodes an import of it creates, by type.
+    rng = random.Random(seed)
+    counts = {"BaseTable": tables, "Field": tables * fields, "RelTable": 0,
+              "Relationship": 0, "Layout": layouts, "LayoutObject": 0}
+
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    out.write('<FMPReport link="Summary.xml" type="Report" version="21.0.1">\n')
+    out.write(' <File name="Synthetic.fmp12" path="/Synthetic.fmp12">\n')
+
+    out.write("  <BaseTableCatalog>\n")
+    for t in range(1, tables + 1):
+        out.write(f"   <BaseTable{_attrs(id=t, name=f'Table{t}', records=rng.randint(0, 100000))}>\n")
+        out.write("    <FieldCatalog>\n")
+        for f in range(1, fields + 1):
+            field_type = "Calculated" if f % 7 == 0 else "Normal"
+            out.write(f"     <Field{_attrs(id=f, name=f'Field{f}', dataType=rng.choice(['Text', 'Number', 'Date']), fieldType=field_type)}>\n")
+            out.write(f"      <Storage{_attrs(autoIndex='True', index='None', global_='False', maxRepetition=1)}/>\n")
+            if field_type == "Calculated":
+                out.write(f"      <Calculation{_attrs(table=f'Table{t}')}><Text>{escape(f'Field{f - 1} & Get ( CurrentDate )')}</Text></Calculation>\n")
+            out.write("     </Field>\n")
+        out.write("    </FieldCatalog>\n")
+        out.write("   </BaseTable>\n")
+    out.write("  </BaseTableCatalog>\n")
+    out.write("  <BaseDirectoryCatalog/>\n")
+
+    # Occurrence 0 of each table is named like the table; the others get suffixes
+    occurrence_names = []
+    out.write("  <RelationshipGraph>\n   <TableList>\n")
+    next_id = 1065001
+    for t in range(1, tables + 1):
+        for o in range(occurrences):
+            name = f"Table{t}" if o == 0 else f"Table{t}_{o}"
+            out.write(f"    <Table{_attrs(id=next_id, name=name, baseTable=f'Table{t}', baseTableId=t)}/>\n")
+            occurrence_names.append((next_id, name, t))
+            next_id += 1
+    counts["RelTable"] = len(occurrence_names)
+    out.write("   </TableList>\n   <RelationshipList>\n")
+    for r in range(1, relationships + 1 if len(occurrence_names) > 1 else 1):
+        (_, left, left_table), (_, right, right_table) = rng.sample(occurrence_names, 2)
+        left_field, right_field = rng.randint(1, fields), rng.randint(1, fields)
+        out.write(f"    <Relationship{_attrs(id=r)}>\n")
+        out.write(f"     <LeftTable{_attrs(name=left)}/>\n     <RightTable{_attrs(name=right)}/>\n")
+        out.write("     <JoinPredicateList>\n")
+        out.write(f"      <JoinPredicate{_attrs(type='Equal')}>\n")
+        out.write(f"       <LeftField><Field{_attrs(table=left, id=left_field, name=f'Field{left_field}')}/></LeftField>\n")
+        out.write(f"       <RightField><Field{_attrs(table=right, id=right_field, name=f'Field{right_field}')}/></RightField>\n")
+        out.write("      </JoinPredicate>\n     </JoinPredicateList>\n    </Relationship>\n")
+        counts["Relationship"] += 1
+    out.write("   </RelationshipList>\n  </RelationshipGraph>\n")
+
+    def field_object(key: int, occurrence: str) -> str:
+        f = rng.randint(1, fields)
+        top, left = rng.randint(0, 2000), rng.randint(0, 1200)
+        return (
+            f"<Object{_attrs(type='Field', key=key, name='')}>"
+            f"<Bounds{_attrs(top=top, left=left, bottom=top + 20, right=left + 160)}/>"
+            f"<FieldObj{_attrs(numOfReps=1, displayType='Standard')}><Name>{escape(occurrence)}::Field{f}</Name>"
+            f"<DDRInfo><Field{_attrs(name=f'Field{f}', id=f, repetition=1, table=occurrence)}/></DDRInfo>"
+            "</FieldObj></Object>"
+        )
+
+    out.write("  <LayoutCatalog>\n")
+    for l in range(1, layouts + 1):
+        table_id, occurrence, _ = occurrence_names[rng.randrange(len(occurrence_names))]
+        out.write(f"   <Layout{_attrs(id=l, name=f'Layout{l}', width=800)}>\n")
+        out.write(f"    <Table{_attrs(id=table_id, name=occurrence)}/>\n")
+        key = 1
+        written = 0
+        while written < objects:
+            if portal_every and written % portal_every == portal_every - 1 and objects - written > 1:
+                # A portal onto another occurrence, holding a few of its fields
+                _, related, _ = occurrence_names[rng.randrange(len(occurrence_names))]
+                rows = min(4, objects - written - 1)
+                out.write(f"    <Object{_attrs(type='Portal', key=key, name=related)}><PortalObj>")
+                for _ in range(rows):
+                    key += 1
+                    out.write(field_object(key, related))
+                out.write("</PortalObj></Object>\n")
+                written += rows + 1
+            else:
+                out.write(f"    {field_object(key, occurrence)}\n")
+                written += 1
+            key += 1
+        counts["LayoutObject"] += written
+        out.write("   </Layout>\n")
+    out.write("  </LayoutCatalog>\n")
+    out.write(" </File>\n</FMPReport>\n")
+    return counts
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("output")
+    parser.add_argument("--nodes", type=int, help="approximate total nodes; sets the sizes below")
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=40, help="fields per table")
+    parser.add_argument("--occurrences", type=int, default=3, help="table occurrences per table")
+    parser.add_argument("--relationships", type=int, default=40)
+    parser.add_argument("--layouts", type=int, default=20)
+    parser.add_argument("--objects", type=int, default=150, help="objects per layout")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    sizes = sizes_for_nodes(args.nodes) if args.nodes else {
+        k: getattr(args, k) for k in ("tables", "fields", "occurrences", "relationships", "layouts", "objects")
+    }
+    with open(args.output, "w", encoding="utf-8") as out:
+        counts = write_report(out, seed=args.seed, **sizes)
+    print(f"{args.output}: {sum(counts.values())} nodes", counts)
+
+if __name__ == "__main__":
+    main()
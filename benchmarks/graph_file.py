@@ -0,0 +1,80 @@
+# Moving a solution between machines: re-parsing its Design Report vs exporting the
+# graph to a graph file and restoring or mapping it. Prints time and size for each.
+#
+#   python -m benchmarks.graph_file --nodes 100000
+#   python -m benchmarks.graph_file --nodes 1000000 --details-encoding zlib
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import database
+import graph_file
+from benchmarks.generate_report import sizes_for_nodes, write_report
+from benchmarks.suite import bench_import
+from snapshot import GraphSnapshot
+
+def size_mb(*paths: str) -> float:
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p)) / 2**20
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=100000, help="approximate node count of the generated report")
+    parser.add_argument("--details-encoding", choices=database.DETAILS_ENCODINGS, default="json",
+                        help="details encoding of the imported database")
+    parser.add_argument("--samples", type=int, default=1000, help="node lookups against the mapped file")
+    parser.add_argument("--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        xml = os.path.join(tmp, "report.xml")
+        db = os.path.join(tmp, "graph.db")
+        path = os.path.join(tmp, "graph.fmgraph")
+        restored = os.path.join(tmp, "restored.db")
+        with open(xml, "w", encoding="utf-8") as out:
+            write_report(out, **sizes_for_nodes(args.nodes))
+
+        database.DB_PATH = db
+        database.init_db(db_path=db, details_encoding=args.details_encoding)
+        database.close_connections()
+        imported = bench_import(xml, db, workers=1)
+        database.open_connection(db).execute("PRAGMA wal_checkpoint(TRUNCATE)").close()
+        results["parse"] = {"seconds": imported["seconds"], "xml_mb": round(size_mb(xml), 1),
+                            "db_mb": round(size_mb(db, db + "-wal"), 1), "nodes": imported["nodes"]}
+
+        seconds, footer = timed(graph_file.export, path, db)
+        results["export"] = {"seconds": round(seconds, 3), "file_mb": round(size_mb(path), 1)}
+
+        seconds, counts = timed(graph_file.restore, path, restored)
+        database.close_connections()
+        results["restore"] = {"seconds": round(seconds, 3), "rows": counts,
+                              "db_mb": round(size_mb(restored, restored + "-wal"), 1)}
+
+        # Mapping is lazy, so time the open together with a first lookup
+        snapshot = GraphSnapshot(graph_file=path)
+        seconds, _ = timed(snapshot.node_view, 1)
+        rng = random.Random(1)
+        ids = [rng.randint(1, footer["nodes"]) for _ in range(args.samples)]
+        lookups, _ = timed(lambda: [snapshot.node_view(i) for i in ids])
+        results["map"] = {"open_seconds": round(seconds, 4),
+                          "node_view_ms": round(lookups / len(ids) * 1000, 4)}
+
+    print(json.dumps(results, indent=2))
+    parse, restore = results["parse"]["seconds"], results["restore"]["seconds"]
+    print(f"restore is {parse / restore:.1f}x faster than re-parsing; "
+          f"the file is {results['export']['file_mb'] / results['parse']['db_mb']:.0%} of the database's size")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
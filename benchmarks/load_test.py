@@ -0,0 +1,77 @@
+# Requests/sec and latency of a running graph browser at increasing concurrency.
+# Start the server first, against the database given with --db, e.g.
+#
+#   uvicorn asgi:application --port 5000        (or: python app.py)
+#   python -m benchmarks.load_test --url http://127.0.0.1:5000 --concurrency 1,4,16,64
+
+import argparse
+import random
+import sqlite3
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import database
+from benchmarks.common import percentile
+
+def run_level(base_url: str, paths, concurrency: int, duration: float):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(seed: int) -> None:
+        rng = random.Random(seed)
+        local = []
+        failed = 0
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            try:
+                with urllib.request.urlopen(base_url + rng.choice(paths), timeout=30) as response:
+                    response.read()
+                local.append((time.perf_counter() - t0) * 1000)
+            except (urllib.error.URLError, OSError):
+                failed += 1
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client, args=(k,)) for k in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--db", default=database.DB_PATH, help="database the server reads, to pick node ids from")
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    parser.add_argument("--duration", type=float, default=10, help="seconds per concurrency level")
+    parser.add_argument("--impact", action="store_true", help="also request /node/<id>/impact pages")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    node_ids = [r[0] for r in conn.execute("SELECT id FROM nodes ORDER BY random() LIMIT 5000")]
+    conn.close()
+    if not node_ids:
+        raise SystemExit(f"no nodes in {args.db}; import a report first")
+    paths = [f"/node/{i}" for i in node_ids]
+    if args.impact:
+        paths += [f"/node/{i}/impact?depth=3" for i in node_ids[:500]]
+
+    print(f"{'clients':>7} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for concurrency in (int(c) for c in args.concurrency.split(",")):
+        latencies, errors, elapsed = run_level(args.url.rstrip("/"), paths, concurrency, args.duration)
+        if not latencies:
+            print(f"{concurrency:>7} {'-':>9} {'-':>9} {'-':>9} {errors:>7}")
+            continue
+        print(f"{concurrency:>7} {len(latencies) / elapsed:>9.1f} {statistics.median(latencies):>9.2f} "
+              f"{percentile(latencies, 99):>9.2f} {errors:>7}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# Neighbor query latency on the pre-constraint edges schema (single-column indexes,
+# duplicate edges) vs after init_db's migration (deduplicated, unique and covering
+# indexes on (from_id, type, to_id) and (to_id, type, from_id))
+#
+#   python -m benchmarks.neighbor_latency --tables 100 --fields 50 --layouts 200 --objects 100
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import database
+from benchmarks import synthetic
+from models import EdgeType
+from benchmarks.common import percentile
+
+def measure(name: str, run, inputs) -> None:
+    latencies = []
+    for value in inputs:
+        t0 = time.perf_counter()
+        run(value)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    print(f"  {name:<22} p50 {statistics.median(latencies):7.3f} ms  p99 {percentile(latencies, 99):7.3f} ms")
+
+def run_queries(node_ids, batches, conn) -> None:
+    measure("children_of", lambda i: database.children_of(i, with_details=False), node_ids)
+    measure("parents_of", lambda i: database.parents_of(i, with_details=False), node_ids)
+    measure("children_of_many(50)", lambda b: database.children_of_many(b, with_details=False), batches)
+    measure("UsedBy parents", lambda i: conn.execute(
+        "SELECT from_id FROM edges WHERE to_id = ? AND type = ?", (i, EdgeType.USED_BY.value)).fetchall(), node_ids)
+    measure("traverse UsedBy in", lambda i: database.traverse(
+        i, "in", [EdgeType.USED_BY.value], max_depth=3, limit=100), node_ids[:len(node_ids) // 10])
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT e.type, e.id, e.to_id FROM edges e WHERE e.from_id = ?", (1,)
+    ).fetchall()
+    print("  plan:", "; ".join(row[3] for row in plan))
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--fields", type=int, default=50, help="fields per table")
+    parser.add_argument("--layouts", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=100, help="objects per layout")
+    parser.add_argument("--duplicates", type=float, default=0.3,
+                        help="share of edges duplicated in the old schema, as repeated imports left them")
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "graph.db")
+        database.init_db(reset=True)
+        with database.bulk_insert():
+            synthetic.load_graph(args.tables, args.fields, args.layouts, args.objects)
+        conn = database.open_connection(database.DB_PATH)
+
+        # Back to the old schema, with duplicates of a share of the edges, and to the
+        # schema version before the migration that made edges unique
+        with conn:
+            conn.execute("DROP INDEX idx_edges_unique")
+            conn.execute("DROP INDEX idx_edges_to_type")
+            conn.execute("CREATE INDEX idx_edges_from ON edges(from_id)")
+            conn.execute("CREATE INDEX idx_edges_to ON edges(to_id)")
+            conn.execute(
+                "INSERT INTO edges (type, from_id, to_id) SELECT type, from_id, to_id FROM edges "
+                "WHERE abs(random()) % 1000 < ?", (int(args.duplicates * 1000),)
+            )
+        conn.execute(f"PRAGMA user_version = {database.MIGRATIONS.index(database._migrate_unique_edges)}")
+        conn.execute("ANALYZE")
+        edges = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+
+        rng = random.Random(7)
+        max_id = conn.execute("SELECT MAX(id) FROM nodes").fetchone()[0]
+        node_ids = [rng.randint(1, max_id) for _ in range(args.samples)]
+        batches = [[rng.randint(1, max_id) for _ in range(50)] for _ in range(args.samples // 10)]
+
+        print(f"before: {edges} edges")
+        run_queries(node_ids, batches, conn)
+
+        start = time.perf_counter()
+        database.init_db()
+        migration = time.perf_counter() - start
+        conn.execute("ANALYZE")
+        remaining = conn.execute("SELECT COUNT(*) FROM edges").fetchone()[0]
+        print(f"after: {remaining} edges ({edges - remaining} duplicates removed, migration {migration:.2f}s)")
+        run_queries(node_ids, batches, conn)
+        conn.close()
+        database.close_connections()
+
+if __name__ == "__main__":
+    main()
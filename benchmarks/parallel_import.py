@@ -0,0 +1,52 @@
+# Wall time of reading a Design Report, and of a full import, at increasing worker counts
+#
+#   python -m benchmarks.parallel_import data/Example.xml --workers 1,2,4,8
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import design_report
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_read(xml: str, workers: int) -> float:
+    start = time.perf_counter()
+    for _ in design_report.iter_records_parallel(xml, workers):
+        pass
+    return time.perf_counter() - start
+
+def time_import(xml: str, workers: int) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "parser-old.py"), os.path.abspath(xml),
+             "--db", os.path.join(tmp, "graph.db"), "--workers", str(workers)],
+            check=True, stdout=subprocess.DEVNULL,
+        )
+        return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("xml")
+    parser.add_argument("--workers", default=",".join(str(w) for w in (1, 2, 4, 8) if w <= (os.cpu_count() or 1)))
+    parser.add_argument("--read-only", action="store_true", help="skip the full import runs")
+    args = parser.parse_args()
+
+    print(f"{'workers':>7}  {'read':>8}  {'speedup':>7}  {'import':>8}  {'speedup':>7}")
+    base_read = base_import = None
+    for workers in (int(w) for w in args.workers.split(",")):
+        read = time_read(args.xml, workers)
+        base_read = base_read or read
+        line = f"{workers:>7}  {read:7.2f}s  {base_read / read:6.2f}x"
+        if not args.read_only:
+            imported = time_import(args.xml, workers)
+            base_import = base_import or imported
+            line += f"  {imported:7.2f}s  {base_import / imported:6.2f}x"
+        print(line)
+
+if __name__ == "__main__":
+    main()
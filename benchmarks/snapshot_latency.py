@@ -0,0 +1,72 @@
+# Latency of the graph reads behind /node/<id> and its impact page, from SQLite vs
+# from the in-memory graph snapshot. The reads are called directly, as app.py's
+# routes call them, so neither template rendering nor the page cache is measured.
+#
+#   python -m benchmarks.snapshot_latency --tables 200 --fields 50 --layouts 500 --objects 100
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import database
+from benchmarks import synthetic
+from benchmarks.common import percentile
+from models import Node
+from snapshot import GraphSnapshot
+
+def node_view_sqlite(node_id: int):
+    # What node_page reads without a snapshot
+    return database.run_concurrently(
+        lambda: Node.load(node_id),
+        lambda: Node.parents_of_many([node_id], with_details=False)[node_id],
+        lambda: Node.children_of_many([node_id], with_details=False)[node_id],
+    )
+
+def measure(name: str, run, inputs) -> None:
+    latencies = []
+    for value in inputs:
+        t0 = time.perf_counter()
+        run(value)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    print(f"  {name:<16} p50 {statistics.median(latencies):7.3f} ms  p99 {percentile(latencies, 99):7.3f} ms")
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=100)
+    parser.add_argument("--fields", type=int, default=50, help="fields per table")
+    parser.add_argument("--layouts", type=int, default=200)
+    parser.add_argument("--objects", type=int, default=100, help="objects per layout")
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, "graph.db")
+        database.init_db(reset=True, db_path=database.DB_PATH)
+        with database.bulk_insert():
+            synthetic.load_graph(args.tables, args.fields, args.layouts, args.objects)
+        with database.session() as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            max_id = conn.execute("SELECT MAX(id) FROM nodes").fetchone()[0]
+
+        rng = random.Random(7)
+        node_ids = [rng.randint(1, max_id) for _ in range(args.samples)]
+        impact_ids = node_ids[:len(node_ids) // 10]
+
+        print("sqlite")
+        measure("node view", node_view_sqlite, node_ids)
+        measure("impact (depth 5)", lambda i: Node.load(i).traverse("in", None, 5, limit=51), impact_ids)
+
+        snapshot = GraphSnapshot(database.DB_PATH)
+        start = time.perf_counter()
+        snapshot.load(1)
+        print(f"snapshot (loaded in {time.perf_counter() - start:.2f}s)")
+        measure("node view", snapshot.node_view, node_ids)
+        measure("impact (depth 5)", lambda i: snapshot.traverse(i, "in", None, 5, limit=51), impact_ids)
+
+        database.close_connections()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# End-to-end benchmarks at several graph sizes: import a generated Design Report,
+# then time search, node pages and traversal against the result. Records throughput,
+# latency percentiles and peak RSS, and compares them with a saved baseline.
+#
+#   python -m benchmarks.suite --scales 1000,10000,100000 --output results.json
+#   python -m benchmarks.suite --scales 1000,10000 --baseline results.json --fail-on-regression
+
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+import database
+from models import Node, NodeType
+from benchmarks.generate_report import sizes_for_nodes, write_report
+from benchmarks.common import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Timed against each imported graph; the import itself always runs
+QUERY_BENCHMARKS = ("search", "node_page", "traverse")
+
+# Metrics where a higher value is the better one; everything else is lower-is-better
+HIGHER_IS_BETTER = {"nodes_per_second", "edges_per_second", "per_second"}
+
+def peak_rss_mb(rusage) -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return rusage.ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+
+def latencies(run: Callable[[Any], Any], inputs: List[Any]) -> Dict[str, float]:
+    samples = []
+    start = time.perf_counter()
+    for value in inputs:
+        t0 = time.perf_counter()
+        run(value)
+        samples.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    return {
+        "per_second": round(len(samples) / elapsed, 1),
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(percentile(samples, 95), 3),
+        "p99_ms": round(percentile(samples, 99), 3),
+    }
+
+def bench_import(xml: str, db: str, workers: int) -> Dict[str, Any]:
+    # In a child process, so its peak RSS is the import's alone
+    report_path = db + ".report.json"
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "parser-old.py"), xml, "--db", db,
+         "--workers", str(workers), "--report", report_path],
+        stdout=subprocess.DEVNULL,
+    )
+    _, status, rusage = os.wait4(proc.pid, 0)
+    elapsed = time.perf_counter() - start
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise RuntimeError(f"import of {xml} failed with exit code {os.waitstatus_to_exitcode(status)}")
+    with open(report_path) as f:
+        report = json.load(f)
+    phases = [p for p in report["phases"] if p["name"].startswith("section:") or p["name"] == "deferred"]
+    nodes = sum(p.get("nodes_written", 0) for p in phases)
+    edges = sum(p.get("edges_written", 0) for p in phases)
+    return {
+        "seconds": round(elapsed, 3),
+        "nodes": nodes,
+        "edges": edges,
+        "nodes_per_second": round(nodes / elapsed, 1),
+        "edges_per_second": round(edges / elapsed, 1),
+        "peak_rss_mb": round(peak_rss_mb(rusage), 1),
+    }
+
+def run_scale(nodes: int, args, rng: random.Random) -> Dict[str, Any]:
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        xml = os.path.join(tmp, "report.xml")
+        db = os.path.join(tmp, "graph.db")
+        with open(xml, "w", encoding="utf-8") as out:
+            counts = write_report(out, **sizes_for_nodes(nodes))
+        results["generated_nodes"] = sum(counts.values())
+
+        results["import"] = bench_import(xml, db, args.workers)
+
+        database.DB_PATH = db
+        database.init_db(db_path=db)
+        node_ids = [r["id"] for r in database.node_find(with_details=False)]
+        sample = [rng.choice(node_ids) for _ in range(args.samples)]
+
+        if "search" in args.only:
+            names = [h.name for h in Node.find_headers("type = ?", (NodeType.FIELD.value,))]
+            terms = [rng.choice(names) for _ in range(args.samples)]
+            results["search"] = latencies(lambda q: database.search(q, limit=50), terms)
+
+        if "node_page" in args.only:
+            # app.py initializes the database it is imported with, so import it late
+            import app
+            app.graph = None
+            client = app.app.test_client()
+            app.page_cache.max_entries = 0  # measure rendering, not the page cache
+            results["node_page"] = latencies(lambda i: client.get(f"/node/{i}"), sample)
+
+        if "traverse" in args.only:
+            fields = [h.id for h in Node.find_headers("type = ?", (NodeType.FIELD.value,))]
+            starts = [rng.choice(fields) for _ in range(max(1, args.samples // 10))]
+            results["traverse"] = latencies(
+                lambda i: Node.load(i).traverse("in", max_depth=5, limit=1000), starts)
+
+        results["peak_rss_mb"] = round(peak_rss_mb(resource.getrusage(resource.RUSAGE_SELF)), 1)
+        database.close_connections()
+    return results
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    # Prints each metric next to its baseline; returns the ones worse by more than threshold
+    regressions = []
+    for scale, benches in results["scales"].items():
+        for bench, metrics in benches.items():
+            if not isinstance(metrics, dict):
+                continue
+            for metric, value in metrics.items():
+                old = baseline.get("scales", {}).get(scale, {}).get(bench, {}).get(metric)
+                if not isinstance(old, (int, float)) or not old:
+                    continue
+                change = (value - old) / old
+                worse = -change if metric in HIGHER_IS_BETTER else change
+                flag = "  REGRESSION" if worse > threshold and metric not in ("nodes", "edges") else ""
+                print(f"{scale:>9} {bench:<10} {metric:<18} {old:>12} -> {value:>12} ({change:+.1%}){flag}")
+                if flag:
+                    regressions.append(f"{scale} {bench} {metric}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scales", default="1000,10000,100000",
+                        help="approximate node counts, e.g. 1000,10000,100000,1000000")
+    parser.add_argument("--only", default=",".join(QUERY_BENCHMARKS), help="subset of " + ",".join(QUERY_BENCHMARKS))
+    parser.add_argument("--samples", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=1, help="reader processes for the import")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the results as JSON (usable as a later --baseline)")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative change counted as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+    args.only = set(args.only.split(","))
+
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {"python": sys.version.split()[0], "samples": args.samples, "scales": {}}
+    for nodes in (int(s) for s in args.scales.split(",")):
+        print(f"--- {nodes} nodes")
+        results["scales"][str(nodes)] = scale = run_scale(nodes, args, rng)
+        print(json.dumps(scale, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+            if args.fail_on_regression:
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Synthetic graph content shaped like an imported Design Report, written straight
+# through database.py (no XML), for benchmarks that need a large populated database
+
+import random
+from typing import Any, Dict
+
+import database
+
+def field_details(table_id: int, field_id: int, rng: random.Random) -> Dict[str, Any]:
+    details: Dict[str, Any] = {
+        "@id": str(field_id),
+        "@name": f"Field {table_id}.{field_id}",
+        "@dataType": rng.choice(["Text", "Number", "Date", "Timestamp", "Container"]),
+        "@fieldType": rng.choice(["Normal", "Normal", "Normal", "Calculated", "Summary"]),
+        "Storage": {"@autoIndex": "True", "@index": "None", "@global": "False", "@maxRepetition": "1"},
+        "AutoEnter": {"@allowEditing": "True", "@constant": "False", "@furigana": "False"},
+        "Validation": {"@message": "False", "@maxLength": "False", "@valuelist": "False"},
+    }
+    if details["@fieldType"] == "Calculated":
+        details["Calculation"] = {"@table": f"Table {table_id}",
+                                  "Text": f"Field {table_id}.{field_id - 1} & \" \" & Get ( CurrentDate )"}
+    return details
+
+def layout_object_details(layout_id: int, position: int, field_ref: str, rng: random.Random) -> Dict[str, Any]:
+    top, left = rng.randint(0, 2000), rng.randint(0, 1200)
+    return {
+        "@type": "Field",
+        "@key": str(position),
+        "@LabelKey": "0",
+        "@name": "",
+        "@flags": "0",
+        "@rotation": "0",
+        "Bounds": {"@top": str(top), "@left": str(left), "@bottom": str(top + 20), "@right": str(left + 160)},
+        "FieldObj": {
+            "@numOfReps": "1",
+            "@flags": "32",
+            "@inputMode": "0",
+            "@keyboardType": "1",
+            "@displayType": "Standard",
+            "@quickFind": "1",
+            "@pictFormat": "5",
+            "Name": field_ref,
+            "DDRInfo": {"Field": {"@name": field_ref.split("::")[1], "@id": str(position), "@repetition": "1",
+                                  "@maxRepetition": "1", "@table": field_ref.split("::")[0]}},
+        },
+    }
+
+def load_graph(tables: int, fields_per_table: int, layouts: int, objects_per_layout: int,
+               seed: int = 1) -> Dict[str, int]:
+    # Writes BaseTable -> Field, BaseTable -> RelTable -> Layout -> LayoutObject -> Field.
+    # Wrap the call in database.bulk_insert() unless measuring the per-row path.
+    rng = random.Random(seed)
+    field_ids = []
+    table_names = []
+    rel_table_ids = []
+    for t in range(1, tables + 1):
+        table_id = database.node_insert(f"Table {t}", "BaseTable", {"@id": str(t), "@name": f"Table {t}"}, str(t))
+        rel_table_id = database.node_insert(
+            f"Table {t}", "RelTable",
+            {"@id": str(1065000 + t), "@name": f"Table {t}", "@baseTable": f"Table {t}", "@baseTableId": str(t)},
+            str(1065000 + t),
+        )
+        database.edge_insert("Parent", table_id, rel_table_id)
+        table_names.append(f"Table {t}")
+        rel_table_ids.append(rel_table_id)
+        for f in range(1, fields_per_table + 1):
+            field_id = database.node_insert(f"Field {t}.{f}", "Field", field_details(t, f, rng), str(f))
+            database.edge_insert("Contains", table_id, field_id)
+            field_ids.append((t, f, field_id))
+
+    objects = 0
+    for l in range(1, layouts + 1):
+        t = rng.randrange(tables)
+        layout_id = database.node_insert(
+            f"Layout {l}", "Layout",
+            {"@id": str(l), "@name": f"Layout {l}", "@width": "800",
+             "Table": {"@id": str(1065001 + t), "@name": table_names[t]}},
+            str(l),
+        )
+        database.edge_insert("UsedBy", rel_table_ids[t], layout_id)
+        for position in range(objects_per_layout):
+            ft, ff, field_id = rng.choice(field_ids)
+            obj_id = database.node_insert(
+                "", "LayoutObject", layout_object_details(l, position, f"Table {ft}::Field {ft}.{ff}", rng),
+            )
+            database.edge_insert("Parent", layout_id, obj_id)
+            database.edge_insert("UsedBy", obj_id, field_id)
+            objects += 1
+
+    return {"tables": tables, "fields": len(field_ids), "layouts": layouts, "layout_objects": objects}
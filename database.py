@@ -1,26 +1,218 @@
 import sqlite3
-from typing import Any, Dict, List, Optional, Tuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple
+import hashlib
 import json
 import os
+import queue
+import re
+import threading
+import time
+import zlib
 
 DB_PATH = "data/graph.db"
+# One database per solution (FileMaker file), so solutions import concurrently and
+# every index and query is confined to its own solution (see use_database)
+SOLUTIONS_DIR = "data/solutions"
 
-def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+try:
+    import zstandard
+except ImportError:  # optional; only needed for the "zstd" details encoding
+    zstandard = None
+
+# Node columns for callers that do not need the (potentially large) details blob
+NODE_HEADER_COLUMNS = ("id", "name", "type", "filemaker_id")
+
+def _node_columns(alias: str = "", with_details: bool = True) -> str:
+    prefix = f"{alias}." if alias else ""
+    if with_details:
+        return f"{prefix}*"
+    return ", ".join(prefix + c for c in NODE_HEADER_COLUMNS)
+
+# Applied once to every connection when it is opened
+PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+)
+
+# Per-thread state: reusable connections by db path, and the active BatchWriter
+_local = threading.local()
+
+# Class of every connection opened from here on; profiling swaps in a subclass
+# that times each statement (see profiling.py)
+CONNECTION_FACTORY = sqlite3.Connection
+
+def open_connection(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, check_same_thread=False, factory=CONNECTION_FACTORY)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA foreign_keys = ON;")
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def current_db_path() -> str:
+    # The database this thread works on: its use_database() one, else DB_PATH
+    return getattr(_local, "db_path", None) or DB_PATH
+
+@contextmanager
+def use_database(db_path: str) -> Iterator[str]:
+    # Points this thread's queries at db_path for the block, e.g. one solution's
+    # database while other threads serve other solutions
+    previous = getattr(_local, "db_path", None)
+    _local.db_path = db_path
+    try:
+        yield db_path
+    finally:
+        _local.db_path = previous
+
+def solution_path(name: str) -> str:
+    if not re.fullmatch(r"[\w.-]+", name) or name.startswith("."):
+        raise ValueError(f"invalid solution name {name!r}")
+    return os.path.join(SOLUTIONS_DIR, f"{name}.db")
+
+def solution_name(file_name: str) -> str:
+    # Solution name for a FileMaker file name, e.g. "Invoices 2.fmp12" -> "Invoices_2"
+    stem = re.sub(r"\.fmp12$", "", file_name.strip(), flags=re.IGNORECASE)
+    return re.sub(r"[^\w.-]+", "_", stem).strip("._") or "solution"
+
+def list_solutions() -> List[str]:
+    if not os.path.isdir(SOLUTIONS_DIR):
+        return []
+    return sorted(f[:-3] for f in os.listdir(SOLUTIONS_DIR) if f.endswith(".db"))
+
+def _connect() -> sqlite3.Connection:
+    # Each thread (e.g. a Flask worker) keeps one open connection per database file
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    db_path = current_db_path()
+    conn = conns.get(db_path)
+    if conn is None:
+        conn = conns[db_path] = open_connection(db_path)
     return conn
 
-def init_db(reset: bool = False, db_path: str = DB_PATH) -> None:
+def close_connections() -> None:
+    # Closes this thread's cached connections and every pooled connection
+    for conn in getattr(_local, "conns", {}).values():
+        conn.close()
+    _local.conns = {}
+    for pool in list(_pools.values()):
+        pool.close()
+    _pools.clear()
+    _encodings.clear()
+
+class ConnectionPool:
+    def __init__(self, db_path: str, size: int = 4):
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = open_connection(self.db_path)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._idle.qsize() < self.size:
+                self._idle.put(conn)
+            else:
+                conn.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+@contextmanager
+def pooled_connection() -> Iterator[sqlite3.Connection]:
+    # Explicitly borrowed connection for long-running work such as an import
+    db_path = current_db_path()
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = _pools[db_path] = ConnectionPool(db_path)
+    with pool.connection() as conn:
+        yield conn
+
+@contextmanager
+def session() -> Iterator[sqlite3.Connection]:
+    # Inside bulk_insert() every query runs on the writer's connection, after its
+    # buffered rows are flushed, so reads see the rows written so far
+    writer = getattr(_local, "writer", None)
+    if writer is None:
+        with _connect() as conn:
+            yield conn
+    else:
+        writer._begin()
+        writer.flush()
+        yield writer.conn
+
+# Threads for independent reads; each keeps its own connection via _connect()
+READER_THREADS = 8
+_readers: Optional[ThreadPoolExecutor] = None
+_readers_lock = threading.Lock()
+
+def run_concurrently(*calls: Callable[[], Any]) -> List[Any]:
+    # Runs independent read-only calls side by side and returns their results in
+    # order. sqlite3 releases the GIL while a query runs, so reads on separate
+    # connections overlap. Inside bulk_insert() the calls run in order on this
+    # thread instead, where the uncommitted rows are visible.
+    global _readers
+    if len(calls) < 2 or getattr(_local, "writer", None) is not None:
+        return [call() for call in calls]
+    if _readers is None:
+        with _readers_lock:
+            if _readers is None:
+                _readers = ThreadPoolExecutor(READER_THREADS, thread_name_prefix="db-reader")
+    # The first call runs here, so this thread does its share of the work. Readers
+    # query the same database as this thread.
+    db_path = current_db_path()
+
+    def run(call: Callable[[], Any]) -> Any:
+        with use_database(db_path):
+            return call()
+
+    futures = [_readers.submit(run, call) for call in calls[1:]]
+    return [calls[0]()] + [f.result() for f in futures]
+
+def init_db(reset: bool = False, db_path: Optional[str] = None, details_encoding: Optional[str] = None) -> None:
+    # Creates or upgrades the schema of db_path, by default this thread's database
+    if db_path is not None and db_path != current_db_path():
+        with use_database(db_path):
+            return init_db(reset, db_path, details_encoding)
+    db_path = current_db_path()
     os.makedirs(os.path.dirname(db_path), exist_ok=True) if os.path.dirname(db_path) else None
 
     with _connect() as conn:
         if reset:
             conn.executescript("""
+                DROP TABLE IF EXISTS analytics_findings;
+                DROP TABLE IF EXISTS node_component;
+                DROP TABLE IF EXISTS node_degree;
+                DROP TABLE IF EXISTS node_attrs;
+                DROP TABLE IF EXISTS nodes_fts;
                 DROP TABLE IF EXISTS edges;
                 DROP TABLE IF EXISTS nodes;
+                PRAGMA user_version = 0;
             """)
 
+        # The original nodes/edges schema, and meta, which migrations write to.
+        # Everything added since comes from MIGRATIONS.
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
         conn.executescript("""
             CREATE TABLE IF NOT EXISTS nodes (
                 id           INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -41,98 +233,893 @@ def init_db(reset: bool = False, db_path: str = DB_PATH) -> None:
 
             CREATE INDEX IF NOT EXISTS idx_nodes_type ON nodes(type);
             CREATE INDEX IF NOT EXISTS idx_nodes_filemaker_id ON nodes(filemaker_id);
-            CREATE INDEX IF NOT EXISTS idx_edges_from ON edges(from_id);
-            CREATE INDEX IF NOT EXISTS idx_edges_to   ON edges(to_id);
         """)
+        _migrate(conn, db_path)
+        if reset:
+            bump_version(conn)
+
+    if details_encoding is not None:
+        set_details_encoding(details_encoding)
+
+def _add_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> None:
+    columns = {r["name"] for r in conn.execute(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+# --- Schema migrations ---
+
+# Changes to the schema of existing databases, applied in order by init_db. A
+# database's PRAGMA user_version is the number of migrations it has had, so each
+# runs once per database, in its own transaction with the version bump. Append new
+# migrations at the end; databases in use have already run the ones before. Every
+# schema change after the original nodes/edges tables is one, including those made
+# before the runner existed; those check what is there, since databases from then
+# are at version 0 whatever they hold.
+
+def _migrate_import_keys(conn: sqlite3.Connection) -> None:
+    # Identity and change detection for incremental imports
+    _add_column(conn, "nodes", "import_key", "TEXT")
+    _add_column(conn, "nodes", "content_hash", "TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_import_key ON nodes(type, import_key)")
+
+def _migrate_unique_edges(conn: sqlite3.Connection) -> None:
+    # At most one edge per (from, type, to). Both indexes cover the neighbor
+    # queries, so edges are found without reading the table. Existing duplicates
+    # are deleted first, keeping each edge's oldest row.
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_edges_unique'").fetchone() is None:
+        cur = conn.execute(
+            "DELETE FROM edges WHERE id NOT IN (SELECT MIN(id) FROM edges GROUP BY from_id, type, to_id)"
+        )
+        if cur.rowcount:
+            bump_version(conn)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_edges_unique ON edges(from_id, type, to_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_edges_to_type ON edges(to_id, type, from_id)")
+    # Left prefixes of the two above
+    conn.execute("DROP INDEX IF EXISTS idx_edges_from")
+    conn.execute("DROP INDEX IF EXISTS idx_edges_to")
+
+def _migrate_type_name_index(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_nodes_type_name ON nodes(type, name)")
+
+def _migrate_search_index(conn: sqlite3.Connection) -> None:
+    # Full-text index over name, type and the text values in details. rowid is the
+    # node id. Rows are written alongside the node by node_insert/node_update/
+    # BatchWriter and removed by the trigger. Existing nodes are indexed once.
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'nodes_fts'").fetchone() is not None
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS nodes_fts USING fts5(
+            name, type, body,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS nodes_fts_delete AFTER DELETE ON nodes BEGIN
+            DELETE FROM nodes_fts WHERE rowid = old.id;
+        END
+    """)
+    if not exists:
+        _fill_search_index(conn)
+
+def _migrate_attributes(conn: sqlite3.Connection) -> None:
+    # Frequently queried details values (see PROMOTED_ATTRIBUTES), one row per
+    # value, so attribute filters are index lookups instead of JSON decoding
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'node_attrs'").fetchone() is not None
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS node_attrs (
+            node_id  INTEGER NOT NULL,
+            key      TEXT NOT NULL,
+            value    TEXT,
+            FOREIGN KEY(node_id) REFERENCES nodes(id) ON DELETE CASCADE
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_node_attrs_key_value ON node_attrs(key, value, node_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_node_attrs_node ON node_attrs(node_id)")
+    if not exists:
+        _fill_attributes(conn)
+
+def _migrate_analytics(conn: sqlite3.Connection) -> None:
+    # Summaries computed by analytics.refresh() in bulk after an import. They are
+    # rebuilt wholesale, so they carry no foreign keys; readers join nodes.
+    # Not executescript, which would commit the migration's transaction early
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS node_degree (
+            node_id     INTEGER NOT NULL,
+            edge_type   TEXT NOT NULL,
+            in_degree   INTEGER NOT NULL,
+            out_degree  INTEGER NOT NULL,
+            PRIMARY KEY (node_id, edge_type)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS node_component (
+            node_id    INTEGER PRIMARY KEY,
+            component  INTEGER NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_node_component ON node_component(component)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_findings (
+            report   TEXT NOT NULL,
+            node_id  INTEGER NOT NULL,
+            score    REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (report, node_id)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_analytics_findings_score ON analytics_findings(report, score DESC, node_id)"
+    )
+
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migrate_import_keys,
+    _migrate_unique_edges,
+    _migrate_type_name_index,
+    _migrate_search_index,
+    _migrate_attributes,
+    _migrate_analytics,
+]
+
+def schema_version() -> int:
+    with session() as conn:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def _migrate(conn: sqlite3.Connection, db_path: str) -> List[str]:
+    # Runs the migrations the database has not had yet and returns their names
+    if conn.in_transaction:
+        conn.commit()
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version > len(MIGRATIONS):
+        raise RuntimeError(f"{db_path} has schema version {version}, newer than the {len(MIGRATIONS)} known here")
+    applied = []
+    for number, migration in enumerate(MIGRATIONS[version:], version + 1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(migration.__name__)
+    return applied
+
+def content_hash(name: str, filemaker_id: Optional[str], details_json: str) -> str:
+    return hashlib.sha1(f"{name}\0{filemaker_id}\0{details_json}".encode()).hexdigest()
+
+# --- Graph version ---
+
+# Counts committed changes to nodes and edges, so readers can tell cheaply whether
+# anything they derived from the graph (rendered pages, snapshots) is still current
+
+def bump_version(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "INSERT INTO meta (key, value) VALUES ('graph_version', 1) "
+        "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+    )
+    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('graph_modified', ?)", (time.time(),))
+
+def _changed(conn: sqlite3.Connection) -> None:
+    # Called by every write; inside bulk_insert() the writer bumps once on commit
+    writer = getattr(_local, "writer", None)
+    if writer is not None:
+        writer.changed = True
+    else:
+        bump_version(conn)
+
+def graph_version() -> Tuple[int, float]:
+    # (version, unix time of the last change); (0, 0.0) for a graph never written to
+    with session() as conn:
+        meta = dict(conn.execute(
+            "SELECT key, value FROM meta WHERE key IN ('graph_version', 'graph_modified')"
+        ).fetchall())
+    return int(meta.get("graph_version", 0)), float(meta.get("graph_modified", 0))
+
+# --- Details encoding ---
+
+# How new details values are stored, chosen per database and recorded in meta:
+#   json  - JSON text (the default, readable with any SQLite tool)
+#   zlib  - zlib-compressed JSON, as a blob
+#   zstd  - zstd-compressed JSON, as a blob (needs the zstandard package)
+# Blobs start with a one-byte tag, so stored values decode without consulting meta
+# and a database can hold a mix while it is being re-encoded.
+DETAILS_ENCODINGS = ("json", "zlib", "zstd")
+
+_encodings: Dict[str, str] = {}
+
+def get_meta(key: str, default: Optional[str] = None) -> Optional[str]:
+    with session() as conn:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else default
+
+def set_meta(key: str, value: str) -> None:
+    with session() as conn:
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+def details_encoding() -> str:
+    encoding = _encodings.get(current_db_path())
+    if encoding is None:
+        encoding = _encodings[current_db_path()] = get_meta("details_encoding", "json")
+    return encoding
+
+def set_details_encoding(encoding: str) -> None:
+    # Records the encoding and rewrites every stored details value to match it
+    if encoding not in DETAILS_ENCODINGS:
+        raise ValueError(f"unknown details encoding {encoding!r}, expected one of {DETAILS_ENCODINGS}")
+    if encoding == "zstd" and zstandard is None:
+        raise ValueError("the zstd details encoding needs the zstandard package")
+    if encoding == details_encoding() and get_meta("details_encoding") is not None:
+        return
+    set_meta("details_encoding", encoding)
+    _encodings[current_db_path()] = encoding
+    with session() as conn:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, details FROM nodes WHERE id > ? ORDER BY id LIMIT 1000", (last_id,)
+            ).fetchall()
+            if not rows:
+                break
+            conn.executemany(
+                "UPDATE nodes SET details = ? WHERE id = ?",
+                [(encode_details(details_text(r["details"])), r["id"]) for r in rows],
+            )
+            last_id = rows[-1]["id"]
+
+def encode_details(details_json: str) -> Any:
+    encoding = details_encoding()
+    if encoding == "zlib":
+        return b"z" + zlib.compress(details_json.encode(), 6)
+    if encoding == "zstd":
+        return b"s" + zstandard.ZstdCompressor(level=3).compress(details_json.encode())
+    return details_json
+
+def details_text(raw: Any) -> str:
+    if isinstance(raw, bytes):
+        if raw[:1] == b"z":
+            return zlib.decompress(raw[1:]).decode()
+        if raw[:1] == b"s":
+            return zstandard.ZstdDecompressor().decompress(raw[1:]).decode()
+        raise ValueError(f"unknown details encoding tag {raw[:1]!r}")
+    return raw
+
+def decode_details(raw: Any) -> Dict[str, Any]:
+    # Stored details value (as read from nodes.details) -> dict, whatever the encoding
+    return json.loads(details_text(raw)) if raw else {}
+
+# --- Search ---
+
+def _search_text(details: Any) -> str:
+    # Flattens the string values of a details dict; bare numbers (ids, coordinates) are skipped
+    parts: List[str] = []
+    stack = [details]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+        elif isinstance(value, str) and value and not value.lstrip("-").replace(".", "", 1).isdigit():
+            parts.append(value)
+    return " ".join(reversed(parts))
+
+def _fts_query(q: str) -> str:
+    # "quoted text" is a phrase, word* a prefix, everything else a plain term.
+    # Terms are quoted so FTS5 operators and punctuation in user input are literal.
+    terms = []
+    for token in re.findall(r'"[^"]*"|\S+', q):
+        prefix = token.endswith("*") and not token.startswith('"')
+        text = token.strip('"*').replace('"', '""')
+        if text:
+            terms.append(f'"{text}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search(q: str, type_value: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[sqlite3.Row]:
+    # Best matches first; matches in the name weigh more than matches in details
+    match = _fts_query(q)
+    if not match:
+        return []
+    sql = (
+        "SELECT n.id, n.name, n.type, n.filemaker_id, "
+        "snippet(nodes_fts, 2, '[', ']', '…', 12) AS snippet, "
+        "bm25(nodes_fts, 10.0, 1.0, 1.0) AS rank "
+        "FROM nodes_fts JOIN nodes n ON n.id = nodes_fts.rowid "
+        "WHERE nodes_fts MATCH ?"
+    )
+    params: List[Any] = [match]
+    if type_value:
+        sql += " AND n.type = ?"
+        params.append(type_value)
+    sql += " ORDER BY rank LIMIT ? OFFSET ?"
+    params += [limit, offset]
+    with session() as conn:
+        return conn.execute(sql, params).fetchall()
+
+def rebuild_search_index() -> None:
+    with session() as conn:
+        _fill_search_index(conn)
+
+def _fill_search_index(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM nodes_fts")
+    rows = conn.execute("SELECT id, name, type, details FROM nodes")
+    conn.executemany(
+        "INSERT INTO nodes_fts (rowid, name, type, body) VALUES (?, ?, ?, ?)",
+        ((r["id"], r["name"], r["type"], _search_text(decode_details(r["details"]))) for r in rows),
+    )
+
+# --- Promoted attributes ---
+
+# Per node type: attribute name -> path into details. A path fans out over lists,
+# so e.g. every join predicate of a relationship contributes a value.
+PROMOTED_ATTRIBUTES: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "Field": {
+        "data_type":  ("@dataType",),
+        "field_type": ("@fieldType",),
+        "global":     ("Storage", "@global"),
+        "stored":     ("Storage", "@storeCalculationResults"),
+    },
+    "RelTable": {
+        "base_table":    ("@baseTable",),
+        "base_table_id": ("@baseTableId",),
+    },
+    "Relationship": {
+        "left_table":  ("LeftTable", "@name"),
+        "right_table": ("RightTable", "@name"),
+        "left_field":  ("JoinPredicateList", "JoinPredicate", "LeftField", "Field", "@name"),
+        "right_field": ("JoinPredicateList", "JoinPredicate", "RightField", "Field", "@name"),
+    },
+    "Layout": {
+        "table":    ("Table", "@name"),
+        "table_id": ("Table", "@id"),
+    },
+    "LayoutObject": {
+        "object_type": ("@type",),
+        "field":       ("FieldObj", "Name"),
+    },
+}
+
+def _attribute_values(value: Any, path: Tuple[str, ...]) -> Iterator[str]:
+    if isinstance(value, list):
+        for item in value:
+            yield from _attribute_values(item, path)
+    elif not path:
+        if value is not None and not isinstance(value, dict):
+            yield str(value)
+    elif isinstance(value, dict):
+        yield from _attribute_values(value.get(path[0]), path[1:])
+
+def _attribute_rows(node_id: int, type_value: str, details: Dict[str, Any]) -> List[Tuple[int, str, str]]:
+    return [
+        (node_id, key, value)
+        for key, path in PROMOTED_ATTRIBUTES.get(type_value, {}).items()
+        for value in _attribute_values(details, path)
+    ]
+
+def rebuild_attributes() -> None:
+    with session() as conn:
+        _fill_attributes(conn)
+
+def _fill_attributes(conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM node_attrs")
+    rows = conn.execute(
+        "SELECT id, type, details FROM nodes WHERE type IN (SELECT value FROM json_each(?))",
+        (json.dumps(list(PROMOTED_ATTRIBUTES)),),
+    )
+    conn.executemany(
+        "INSERT INTO node_attrs (node_id, key, value) VALUES (?, ?, ?)",
+        (a for r in rows for a in _attribute_rows(r["id"], r["type"], decode_details(r["details"]))),
+    )
+
+def node_find_by_attributes(type_value: str, attributes: Dict[str, Any], with_details: bool = True,
+        ) -> List[sqlite3.Row]:
+    # Nodes of type_value having every given attribute value, e.g.
+    # node_find_by_attributes("Field", {"field_type": "Calculated", "data_type": "Text"})
+    sql = f"SELECT {_node_columns('', with_details)} FROM nodes WHERE type = ?"
+    params: List[Any] = [type_value]
+    for key, value in attributes.items():
+        sql += " AND id IN (SELECT node_id FROM node_attrs WHERE key = ? AND value = ?)"
+        params += [key, str(value)]
+    with session() as conn:
+        return conn.execute(sql + " ORDER BY id", params).fetchall()
+
+def node_attributes(node_id: int) -> List[sqlite3.Row]:
+    with session() as conn:
+        return conn.execute("SELECT key, value FROM node_attrs WHERE node_id = ?", (node_id,)).fetchall()
+
+def node_attributes_many(node_ids: List[int]) -> List[sqlite3.Row]:
+    with session() as conn:
+        return conn.execute(
+            "SELECT node_id, key, value FROM node_attrs WHERE node_id IN (SELECT value FROM json_each(?)) "
+            "ORDER BY node_id, key, value",
+            (json.dumps(list(node_ids)),),
+        ).fetchall()
 
 # --- Node CRUD ---
 
-def node_insert(name: str, type_value: str, details: Dict[str, Any], filemaker_id: Optional[str] = None) -> int:
-    with _connect() as conn:
+def node_insert(name: str, type_value: str, details: Dict[str, Any], filemaker_id: Optional[str] = None,
+                import_key: Optional[str] = None) -> int:
+    writer = getattr(_local, "writer", None)
+    if writer is not None:
+        return writer.node_insert(name, type_value, details, filemaker_id, import_key)
+    details_json = json.dumps(details)
+    with session() as conn:
         cur = conn.execute(
-            "INSERT INTO nodes (name, type, filemaker_id, details) VALUES (?, ?, ?, ?)",
-            (name, type_value, filemaker_id, json.dumps(details)),
+            "INSERT INTO nodes (name, type, filemaker_id, details, import_key, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            (name, type_value, filemaker_id, encode_details(details_json), import_key,
+             content_hash(name, filemaker_id, details_json)),
+        )
+        conn.execute(
+            "INSERT INTO nodes_fts (rowid, name, type, body) VALUES (?, ?, ?, ?)",
+            (cur.lastrowid, name, type_value, _search_text(details)),
         )
+        conn.executemany(
+            "INSERT INTO node_attrs (node_id, key, value) VALUES (?, ?, ?)",
+            _attribute_rows(cur.lastrowid, type_value, details),
+        )
+        _changed(conn)
         return cur.lastrowid
 
-def node_update(node_id: int, name: str, type_value: str, details: Dict[str, Any], filemaker_id: Optional[str] = None) -> bool:
-    with _connect() as conn:
+def node_update(node_id: int, name: str, type_value: str, details: Dict[str, Any], filemaker_id: Optional[str] = None,
+                import_key: Optional[str] = None) -> bool:
+    details_json = json.dumps(details)
+    with session() as conn:
         cur = conn.execute(
-            "UPDATE nodes SET name = ?, type = ?, filemaker_id = ?, details = ? WHERE id = ?",
-            (name, type_value, filemaker_id, json.dumps(details), node_id),
+            "UPDATE nodes SET name = ?, type = ?, filemaker_id = ?, details = ?, "
+            "import_key = COALESCE(?, import_key), content_hash = ? WHERE id = ?",
+            (name, type_value, filemaker_id, encode_details(details_json), import_key,
+             content_hash(name, filemaker_id, details_json), node_id),
         )
+        if cur.rowcount:
+            conn.execute(
+                "UPDATE nodes_fts SET name = ?, type = ?, body = ? WHERE rowid = ?",
+                (name, type_value, _search_text(details), node_id),
+            )
+            conn.execute("DELETE FROM node_attrs WHERE node_id = ?", (node_id,))
+            conn.executemany(
+                "INSERT INTO node_attrs (node_id, key, value) VALUES (?, ?, ?)",
+                _attribute_rows(node_id, type_value, details),
+            )
+            _changed(conn)
         return cur.rowcount > 0
 
 def node_get_by_id(node_id: int) -> Optional[sqlite3.Row]:
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute("SELECT * FROM nodes WHERE id = ?", (node_id,)).fetchone()
 
 def node_get_by_filemaker_id(filemaker_id: str) -> Optional[sqlite3.Row]:
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute("SELECT * FROM nodes WHERE filemaker_id = ?", (filemaker_id,)).fetchone()
 
-def node_find(where: Optional[str] = None, params: Tuple[Any, ...] = ()) -> List[sqlite3.Row]:
-    sql = "SELECT * FROM nodes"
+def node_get_details(node_id: int) -> Any:
+    # Raw stored details, for nodes that were loaded without them
+    with session() as conn:
+        row = conn.execute("SELECT details FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        return row["details"] if row else None
+
+def node_get_many(node_ids: List[int], with_details: bool = True) -> List[sqlite3.Row]:
+    # The ids travel as one JSON array parameter, so any number of them is one query
+    with session() as conn:
+        return conn.execute(
+            f"SELECT {_node_columns('', with_details)} FROM nodes WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(node_ids)),),
+        ).fetchall()
+
+def node_get_many_by_filemaker_id(filemaker_ids: List[str], type_value: Optional[str] = None,
+                                  with_details: bool = True) -> List[sqlite3.Row]:
+    # FileMaker ids are only unique per object kind (every table numbers its fields
+    # from 1), so without a type one id can match several nodes
+    sql = (
+        f"SELECT {_node_columns('', with_details)} FROM nodes "
+        "WHERE filemaker_id IN (SELECT value FROM json_each(?))"
+    )
+    params: List[Any] = [json.dumps([str(i) for i in filemaker_ids])]
+    if type_value:
+        sql += " AND type = ?"
+        params.append(type_value)
+    with session() as conn:
+        return conn.execute(sql + " ORDER BY id", params).fetchall()
+
+def node_find(where: Optional[str] = None, params: Tuple[Any, ...] = (), with_details: bool = True) -> List[sqlite3.Row]:
+    sql = f"SELECT {_node_columns('', with_details)} FROM nodes"
     if where:
         sql += f" WHERE {where}"
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute(sql, params).fetchall()
 
+def node_type_counts() -> List[sqlite3.Row]:
+    with session() as conn:
+        return conn.execute("SELECT type, COUNT(*) AS count FROM nodes GROUP BY type").fetchall()
+
+def node_headers_by_type(type_value: str, after_id: int = 0, limit: int = 100) -> List[sqlite3.Row]:
+    # Keyset pagination: pass the last id of the previous page as after_id.
+    # Only id/name/type are read, never the details blob.
+    with session() as conn:
+        return conn.execute(
+            "SELECT id, name, type FROM nodes WHERE type = ? AND id > ? ORDER BY id LIMIT ?",
+            (type_value, after_id, limit),
+        ).fetchall()
+
+def node_import_keys() -> List[sqlite3.Row]:
+    # What an incremental import matches incoming objects against
+    with session() as conn:
+        return conn.execute("SELECT id, type, import_key, content_hash FROM nodes").fetchall()
+
 def node_delete(node_id: int) -> bool:
-    with _connect() as conn:
+    with session() as conn:
         cur = conn.execute("DELETE FROM nodes WHERE id = ?", (node_id,))
+        if cur.rowcount:
+            _changed(conn)
         return cur.rowcount > 0
 
+def node_delete_many(node_ids: List[int]) -> int:
+    # Edges touching the nodes go with them (ON DELETE CASCADE)
+    with session() as conn:
+        cur = conn.execute(
+            "DELETE FROM nodes WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(node_ids)),),
+        )
+        if cur.rowcount:
+            _changed(conn)
+        return cur.rowcount
+
 # --- Edge CRUD ---
 
-def edge_insert(type_value: str, from_id: int, to_id: int) -> int:
-    with _connect() as conn:
+def edge_insert(type_value: str, from_id: int, to_id: int) -> Optional[int]:
+    # Returns the id of the edge, whether it is new or already existed. Inside
+    # bulk_insert the edge is only buffered and None is returned; edge_id looks it up.
+    writer = getattr(_local, "writer", None)
+    if writer is not None:
+        writer.edge_insert(type_value, from_id, to_id)
+        return None
+    with session() as conn:
         cur = conn.execute(
-            "INSERT INTO edges (type, from_id, to_id) VALUES (?, ?, ?)",
+            "INSERT OR IGNORE INTO edges (type, from_id, to_id) VALUES (?, ?, ?)",
             (type_value, from_id, to_id),
         )
-        return cur.lastrowid
+        if cur.rowcount:
+            _changed(conn)
+            return cur.lastrowid
+        return conn.execute(
+            "SELECT id FROM edges WHERE from_id = ? AND type = ? AND to_id = ?",
+            (from_id, type_value, to_id),
+        ).fetchone()[0]
+
+def edge_id(type_value: str, from_id: int, to_id: int) -> Optional[int]:
+    # Id of the edge, including one still buffered by this thread's bulk_insert
+    writer = getattr(_local, "writer", None)
+    if writer is not None:
+        return writer.edge_id(type_value, from_id, to_id)
+    with session() as conn:
+        row = conn.execute(
+            "SELECT id FROM edges WHERE from_id = ? AND type = ? AND to_id = ?",
+            (from_id, type_value, to_id),
+        ).fetchone()
+    return row[0] if row else None
 
 def edge_update(edge_id: int, type_value: str, from_id: int, to_id: int) -> bool:
-    with _connect() as conn:
+    with session() as conn:
         cur = conn.execute(
             "UPDATE edges SET type = ?, from_id = ?, to_id = ? WHERE id = ?",
             (type_value, from_id, to_id, edge_id),
         )
+        if cur.rowcount:
+            _changed(conn)
         return cur.rowcount > 0
 
 def edge_get_by_id(edge_id: int) -> Optional[sqlite3.Row]:
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute("SELECT * FROM edges WHERE id = ?", (edge_id,)).fetchone()
 
 def edge_find(where: Optional[str] = None, params: Tuple[Any, ...] = ()) -> List[sqlite3.Row]:
     sql = "SELECT * FROM edges"
     if where:
         sql += f" WHERE {where}"
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute(sql, params).fetchall()
 
 def edge_delete(edge_id: int) -> bool:
-    with _connect() as conn:
+    with session() as conn:
         cur = conn.execute("DELETE FROM edges WHERE id = ?", (edge_id,))
+        if cur.rowcount:
+            _changed(conn)
         return cur.rowcount > 0
 
+def edge_delete_many(edge_ids: List[int]) -> int:
+    with session() as conn:
+        cur = conn.execute(
+            "DELETE FROM edges WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(edge_ids)),),
+        )
+        if cur.rowcount:
+            _changed(conn)
+        return cur.rowcount
+
 # --- Neighbor queries ---
 
-def children_of(parent_id: int) -> List[sqlite3.Row]:
+def children_of(parent_id: int, with_details: bool = True) -> List[sqlite3.Row]:
     sql = (
-        "SELECT n.*, e.type AS edge_type, e.id AS edge_id "
+        f"SELECT {_node_columns('n', with_details)}, e.type AS edge_type, e.id AS edge_id "
         "FROM edges e JOIN nodes n ON n.id = e.to_id "
-        "WHERE e.from_id = ? ORDER BY n.id"
+        "WHERE e.from_id = ? ORDER BY n.id, e.type"
     )
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute(sql, (parent_id,)).fetchall()
 
-def parents_of(child_id: int) -> List[sqlite3.Row]:
+def parents_of(child_id: int, with_details: bool = True) -> List[sqlite3.Row]:
     sql = (
-        "SELECT n.*, e.type AS edge_type, e.id AS edge_id "
+        f"SELECT {_node_columns('n', with_details)}, e.type AS edge_type, e.id AS edge_id "
         "FROM edges e JOIN nodes n ON n.id = e.from_id "
-        "WHERE e.to_id = ? ORDER BY n.id"
+        "WHERE e.to_id = ? ORDER BY n.id, e.type"
     )
-    with _connect() as conn:
+    with session() as conn:
         return conn.execute(sql, (child_id,)).fetchall()
+
+def children_of_many(parent_ids: List[int], with_details: bool = True) -> List[sqlite3.Row]:
+    sql = (
+        f"SELECT {_node_columns('n', with_details)}, e.type AS edge_type, e.id AS edge_id, e.from_id AS source_id "
+        "FROM edges e JOIN nodes n ON n.id = e.to_id "
+        "WHERE e.from_id IN (SELECT value FROM json_each(?)) ORDER BY e.from_id, n.id, e.type"
+    )
+    with session() as conn:
+        return conn.execute(sql, (json.dumps(list(parent_ids)),)).fetchall()
+
+def parents_of_many(child_ids: List[int], with_details: bool = True) -> List[sqlite3.Row]:
+    sql = (
+        f"SELECT {_node_columns('n', with_details)}, e.type AS edge_type, e.id AS edge_id, e.to_id AS source_id "
+        "FROM edges e JOIN nodes n ON n.id = e.from_id "
+        "WHERE e.to_id IN (SELECT value FROM json_each(?)) ORDER BY e.to_id, n.id, e.type"
+    )
+    with session() as conn:
+        return conn.execute(sql, (json.dumps(list(child_ids)),)).fetchall()
+
+# --- Traversal ---
+
+# (edge column matched against the current node, column holding the next node)
+_DIRECTIONS = {
+    "out": [("from_id", "to_id")],
+    "in":  [("to_id", "from_id")],
+    "both": [("from_id", "to_id"), ("to_id", "from_id")],
+}
+
+def traverse(start_id: int, direction: str = "out", edge_types: Optional[List[str]] = None,
+             max_depth: int = 5, limit: int = -1, offset: int = 0) -> List[sqlite3.Row]:
+    # Walks the graph from start_id breadth-first, one query per depth over the
+    # whole frontier. Each reachable node is returned once, at its shallowest
+    # depth, with the comma separated id path that first reached it; it is
+    # expanded only then, so the work grows with nodes and edges, not paths.
+    type_filter = " AND e.type IN (SELECT value FROM json_each(?))" if edge_types else ""
+    steps = [
+        f"SELECT j.key, e.{step}, e.type FROM json_each(?) j JOIN edges e ON e.{match} = j.value"
+        f"{type_filter} ORDER BY j.key, e.{step}, e.type"
+        for match, step in _DIRECTIONS[direction]
+    ]
+    wanted = offset + limit if limit >= 0 else None
+    # node id -> (depth, path, edge type) of its first visit
+    reached: Dict[int, Tuple[int, str, Optional[str]]] = {start_id: (0, f",{start_id},", None)}
+    frontier = [start_id]
+    with session() as conn:
+        depth = 0
+        while frontier and depth < max_depth and (wanted is None or len(reached) - 1 < wanted):
+            depth += 1
+            params: List[Any] = [json.dumps(frontier)] + ([json.dumps(list(edge_types))] if edge_types else [])
+            rows = sorted(
+                (position, d, next_id, type_value)
+                for d, sql in enumerate(steps)
+                for position, next_id, type_value in conn.execute(sql, params)
+            )
+            next_frontier = []
+            for position, _, next_id, type_value in rows:
+                if next_id not in reached:
+                    reached[next_id] = (depth, f"{reached[frontier[position]][1]}{next_id},", type_value)
+                    next_frontier.append(next_id)
+            frontier = next_frontier
+
+        del reached[start_id]
+        ordered = sorted(reached.items(), key=lambda item: (item[1][0], item[0]))
+        ordered = ordered[offset:] if wanted is None else ordered[offset:wanted]
+        return conn.execute(
+            "SELECT n.*, w.value ->> '$[1]' AS depth, w.value ->> '$[2]' AS path, w.value ->> '$[3]' AS edge_type "
+            "FROM json_each(?) w JOIN nodes n ON n.id = w.value ->> '$[0]' ORDER BY w.key",
+            (json.dumps([[node_id, d, path, type_value] for node_id, (d, path, type_value) in ordered]),),
+        ).fetchall()
+
+# --- Bulk writes ---
+
+def _next_id(conn: sqlite3.Connection, table: str) -> int:
+    # Next id AUTOINCREMENT would hand out; only stable while the write lock is held
+    row = conn.execute(
+        f"SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0), "
+        f"COALESCE((SELECT MAX(id) FROM {table}), 0)) + 1",
+        (table,),
+    ).fetchone()
+    return row[0]
+
+class BatchWriter:
+    # Buffers node and edge inserts and writes them with executemany on a single
+    # connection. Node ids are assigned up front from the table's sequence, which is
+    # safe because the writer holds the write lock (BEGIN IMMEDIATE) until commit.
+    # Edges get their ids when written; edge_id reads them back for callers that
+    # need one.
+    def __init__(self, conn: sqlite3.Connection, batch_size: int = 5000):
+        self.batch_size = batch_size
+        self.conn = conn
+        self.nodes_written = 0
+        self.edges_written = 0
+        # Set by any write in this transaction; the graph version is bumped on commit
+        self.changed = False
+        self._nodes: List[Tuple[Any, ...]] = []
+        self._edges: List[Tuple[Any, ...]] = []
+        # (type, from, to) of every edge given to this transaction, so repeats are
+        # dropped before they are buffered; INSERT OR IGNORE skips edges that were
+        # in the table before it began
+        self._edge_keys: Set[Tuple[str, int, int]] = set()
+        self._search_rows: List[Tuple[Any, ...]] = []
+        self._attribute_rows: List[Tuple[Any, ...]] = []
+        self._next_node_id: Optional[int] = None
+
+    def _begin(self) -> None:
+        if self._next_node_id is None:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._next_node_id = _next_id(self.conn, "nodes")
+
+    def node_insert(self, name: str, type_value: str, details: Dict[str, Any], filemaker_id: Optional[str] = None,
+                    import_key: Optional[str] = None) -> int:
+        self._begin()
+        self.changed = True
+        node_id = self._next_node_id
+        self._next_node_id += 1
+        details_json = json.dumps(details)
+        self._nodes.append((node_id, name, type_value, filemaker_id, encode_details(details_json),
+                            import_key, content_hash(name, filemaker_id, details_json)))
+        self._search_rows.append((node_id, name, type_value, _search_text(details)))
+        self._attribute_rows.extend(_attribute_rows(node_id, type_value, details))
+        if len(self._nodes) >= self.batch_size:
+            self.flush()
+        return node_id
+
+    def edge_insert(self, type_value: str, from_id: int, to_id: int) -> None:
+        key = (type_value, from_id, to_id)
+        if key in self._edge_keys:
+            return
+        self._begin()
+        self._edge_keys.add(key)
+        self._edges.append(key)
+        if len(self._edges) >= self.batch_size:
+            self.flush()
+
+    def edge_id(self, type_value: str, from_id: int, to_id: int) -> Optional[int]:
+        if self._edges:
+            self.flush()
+        row = self.conn.execute(
+            "SELECT id FROM edges WHERE from_id = ? AND type = ? AND to_id = ?", (from_id, type_value, to_id)
+        ).fetchone()
+        return row[0] if row else None
+
+    def flush(self) -> None:
+        # Nodes first so the edges' foreign keys resolve
+        if self._nodes:
+            self.conn.executemany(
+                "INSERT INTO nodes (id, name, type, filemaker_id, details, import_key, content_hash) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                self._nodes,
+            )
+            self.conn.executemany(
+                "INSERT INTO nodes_fts (rowid, name, type, body) VALUES (?, ?, ?, ?)",
+                self._search_rows,
+            )
+            self.conn.executemany(
+                "INSERT INTO node_attrs (node_id, key, value) VALUES (?, ?, ?)",
+                self._attribute_rows,
+            )
+            self.nodes_written += len(self._nodes)
+            self._nodes.clear()
+            self._search_rows.clear()
+            self._attribute_rows.clear()
+        if self._edges:
+            written = self.conn.executemany(
+                "INSERT OR IGNORE INTO edges (type, from_id, to_id) VALUES (?, ?, ?)",
+                self._edges,
+            ).rowcount
+            if written:
+                self.changed = True
+            self.edges_written += written
+            self._edges.clear()
+
+    def commit(self) -> None:
+        self.flush()
+        if self.changed:
+            bump_version(self.conn)
+            self.changed = False
+        self.conn.commit()
+        self._edge_keys.clear()
+        self._next_node_id = None
+
+    def rollback(self) -> None:
+        self._nodes.clear()
+        self._edges.clear()
+        self._edge_keys.clear()
+        self._search_rows.clear()
+        self._attribute_rows.clear()
+        self.changed = False
+        self.conn.rollback()
+        self._next_node_id = None
+
+@contextmanager
+def bulk_insert(batch_size: int = 5000) -> Iterator[BatchWriter]:
+    # While open, node_insert/edge_insert on this thread go through one BatchWriter
+    # and everything is committed in a single transaction when the block exits
+    if getattr(_local, "writer", None) is not None:
+        yield _local.writer
+        return
+
+    with pooled_connection() as conn:
+        writer = BatchWriter(conn, batch_size)
+        _local.writer = writer
+        try:
+            yield writer
+            writer.commit()
+        except BaseException:
+            writer.rollback()
+            raise
+        finally:
+            _local.writer = None
+
+# Tables holding the graph, in the order a replacement empties them
+_GRAPH_TABLES = ("analytics_findings", "node_component", "node_degree", "node_attrs", "nodes_fts", "edges", "nodes")
+
+@contextmanager
+def replacing_graph(details_encoding: str, with_analytics: bool = False) -> Iterator[sqlite3.Connection]:
+    # One transaction that empties the graph and yields the connection to load its
+    # replacement into, with details stored in details_encoding. Rows are trusted
+    # to be consistent, so foreign keys are not checked and the indexes are built
+    # once at the end. with_analytics marks the loaded analytics tables as current.
+    # If the block raises, the database keeps its previous graph.
+    if details_encoding not in DETAILS_ENCODINGS:
+        raise ValueError(f"unknown details encoding {details_encoding!r}, expected one of {DETAILS_ENCODINGS}")
+    init_db()
+    db_path = current_db_path()
+    previous_encoding = _encodings.get(db_path)
+    with pooled_connection() as conn:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            indexes = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                "AND tbl_name IN (SELECT value FROM json_each(?))",
+                (json.dumps(_GRAPH_TABLES),),
+            ).fetchall()
+            for index in indexes:
+                conn.execute(f"DROP INDEX {index['name']}")
+            for table in _GRAPH_TABLES:
+                conn.execute(f"DELETE FROM {table}")
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('details_encoding', ?)", (details_encoding,)
+            )
+            _encodings[db_path] = details_encoding
+
+            yield conn
+
+            # New ids continue after the loaded ones
+            conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('nodes', 'edges')")
+            conn.execute(
+                "INSERT INTO sqlite_sequence (name, seq) "
+                "SELECT 'nodes', MAX(id) FROM nodes HAVING MAX(id) IS NOT NULL "
+                "UNION ALL SELECT 'edges', MAX(id) FROM edges HAVING MAX(id) IS NOT NULL"
+            )
+            for index in indexes:
+                conn.execute(index["sql"])
+            bump_version(conn)
+            if with_analytics:
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) "
+                    "SELECT 'analytics_version', value FROM meta WHERE key = 'graph_version'"
+                )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            if previous_encoding is None:
+                _encodings.pop(db_path, None)
+            else:
+                _encodings[db_path] = previous_encoding
+            raise
+        finally:
+            conn.execute("PRAGMA foreign_keys = ON")
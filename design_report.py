@@ -0,0 +1,261 @@
+# Streams records out of a FileMaker Design Report without loading the whole tree
+
+import json
+import mmap
+import multiprocessing
+import os
+import queue
+import re
+import xml.etree.ElementTree as ET
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+MAPPING_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mapping.json")
+
+# FMPReport > File > <Section> > <record path...>
+SECTION_DEPTH = 3
+
+def load_mapping(path: str = MAPPING_PATH) -> Dict[str, List[Tuple[str, ...]]]:
+    with open(path) as f:
+        mapping = json.load(f)
+    return {
+        section: [tuple(p.split(".")) for p in spec.get("IterateOver", [])]
+        for section, spec in mapping.items()
+    }
+
+def element_to_dict(elem: ET.Element) -> Any:
+    # Same shape xmltodict.parse gives: "@" attributes, "#text", repeated tags become lists
+    text = elem.text.strip() if elem.text else ""
+    if len(elem) == 0 and not elem.attrib:
+        return text or None
+
+    result: Dict[str, Any] = {f"@{k}": v for k, v in elem.attrib.items()}
+    for child in elem:
+        value = element_to_dict(child)
+        if child.tag in result:
+            existing = result[child.tag]
+            if isinstance(existing, list):
+                existing.append(value)
+            else:
+                result[child.tag] = [existing, value]
+        else:
+            result[child.tag] = value
+    if text:
+        result["#text"] = text
+    return result
+
+def iter_records(source, mapping: Optional[Dict[str, List[Tuple[str, ...]]]] = None,
+        ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    # Yields (section, record_path, record) for every record listed in mapping.json.
+    # Records are yielded as soon as their closing tag is read and then dropped from
+    # the tree, so memory is bounded by the largest single record, not the report.
+    # Only the first File of the report is read.
+    matcher = _RecordMatcher(load_mapping() if mapping is None else mapping)
+    yield from matcher.records(ET.iterparse(source, events=("start", "end")))
+
+def report_file_name(source) -> Optional[str]:
+    # Name of the (first) FileMaker file the report describes, read from its File element
+    for _, elem in ET.iterparse(source, events=("start",)):
+        if elem.tag == "File":
+            return elem.get("name")
+    return None
+
+class _RecordMatcher:
+    # Picks the records out of a report's start/end events. It keeps its place
+    # between calls, so the events of one report can come in several batches.
+    def __init__(self, mapping: Dict[str, List[Tuple[str, ...]]]):
+        self.mapping = mapping
+        self.tags: List[str] = []
+        self.elems: List[ET.Element] = []
+        self.record_depth: Optional[int] = None
+        self.finished = False  # the first File has closed
+
+    def records(self, events) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+        tags, elems = self.tags, self.elems
+        for event, elem in events:
+            if event == "start":
+                tags.append(elem.tag)
+                elems.append(elem)
+                if (self.record_depth is None and len(tags) > SECTION_DEPTH
+                        and tuple(tags[SECTION_DEPTH:]) in self.mapping.get(tags[SECTION_DEPTH - 1], ())):
+                    self.record_depth = len(tags)
+                continue
+
+            if self.record_depth == len(tags):
+                yield tags[SECTION_DEPTH - 1], ".".join(tags[SECTION_DEPTH:]), element_to_dict(elem)
+                self.record_depth = None
+
+            # Everything outside an open record is finished with once it closes
+            if self.record_depth is None:
+                elem.clear()
+                if len(elems) > 1:
+                    elems[-2].remove(elem)
+
+            tags.pop()
+            elems.pop()
+            if len(tags) == 1:
+                self.finished = True
+                return
+
+# --- Parallel reading ---
+
+# The report is cut into byte ranges that each start at a record's start tag, and
+# each worker process tokenizes and converts only its own ranges, parsing each one
+# after the start tags of the elements open around its first record. Ranges go to
+# the workers round-robin and the consumer takes them back in the same order, which
+# restores document order.
+#
+# Cuts are found with a plain byte search for a record's start tag on a line of its
+# own, at the indentation of the section's first record, so reports FileMaker
+# pretty-printed split evenly while others are read in one range. A worker checks
+# that its range ends with exactly the elements open that the next range assumes;
+# if not, the cut was not at a record and the worker reads on to the end itself.
+
+_READ_BLOCK = 1 << 20
+_RANGE_DONE = "range done"
+_REPORT_DONE = "report done"
+
+def _cut_report(path, mapping: Dict[str, List[Tuple[str, ...]]], range_bytes: int,
+        ) -> List[Tuple[int, Tuple[str, ...]]]:
+    # (offset, tags open around it) of the first record of each range, about
+    # range_bytes apart; the first range starts at the top of the report
+    outer: Tuple[str, ...] = ()
+    for _, elem in ET.iterparse(path, events=("start",)):
+        outer += (elem.tag,)
+        if len(outer) == SECTION_DEPTH - 1:
+            break
+
+    with open(path, "rb") as f:
+        if len(outer) < SECTION_DEPTH - 1 or os.fstat(f.fileno()).st_size == 0:
+            return [(0, ())]
+        declared = re.match(rb"(?:\xef\xbb\xbf)?<\?xml[^>]*encoding=[\"']([\w.-]+)", f.read(200))
+        if declared and declared.group(1).lower() not in (b"utf-8", b"utf8"):
+            return [(0, ())]  # ranges are parsed without the declaration
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            sections = []
+            for section, paths in mapping.items():
+                opening = re.compile(rb"<%s[\s/>]" % re.escape(section.encode())).search(data)
+                if not opening:
+                    continue
+                end = data.find(b"</%s>" % section.encode(), opening.end())
+                if end < 0:
+                    continue
+                alternatives, contexts = [], []
+                for record_path in paths:
+                    tag = re.escape(record_path[-1].encode())
+                    first = re.compile(rb"\n([ \t]*)<%s[\s/>]" % tag).search(data, opening.end(), end)
+                    if first:
+                        alternatives.append(rb"\n%s(<)%s[\s/>]" % (re.escape(first.group(1)), tag))
+                        contexts.append(outer + (section,) + record_path[:-1])
+                if alternatives:
+                    sections.append((opening.end(), end, re.compile(b"|".join(alternatives)), contexts))
+            sections.sort()
+
+            def next_cut(offset: int) -> Optional[Tuple[int, Tuple[str, ...]]]:
+                for start, end, pattern, contexts in sections:
+                    if end > offset:
+                        match = pattern.search(data, max(offset, start), end)
+                        if match:
+                            return match.start(match.lastindex), contexts[match.lastindex - 1]
+                return None
+
+            cuts = [(0, ())]
+            for offset in range(range_bytes, len(data), range_bytes):
+                if offset <= cuts[-1][0]:
+                    continue
+                cut = next_cut(offset)
+                if cut is None:
+                    break
+                cuts.append(cut)
+    return cuts
+
+def _read_range(f, parser: ET.XMLPullParser, matcher: _RecordMatcher, end: Optional[int],
+        ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    # Feeds the report from f's position up to end, or to its end if None, and
+    # yields the records completed on the way
+    while not matcher.finished:
+        size = _READ_BLOCK if end is None else min(_READ_BLOCK, end - f.tell())
+        data = f.read(size) if size > 0 else b""
+        if not data:
+            if end is None:
+                parser.close()  # raises if the report is cut short
+                yield from matcher.records(parser.read_events())
+            return
+        parser.feed(data)
+        yield from matcher.records(parser.read_events())
+
+def _send(records: Iterator[Tuple[str, str, Dict[str, Any]]], chunk_size: int,
+          out: "multiprocessing.Queue") -> None:
+    chunk: List[Tuple[str, str, Dict[str, Any]]] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            out.put(chunk)
+            chunk = []
+    if chunk:
+        out.put(chunk)
+
+def _range_worker(path, mapping, ranges: List[Tuple[int, Tuple[str, ...], Optional[int], Tuple[str, ...]]],
+                  worker: int, workers: int, chunk_size: int, out: "multiprocessing.Queue") -> None:
+    try:
+        with open(path, "rb") as f:
+            for start, context, end, next_context in ranges[worker::workers]:
+                parser = ET.XMLPullParser(events=("start", "end"))
+                parser.feed("".join(f"<{tag}>" for tag in context).encode())
+                matcher = _RecordMatcher(mapping)
+                f.seek(start)
+                _send(_read_range(f, parser, matcher, end), chunk_size, out)
+                done = end is None or matcher.finished
+                if not done and (matcher.record_depth is not None or tuple(matcher.tags) != next_context):
+                    _send(_read_range(f, parser, matcher, None), chunk_size, out)
+                    done = True
+                out.put(_REPORT_DONE if done else _RANGE_DONE)
+                if done:
+                    return
+    except ET.ParseError as e:
+        out.put(e)
+
+def iter_records_parallel(source, workers: int, mapping: Optional[Dict[str, List[Tuple[str, ...]]]] = None,
+                          chunk_size: int = 256, prefetch: int = 8, range_bytes: int = 1 << 20,
+        ) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    # Drop-in replacement for iter_records that reads ranges of the report in worker
+    # processes. At most prefetch chunks per worker are in flight, so memory stays bounded.
+    mapping = load_mapping() if mapping is None else mapping
+    cuts = _cut_report(source, mapping, range_bytes) if workers > 1 and isinstance(source, (str, os.PathLike)) else []
+    if len(cuts) <= 1:
+        yield from iter_records(source, mapping)
+        return
+
+    ranges = [
+        (start, context) + (cuts[k + 1] if k + 1 < len(cuts) else (None, ()))
+        for k, (start, context) in enumerate(cuts)
+    ]
+    workers = min(workers, len(ranges))
+    queues = [multiprocessing.Queue(maxsize=prefetch) for _ in range(workers)]
+    procs = [
+        multiprocessing.Process(target=_range_worker, args=(source, mapping, ranges, k, workers, chunk_size, queues[k]),
+                                daemon=True)
+        for k in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    try:
+        for k in range(len(ranges)):
+            worker = k % workers
+            while True:
+                try:
+                    item = queues[worker].get(timeout=1)
+                except queue.Empty:
+                    if procs[worker].exitcode not in (None, 0):
+                        raise RuntimeError(f"report reader worker {worker} exited with code {procs[worker].exitcode}")
+                    continue
+                if isinstance(item, ET.ParseError):
+                    raise item
+                if item == _RANGE_DONE:
+                    break
+                if item == _REPORT_DONE:
+                    return
+                yield from item
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.join()
@@ -0,0 +1,417 @@
+# Columnar graph files: the graph written column by column into one file that can be
+# copied between machines, restored into SQLite without re-parsing the Design Report,
+# or memory-mapped and queried read-only in place (see GraphSnapshot(graph_file=...)).
+#
+#   python graph_file.py export data/graph.db solution.fmgraph
+#   python graph_file.py restore solution.fmgraph data/graph.db
+#   python graph_file.py info solution.fmgraph
+#
+# Layout: MAGIC, the columns (each starting 8-byte aligned), a JSON footer describing
+# them, the footer's length as 8 little-endian bytes and MAGIC again. Fixed-width
+# columns are raw arrays in the byte order the footer records. Text and blob columns
+# are a heap of bytes plus an offsets column with one more entry than rows; nullable
+# ones also have a one-byte-per-row presence column. Integer columns use the smallest
+# unsigned type that holds their largest value.
+#
+# Edges are stored as CSR adjacency in both directions, like GraphSnapshot builds them:
+# the edges of the node at index i are out_targets[out_offsets[i]:out_offsets[i + 1]],
+# targets being node indexes. Details are stored compressed, with the same tag byte
+# as in the database, and the search text and promoted attributes are stored as well,
+# so a restore never has to decode details.
+
+import argparse
+import itertools
+import json
+import mmap
+import os
+import sqlite3
+import sys
+import time
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from models import NodeType, EdgeType
+import analytics
+import database
+
+MAGIC = b"FMGRAPH\x01"
+FORMAT_VERSION = 1
+RESTORE_BATCH = 50000
+
+class _Column:
+    # A text, hex or blob column read from a mapped file; indexes like a list
+    __slots__ = ("offsets", "heap", "present", "kind")
+
+    def __init__(self, offsets, heap, present, kind: str):
+        self.offsets = offsets
+        self.heap = heap
+        self.present = present
+        self.kind = kind
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> Any:
+        if self.present is not None and not self.present[i]:
+            return None
+        value = self.heap[self.offsets[i]:self.offsets[i + 1]]
+        if self.kind == "text":
+            return str(value, "utf-8")
+        return value.hex() if self.kind == "hex" else bytes(value)
+
+    def __iter__(self) -> Iterator[Any]:
+        # Walks the offsets pairwise, much faster than indexing row by row
+        heap, kind = self.heap, self.kind
+        present = self.present if self.present is not None else itertools.repeat(1)
+        for start, end, has_value in zip(self.offsets, self.offsets[1:], present):
+            if not has_value:
+                yield None
+            elif kind == "text":
+                yield str(heap[start:end], "utf-8")
+            else:
+                yield heap[start:end].hex() if kind == "hex" else bytes(heap[start:end])
+
+class GraphFile:
+    # A graph file opened read-only. Columns are views of the mapped file, so opening
+    # costs nothing per row and only the pages a query touches are read from disk.
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC or self._map[-len(MAGIC):] != MAGIC:
+            raise ValueError(f"{path} is not a graph file")
+        end = len(self._map) - len(MAGIC)
+        footer_length = int.from_bytes(self._map[end - 8:end], "little")
+        self.footer: Dict[str, Any] = json.loads(self._map[end - 8 - footer_length:end - 8])
+        if self.footer["format"] != FORMAT_VERSION:
+            raise ValueError(f"{path} has format {self.footer['format']}, expected {FORMAT_VERSION}")
+        data_end = end - 8 - footer_length
+        for name, (offset, length, _) in self.footer["columns"].items():
+            if offset < len(MAGIC) or offset + length > data_end:
+                raise ValueError(f"{path} is corrupt: column {name} lies outside the file's data")
+        self._view = memoryview(self._map)
+
+    @property
+    def node_count(self) -> int:
+        return self.footer["nodes"]
+
+    @property
+    def edge_count(self) -> int:
+        return self.footer["edges"]
+
+    def array(self, name: str):
+        # A fixed-width column as a memoryview of the file, or as a copy in native
+        # byte order when the file was written on a machine with the other one
+        offset, length, typecode = self.footer["columns"][name]
+        view = self._view[offset:offset + length]
+        if self.footer["byteorder"] == sys.byteorder:
+            return view.cast(typecode)
+        values = array(typecode, view)
+        values.byteswap()
+        return values
+
+    def column(self, name: str) -> _Column:
+        offset, length, kind = self.footer["columns"][name]
+        present = f"{name}.present"
+        return _Column(
+            self.array(f"{name}.offsets"), self._view[offset:offset + length],
+            self.array(present) if present in self.footer["columns"] else None, kind,
+        )
+
+    def node_types(self) -> List[str]:
+        return self.footer["node_types"]
+
+    def edge_types(self) -> List[str]:
+        return self.footer["edge_types"]
+
+    def close(self) -> None:
+        # Columns still referenced keep the mapping alive; it is unmapped when they go
+        try:
+            self._view.release()
+            self._map.close()
+        except BufferError:
+            pass
+
+# --- Export ---
+
+class _Writer:
+    def __init__(self, f):
+        self.f = f
+        self.columns: Dict[str, List[Any]] = {}
+        f.write(MAGIC)
+
+    def _align(self) -> int:
+        offset = self.f.tell()
+        if offset % 8:
+            self.f.write(b"\0" * (8 - offset % 8))
+        return self.f.tell()
+
+    def array(self, name: str, values: array) -> None:
+        values = _narrow(values)
+        offset = self._align()
+        values.tofile(self.f)
+        self.columns[name] = [offset, self.f.tell() - offset, values.typecode]
+
+    def heap(self, name: str, values: Iterable[Optional[bytes]], kind: str, nullable: bool = False) -> None:
+        # Streams the values into the file; only their offsets are kept in memory
+        offsets = array("q", [0])
+        present = array("B")
+        offset = self._align()
+        position = 0
+        for value in values:
+            if nullable:
+                present.append(value is not None)
+            if value:
+                self.f.write(value)
+                position += len(value)
+            offsets.append(position)
+        self.columns[name] = [offset, position, kind]
+        self.array(f"{name}.offsets", offsets)
+        if nullable:
+            self.array(f"{name}.present", present)
+
+    def finish(self, **footer: Any) -> None:
+        data = json.dumps(dict(footer, columns=self.columns)).encode()
+        self.f.write(data)
+        self.f.write(len(data).to_bytes(8, "little"))
+        self.f.write(MAGIC)
+
+def _narrow(values: array) -> array:
+    if values.typecode != "q":
+        return values
+    top = max(values, default=0)
+    for typecode in ("B", "H", "I"):
+        if top < 1 << (8 * array(typecode).itemsize):
+            return array(typecode, values)
+    return values
+
+def _text(value: Optional[str]) -> Optional[bytes]:
+    return None if value is None else value.encode()
+
+def _compressed(raw: Any) -> bytes:
+    # Stored details in their tagged compressed form; JSON text is compressed here
+    if isinstance(raw, bytes):
+        return raw
+    return b"z" + zlib.compress(raw.encode(), 6) if raw else b""
+
+def _codes(values: Iterable[str], known: List[str]) -> array:
+    # Type strings -> indexes into known, which grows with any type it lacks
+    index = {v: i for i, v in enumerate(known)}
+    codes = array("B")
+    for value in values:
+        code = index.get(value)
+        if code is None:
+            code = index[value] = len(known)
+            known.append(value)
+        codes.append(code)
+    return codes
+
+def _adjacency(out: _Writer, prefix: str, node_index: Dict[int, int], rows: Iterable[Tuple[int, int, str, int]],
+               edge_types: List[str]) -> int:
+    # rows: (source id, target id, type, edge id), ordered by source, target, type
+    # and id. Duplicate edges, which databases from before the unique index on
+    # edges can hold, are written once, as their oldest row.
+    offsets = array("q", [0]) * (len(node_index) + 1)
+    targets, edge_ids, types = array("q"), array("q"), []
+    previous = None
+    for source, target, type_value, edge_id in rows:
+        if (source, target, type_value) == previous:
+            continue
+        previous = (source, target, type_value)
+        offsets[node_index[source] + 1] += 1
+        targets.append(node_index[target])
+        edge_ids.append(edge_id)
+        types.append(type_value)
+    for i in range(len(node_index)):
+        offsets[i + 1] += offsets[i]
+    out.array(f"{prefix}_offsets", offsets)
+    out.array(f"{prefix}_targets", targets)
+    out.array(f"{prefix}_types", _codes(types, edge_types))
+    out.array(f"{prefix}_edge_ids", edge_ids)
+    return len(targets)
+
+def export(path: str, db_path: Optional[str] = None) -> Dict[str, Any]:
+    # Writes the graph to path through a temporary file, so a reader mapping an
+    # earlier version of path keeps its consistent copy. Returns the footer.
+    conn = database.open_connection(db_path or database.current_db_path())
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        # One read transaction, so every column comes from the same graph version
+        conn.execute("BEGIN")
+        meta = dict(conn.execute("SELECT key, value FROM meta").fetchall())
+        ids = array("q", (r[0] for r in conn.execute("SELECT id FROM nodes ORDER BY id")))
+        node_index = {node_id: i for i, node_id in enumerate(ids)}
+        node_types = [t.value for t in NodeType]
+        edge_types = [t.value for t in EdgeType]
+
+        def nodes(column: str) -> Iterator[Any]:
+            return (r[0] for r in conn.execute(f"SELECT {column} FROM nodes ORDER BY id"))
+
+        with open(tmp_path, "wb") as f:
+            out = _Writer(f)
+            out.array("id", ids)
+            out.array("type", _codes(nodes("type"), node_types))
+            out.heap("name", (_text(v) for v in nodes("name")), "text")
+            out.heap("filemaker_id", (_text(v) for v in nodes("filemaker_id")), "text", nullable=True)
+            out.heap("import_key", (_text(v) for v in nodes("import_key")), "text", nullable=True)
+            out.heap("content_hash", (v and bytes.fromhex(v) for v in nodes("content_hash")), "hex", nullable=True)
+            out.heap("details", (_compressed(v) for v in nodes("details")), "blob")
+            # Rows of nodes_fts in node order; nodes without one get an empty body
+            out.heap("search_body", (_text(r[0]) or b"" for r in conn.execute(
+                "SELECT f.body FROM nodes n LEFT JOIN nodes_fts f ON f.rowid = n.id ORDER BY n.id")), "text")
+
+            attributes = conn.execute("SELECT node_id, key, value FROM node_attrs ORDER BY node_id, rowid").fetchall()
+            out.array("attribute_node", array("q", (r[0] for r in attributes)))
+            out.heap("attribute_key", (_text(r[1]) for r in attributes), "text")
+            out.heap("attribute_value", (_text(r[2]) for r in attributes), "text", nullable=True)
+            del attributes
+
+            edges = _adjacency(out, "out", node_index, conn.execute(
+                "SELECT from_id, to_id, type, id FROM edges ORDER BY from_id, to_id, type, id"), edge_types)
+            _adjacency(out, "in", node_index, conn.execute(
+                "SELECT to_id, from_id, type, id FROM edges ORDER BY to_id, from_id, type, id"), edge_types)
+
+            # The analytics tables, when they are current, so a restore need not recompute them
+            reports = list(analytics.REPORTS)
+            has_analytics = "graph_version" in meta and meta.get("analytics_version") == meta["graph_version"]
+            if has_analytics:
+                degrees = conn.execute(
+                    "SELECT node_id, edge_type, in_degree, out_degree FROM node_degree ORDER BY node_id, edge_type"
+                ).fetchall()
+                out.array("degree_node", array("q", (r[0] for r in degrees)))
+                out.array("degree_type", _codes((r[1] for r in degrees), edge_types))
+                out.array("degree_in", array("q", (r[2] for r in degrees)))
+                out.array("degree_out", array("q", (r[3] for r in degrees)))
+                del degrees
+                out.array("component", array("q", (r[0] for r in conn.execute(
+                    "SELECT c.component FROM nodes n JOIN node_component c ON c.node_id = n.id ORDER BY n.id"))))
+                findings = conn.execute(
+                    "SELECT report, node_id, score FROM analytics_findings ORDER BY report, node_id"
+                ).fetchall()
+                out.array("finding_report", _codes((r[0] for r in findings), reports))
+                out.array("finding_node", array("q", (r[1] for r in findings)))
+                out.array("finding_score", array("d", (r[2] for r in findings)))
+                del findings
+
+            footer = dict(
+                format=FORMAT_VERSION, byteorder=sys.byteorder, nodes=len(ids), edges=edges,
+                node_types=node_types, edge_types=edge_types, reports=reports if has_analytics else None,
+                details_encoding=meta.get("details_encoding", "json"),
+                exported_at=time.time(),
+            )
+            out.finish(**footer)
+        os.replace(tmp_path, path)
+        return footer
+    finally:
+        conn.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+# --- Restore ---
+
+def _batches(rows: Iterable[Tuple[Any, ...]]) -> Iterator[List[Tuple[Any, ...]]]:
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, RESTORE_BATCH))
+        if not batch:
+            return
+        yield batch
+
+def restore(path: str, db_path: Optional[str] = None, details_encoding: Optional[str] = None) -> Dict[str, int]:
+    # Replaces the graph in db_path with the file's in one transaction, so a file that
+    # fails to load leaves the old graph in place. Details keep
+    # the file's encoding unless another is given. Returns the rows restored per table.
+    if db_path is not None and db_path != database.current_db_path():
+        with database.use_database(db_path):
+            return restore(path, db_path, details_encoding)
+    graph = GraphFile(path)
+    try:
+        encoding = details_encoding or graph.footer["details_encoding"]
+        tag = {"zlib": b"z", "zstd": b"s"}.get(encoding)
+
+        def stored(raw: bytes) -> Any:
+            # Blobs already in the target encoding are inserted as they are
+            if not raw:
+                return "{}"
+            if raw[:1] == tag:
+                return raw
+            return database.encode_details(database.details_text(raw))
+
+        ids = graph.array("id")
+        node_types, edge_types = graph.node_types(), graph.edge_types()
+        types = [node_types[code] for code in graph.array("type")]
+        counts: Dict[str, int] = {}
+
+        def insert(table: str, columns: str, rows: Iterable[Tuple[Any, ...]]) -> None:
+            sql = f"INSERT INTO {table} ({columns}) VALUES ({', '.join('?' * len(columns.split(',')))})"
+            for batch in _batches(rows):
+                conn.executemany(sql, batch)
+                counts[table] = counts.get(table, 0) + len(batch)
+
+        # The old graph is only gone once the whole file has loaded
+        reports = graph.footer["reports"]
+        with database.replacing_graph(encoding, with_analytics=reports is not None) as conn:
+            insert("nodes", "id, name, type, filemaker_id, details, import_key, content_hash", zip(
+                ids, graph.column("name"), types, graph.column("filemaker_id"),
+                map(stored, graph.column("details")), graph.column("import_key"), graph.column("content_hash"),
+            ))
+            insert("nodes_fts", "rowid, name, type, body", zip(
+                ids, graph.column("name"), types, graph.column("search_body")))
+            insert("node_attrs", "node_id, key, value", zip(
+                graph.array("attribute_node"), graph.column("attribute_key"), graph.column("attribute_value")))
+
+            offsets, targets = graph.array("out_offsets"), graph.array("out_targets")
+            edge_codes, edge_ids = graph.array("out_types"), graph.array("out_edge_ids")
+            insert("edges", "id, type, from_id, to_id", (
+                (edge_ids[k], edge_types[edge_codes[k]], ids[i], ids[targets[k]])
+                for i in range(graph.node_count) for k in range(offsets[i], offsets[i + 1])
+            ))
+
+            if reports is not None:
+                insert("node_degree", "node_id, edge_type, in_degree, out_degree", zip(
+                    graph.array("degree_node"), (edge_types[c] for c in graph.array("degree_type")),
+                    graph.array("degree_in"), graph.array("degree_out")))
+                insert("node_component", "node_id, component", zip(ids, graph.array("component")))
+                insert("analytics_findings", "report, node_id, score", zip(
+                    (reports[c] for c in graph.array("finding_report")),
+                    graph.array("finding_node"), graph.array("finding_score")))
+        if reports is None:
+            analytics.refresh()
+    finally:
+        graph.close()
+    return counts
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description="Export, restore or describe columnar graph files")
+    commands = cli.add_subparsers(dest="command", required=True)
+    export_cli = commands.add_parser("export", help="write a graph database to a graph file")
+    export_cli.add_argument("db")
+    export_cli.add_argument("path")
+    restore_cli = commands.add_parser("restore", help="replace a graph database's contents with a graph file")
+    restore_cli.add_argument("path")
+    restore_cli.add_argument("db")
+    restore_cli.add_argument("--details-encoding", choices=database.DETAILS_ENCODINGS,
+                             help="storage encoding for node details; defaults to the exported database's")
+    info_cli = commands.add_parser("info", help="print a graph file's footer")
+    info_cli.add_argument("path")
+    args = cli.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "export":
+        footer = export(args.path, args.db)
+        print(f"Exported {footer['nodes']} nodes and {footer['edges']} edges to {args.path} "
+              f"({os.path.getsize(args.path) / 2**20:.1f} MiB) in {time.perf_counter() - start:.2f}s")
+    elif args.command == "restore":
+        counts = restore(args.path, args.db, args.details_encoding)
+        print(f"Restored {counts.get('nodes', 0)} nodes and {counts.get('edges', 0)} edges into {args.db} "
+              f"in {time.perf_counter() - start:.2f}s")
+    else:
+        graph = GraphFile(args.path)
+        print(json.dumps({k: v for k, v in graph.footer.items() if k != "columns"}, indent=2))
+        for name, (offset, length, kind) in graph.footer["columns"].items():
+            print(f"  {name:<26} {kind:<5} {length / 2**20:10.2f} MiB")
+        graph.close()
+
+if __name__ == "__main__":
+    main()
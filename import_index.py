@@ -0,0 +1,66 @@
+# In-memory lookup tables the importer fills as it creates nodes, so cross-references
+# resolve with dict lookups instead of a database query per reference
+
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+from models import Node, NodeType
+
+class ImportIndex:
+    def __init__(self):
+        # (type, filemaker_id) -> (node id, name) and (type, name) -> node id.
+        # Only ids are kept, never details, so the index stays small.
+        self._by_filemaker_id: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self._by_name: Dict[Tuple[str, str], int] = {}
+        # Layouts name fields as "<table occurrence>::<field>", so fields are also kept
+        # per base table, and table occurrences map to their base table
+        self._fields_by_table: Dict[str, Dict[str, int]] = {}
+        self._occurrences: Dict[str, str] = {}
+        # Occurrences of tables in other files (through a data source), by name
+        self._external_occurrences: Dict[str, int] = {}
+        self.stats: Counter = Counter()
+
+    def add(self, node: Node) -> None:
+        # First node wins, matching what a "WHERE ... LIMIT 1" lookup returned
+        if node.filemaker_id is not None:
+            self._by_filemaker_id.setdefault((node.type.value, str(node.filemaker_id)), (node.id, node.name))
+        self._by_name.setdefault((node.type.value, node.name), node.id)
+
+    def by_filemaker_id(self, type: NodeType, filemaker_id) -> Optional[Node]:
+        hit = self._by_filemaker_id.get((type.value, str(filemaker_id)))
+        if hit is None:
+            self.stats["filemaker_id_misses"] += 1
+            return None
+        self.stats["filemaker_id_hits"] += 1
+        return Node(hit[1], type, id=hit[0], filemaker_id=str(filemaker_id))
+
+    def by_name(self, type: NodeType, name: str) -> Optional[Node]:
+        node_id = self._by_name.get((type.value, name))
+        if node_id is None:
+            self.stats["name_misses"] += 1
+            return None
+        self.stats["name_hits"] += 1
+        return Node(name, type, id=node_id)
+
+    def add_field(self, table_filemaker_id: str, field: Node) -> None:
+        self._fields_by_table.setdefault(str(table_filemaker_id), {}).setdefault(field.name, field.id)
+
+    def add_table_occurrence(self, name: str, base_table_filemaker_id: str) -> None:
+        self._occurrences.setdefault(name, str(base_table_filemaker_id))
+
+    def add_external_occurrence(self, occurrence: Node) -> None:
+        self._external_occurrences.setdefault(occurrence.name, occurrence.id)
+
+    def external_occurrence(self, name: str) -> Optional[Node]:
+        node_id = self._external_occurrences.get(name)
+        return None if node_id is None else Node(name, NodeType.REL_TABLE, id=node_id)
+
+    def field_by_occurrence(self, occurrence: str, field_name: str) -> Optional[Node]:
+        # Resolves "Contacts_Addresses::City" via the occurrence's base table
+        base_table = self._occurrences.get(occurrence)
+        field_id = self._fields_by_table.get(base_table, {}).get(field_name) if base_table else None
+        if field_id is None:
+            self.stats["field_ref_misses"] += 1
+            return None
+        self.stats["field_ref_hits"] += 1
+        return Node(field_name, NodeType.FIELD, id=field_id)
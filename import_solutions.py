@@ -0,0 +1,68 @@
+# Imports the Design Reports of many FileMaker files at once, each into its own
+# solution database (see database.SOLUTIONS_DIR). Solutions never share a database,
+# so the imports run concurrently without waiting on each other's write locks.
+#
+#   python import_solutions.py data/ddr/*.xml --jobs 4
+#   python import_solutions.py data/ddr/*.xml --incremental
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+import database
+import design_report
+import solutions
+
+PARSER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser-old.py")
+
+def import_one(xml: str, solution: str, extra: List[str]) -> Tuple[str, int, float, str]:
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, PARSER, xml, "--solution", solution, *extra],
+        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+    )
+    return solution, proc.returncode, time.perf_counter() - start, proc.stdout
+
+def main() -> None:
+    cli = argparse.ArgumentParser(description="Import several Design Reports, one solution database each")
+    cli.add_argument("xml", nargs="+", help="one Design Report XML per FileMaker file")
+    cli.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="imports running at once")
+    cli.add_argument("--incremental", action="store_true", help="passed on to each import")
+    args = cli.parse_args()
+
+    # Solutions are named after the file each report describes
+    names = {xml: database.solution_name(design_report.report_file_name(xml) or os.path.basename(xml))
+             for xml in args.xml}
+    duplicates = {n for n in names.values() if list(names.values()).count(n) > 1}
+    if duplicates:
+        sys.exit(f"several reports describe the same file: {', '.join(sorted(duplicates))}")
+
+    extra = ["--incremental"] if args.incremental else []
+    failed = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max(1, args.jobs)) as pool:
+        for solution, code, seconds, output in pool.map(lambda x: import_one(x, names[x], extra), args.xml):
+            status = "ok" if code == 0 else f"failed with exit code {code}"
+            print(f"{solution}: {status} in {seconds:.2f}s")
+            if code != 0:
+                failed += 1
+                print(output)
+    print(f"Imported {len(args.xml) - failed} of {len(args.xml)} solutions in {time.perf_counter() - start:.2f}s")
+
+    # Cross-file references can only be resolved once every file is imported
+    for solution in sorted(names.values()):
+        occurrences = solutions.external_occurrences(solution)
+        unresolved = [o for o in occurrences if o["base_table_id"] is None]
+        if occurrences:
+            print(f"{solution}: {len(occurrences)} occurrence(s) of other files' tables, {len(unresolved)} unresolved")
+        for o in unresolved:
+            print(f"  [warn] {o['occurrence']}: table {o['base_table']} not found in solution {o['solution']}")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# Writes parsed Design Report objects into the graph, either as a fresh import or
+# incrementally against what an earlier import left in the database
+
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import Node, NodeType, EdgeType
+from import_index import ImportIndex
+import database
+
+class Importer:
+    # Parsers hand every node to save() and every edge to link(). In a full import
+    # those are plain inserts. In an incremental import nodes are matched to the
+    # existing graph by (type, import_key): unchanged nodes are left alone, changed
+    # ones updated, and finish() deletes whatever the new report no longer has.
+    def __init__(self, incremental: bool = False):
+        self.incremental = incremental
+        self.index = ImportIndex()
+        self.summary: Counter = Counter()
+        self._existing_nodes: Dict[Tuple[str, str], Tuple[int, str]] = {}
+        self._existing_edges: Dict[Tuple[str, int, int], List[int]] = {}
+        self._existing_ids: set = set()
+        self._seen_nodes: set = set()
+        self._deferred: List[Tuple[Callable[..., Any], Tuple[Any, ...]]] = []
+        self._final_pass = False
+        if incremental:
+            for r in database.node_import_keys():
+                self._existing_ids.add(r["id"])
+                if r["import_key"] is not None:
+                    self._existing_nodes[(r["type"], r["import_key"])] = (r["id"], r["content_hash"])
+            for r in database.edge_find():
+                self._existing_edges.setdefault((r["type"], r["from_id"], r["to_id"]), []).append(r["id"])
+
+    def save(self, node: Node, key: Optional[str] = None) -> Node:
+        # key identifies the object across imports; it must be unique per node type
+        node.import_key = key or node.filemaker_id or node.name
+        existing = self._existing_nodes.get((node.type.value, node.import_key))
+
+        if existing is None:
+            node.save()
+            self.summary["nodes_added"] += 1
+        else:
+            node.id, old_hash = existing
+            self._seen_nodes.add(node.id)
+            details_hash = database.content_hash(node.name, node.filemaker_id, json.dumps(node.details))
+            if details_hash != old_hash:
+                node.save()
+                self.summary["nodes_updated"] += 1
+            else:
+                self.summary["nodes_unchanged"] += 1
+
+        self.index.add(node)
+        return node
+
+    def link(self, parent: Node, child: Node, rel_type: EdgeType) -> None:
+        existing = self._existing_edges.get((rel_type.value, parent.id, child.id))
+        if existing:
+            # Claimed, so finish() keeps it
+            existing.pop()
+            self.summary["edges_unchanged"] += 1
+        else:
+            parent.add_child(child, rel_type)
+            self.summary["edges_added"] += 1
+
+    def defer(self, parse: Callable[..., Any], *args: Any) -> bool:
+        # Parsers call this when a record references something not imported yet.
+        # The record is retried by run_deferred() once every section is in; there
+        # it returns False so the parser reports the reference as missing instead.
+        if self._final_pass:
+            return False
+        self._deferred.append((parse, args))
+        self.summary["records_deferred"] += 1
+        return True
+
+    def run_deferred(self) -> None:
+        self._final_pass = True
+        deferred, self._deferred = self._deferred, []
+        for parse, args in deferred:
+            parse(*args)
+
+    def finish(self) -> Counter:
+        # Only call after the whole report was read, or unread objects are deleted
+        if self.incremental:
+            stale = self._existing_ids - self._seen_nodes
+            # Edges of stale nodes cascade, so only the others need deleting
+            stale_edges = [
+                edge_id
+                for (_, from_id, to_id), ids in self._existing_edges.items()
+                if from_id not in stale and to_id not in stale
+                for edge_id in ids
+            ]
+            with database.bulk_insert():
+                self.summary["edges_deleted"] += database.edge_delete_many(stale_edges)
+                self.summary["nodes_deleted"] += database.node_delete_many(sorted(stale))
+        return self.summary
@@ -0,0 +1,159 @@
+# MCP tool server exposing the api.py operations to agents over stdio:
+#
+#   python mcp_server.py --db data/graph.db
+#   python mcp_server.py --solution Invoices
+#
+# Speaks JSON-RPC 2.0 with one message per line, which is the MCP stdio transport.
+# Only stdout carries protocol messages; diagnostics go to stderr.
+
+import argparse
+import json
+import sys
+import traceback
+from typing import Any, Dict, Optional
+
+import api
+import database
+
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+SERVER_INFO = {"name": "filemaker-mcp", "version": "0.1.0"}
+
+_IDS = {"type": "array", "items": {"type": "integer"}, "maxItems": api.MAX_BATCH}
+_FIELDS = {
+    "type": "array", "items": {"enum": list(api.NODE_FIELDS)},
+    "description": f"Node fields to return (default {', '.join(api.DEFAULT_FIELDS)}). "
+                   "details is the full Design Report record; attributes the promoted key/values.",
+}
+_NODE_TYPE = {"type": "string", "description": "Node type, e.g. Field, BaseTable, Layout"}
+_EDGE_TYPES = {"type": "array", "items": {"type": "string"}, "description": "Only follow these edge types"}
+_DIRECTION = {"enum": ["in", "out", "both"]}
+
+TOOLS = [
+    {
+        "name": "get_nodes",
+        "description": "Fetch nodes of the FileMaker solution graph by id, in the order given.",
+        "inputSchema": {"type": "object", "properties": {"ids": _IDS, "fields": _FIELDS}, "required": ["ids"]},
+    },
+    {
+        "name": "get_nodes_by_filemaker_id",
+        "description": "Fetch nodes by their FileMaker id. Ids repeat across object kinds, so pass a type.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"filemaker_ids": {"type": "array", "items": {"type": "string"}, "maxItems": api.MAX_BATCH},
+                           "type": _NODE_TYPE, "fields": _FIELDS},
+            "required": ["filemaker_ids"],
+        },
+    },
+    {
+        "name": "neighbors",
+        "description": "Parents (in) and children (out) of each node id, with the connecting edge types.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"ids": _IDS, "direction": _DIRECTION, "edge_types": _EDGE_TYPES, "fields": _FIELDS},
+            "required": ["ids"],
+        },
+    },
+    {
+        "name": "search",
+        "description": "Full-text search over node names and details, best matches first.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"q": {"type": "string"}, "type": _NODE_TYPE,
+                           "limit": {"type": "integer", "maximum": api.MAX_LIMIT}, "offset": {"type": "integer"},
+                           "fields": _FIELDS},
+            "required": ["q"],
+        },
+    },
+    {
+        "name": "traverse",
+        "description": "Everything reachable from a node, nearest first, e.g. direction in to find what "
+                       "depends on a field. Each result has its depth and the id path that reached it.",
+        "inputSchema": {
+            "type": "object",
+            "properties": {"id": {"type": "integer"}, "direction": _DIRECTION, "edge_types": _EDGE_TYPES,
+                           "max_depth": {"type": "integer", "maximum": api.MAX_DEPTH},
+                           "limit": {"type": "integer", "maximum": api.MAX_LIMIT}, "offset": {"type": "integer"},
+                           "fields": _FIELDS},
+            "required": ["id"],
+        },
+    },
+]
+
+class RpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+def call_tool(name: str, arguments: Dict[str, Any]) -> Dict[str, Any]:
+    # Invalid arguments are a tool error the agent can read and correct, not a protocol error
+    try:
+        results = list(api.call(name, arguments))
+    except api.ApiError as e:
+        return {"content": [{"type": "text", "text": str(e)}], "isError": True}
+    return {"content": [{"type": "text", "text": api.dumps(results)}], "isError": False}
+
+def handle(method: str, params: Dict[str, Any]) -> Any:
+    if method == "initialize":
+        requested = params.get("protocolVersion")
+        return {
+            "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": SERVER_INFO,
+        }
+    if method == "ping":
+        return {}
+    if method == "tools/list":
+        return {"tools": TOOLS}
+    if method == "tools/call":
+        name = params.get("name")
+        if name not in api.OPERATIONS:
+            raise RpcError(-32602, f"unknown tool {name!r}")
+        return call_tool(name, params.get("arguments") or {})
+    raise RpcError(-32601, f"method not found: {method}")
+
+def respond(message: Any) -> Optional[Dict[str, Any]]:
+    # The response to one JSON-RPC message, or None for notifications
+    if not isinstance(message, dict) or message.get("jsonrpc") != "2.0" or "method" not in message:
+        return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "invalid request"}}
+    is_request = "id" in message
+    try:
+        result = handle(message["method"], message.get("params") or {})
+    except RpcError as e:
+        error = {"code": e.code, "message": str(e)}
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        error = {"code": -32603, "message": f"internal error: {e}"}
+    else:
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result} if is_request else None
+    return {"jsonrpc": "2.0", "id": message["id"], "error": error} if is_request else None
+
+def serve(stdin=sys.stdin, stdout=sys.stdout) -> None:
+    for line in stdin:
+        if not line.strip():
+            continue
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            response = {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "parse error"}}
+        else:
+            if isinstance(message, list):
+                response = [r for r in (respond(m) for m in message) if r is not None] or None
+            else:
+                response = respond(message)
+        if response is not None:
+            stdout.write(api.dumps(response) + "\n")
+            stdout.flush()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--db", default=database.DB_PATH, help="graph database written by the parser")
+    parser.add_argument("--solution", help="serve this solution's database instead of --db")
+    args = parser.parse_args()
+    if args.solution:
+        args.db = database.solution_path(args.solution)
+    database.DB_PATH = args.db
+    database.init_db(db_path=args.db)
+    serve()
+
+if __name__ == "__main__":
+    main()
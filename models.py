@@ -1,6 +1,5 @@
 from enum import Enum
-from typing import Any, Dict, List, Optional, Tuple
-import json
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 import database
 
 class NodeType(str, Enum):
@@ -12,6 +11,7 @@ class NodeType(str, Enum):
     RELATIONSHIP    = "Relationship"
     LAYOUT          = "Layout"
     LAYOUT_OBJECT   = "LayoutObject"
+    DATA_SOURCE     = "DataSource"
 
 class EdgeType(str, Enum):
     UNKNOWN         = "Unknown"
@@ -20,56 +20,82 @@ class EdgeType(str, Enum):
     CONTAINS        = "Contains"
     USED_BY         = "UsedBy"
 
+class NodeHeader(NamedTuple):
+    # What list views need; never touches the details column
+    id: int
+    name: str
+    type: NodeType
+    filemaker_id: Optional[str]
+
 class Node:
+    __slots__ = ("id", "name", "type", "filemaker_id", "import_key", "_details", "_raw_details")
+
     def __init__(self, name: str, type: NodeType = NodeType.UNKNOWN,
                  details: Optional[Dict[str, Any]] = None, id: Optional[int] = None,
-                 filemaker_id: Optional[str] = None):
+                 filemaker_id: Optional[str] = None, import_key: Optional[str] = None):
         self.id = id
         self.name = name
         self.type = type
         self.filemaker_id = filemaker_id
-        self.details = details or {}
+        self._details = details or {}
+        self._raw_details = None
+        # Stable identity across imports (see importer.Importer); None for hand-made nodes
+        self.import_key = import_key
+
+    @property
+    def details(self) -> Dict[str, Any]:
+        # Hydrated nodes keep the stored JSON text and decode it on first access.
+        # Nodes loaded without details fetch them from the database here instead.
+        if self._details is None:
+            raw = self._raw_details
+            if raw is None and self.id is not None:
+                raw = database.node_get_details(self.id)
+            self._details = database.decode_details(raw)
+            self._raw_details = None
+        return self._details
+
+    @details.setter
+    def details(self, value: Dict[str, Any]) -> None:
+        self._details = value
+        self._raw_details = None
 
     def save(self) -> int:
         if self.id is None:
-            self.id = database.node_insert(self.name, self.type.value, self.details, self.filemaker_id)
+            self.id = database.node_insert(self.name, self.type.value, self.details, self.filemaker_id, self.import_key)
         else:
-            database.node_update(self.id, self.name, self.type.value, self.details, self.filemaker_id)
+            database.node_update(self.id, self.name, self.type.value, self.details, self.filemaker_id, self.import_key)
         return self.id
 
-    def add_child(self, child: "Node", rel_type: EdgeType = EdgeType.UNKNOWN) -> int:
+    def add_child(self, child: "Node", rel_type: EdgeType = EdgeType.UNKNOWN) -> Optional[int]:
+        # The edge's id, or None inside bulk_insert (see database.edge_insert)
         if self.id is None:
             self.save()
         if child.id is None:
             child.save()
         return database.edge_insert(rel_type.value, self.id, child.id)
 
-    def get_children(self) -> List[Tuple["Node", EdgeType, int]]:
-        rows = database.children_of(self.id)
-        return [(
-            Node(
-                id=r["id"],
-                name=r["name"],
-                type=NodeType(r["type"]),
-                filemaker_id=r["filemaker_id"],
-                details=json.loads(r["details"]) if r["details"] else {},
-            ),
-            EdgeType(r["edge_type"]),
-            r["edge_id"],
-        ) for r in rows]
+    def get_children(self, with_details: bool = True) -> List[Tuple["Node", EdgeType, int]]:
+        rows = database.children_of(self.id, with_details)
+        return [(Node._from_row(r), EdgeType(r["edge_type"]), r["edge_id"]) for r in rows]
+
+    def get_parents(self, with_details: bool = True) -> List[Tuple["Node", EdgeType, int]]:
+        rows = database.parents_of(self.id, with_details)
+        return [(Node._from_row(r), EdgeType(r["edge_type"]), r["edge_id"]) for r in rows]
 
-    def get_parents(self) -> List[Tuple["Node", EdgeType, int]]:
-        rows = database.parents_of(self.id)
+    def traverse(self, direction: str = "out", edge_types: Optional[List[EdgeType]] = None,
+                 max_depth: int = 5, limit: int = -1, offset: int = 0,
+                 ) -> List[Tuple["Node", int, List[int], EdgeType]]:
+        # Every node reachable from this one as (node, depth, id path from self, last edge type)
+        rows = database.traverse(
+            self.id, direction,
+            [t.value for t in edge_types] if edge_types else None,
+            max_depth, limit, offset,
+        )
         return [(
-            Node(
-                id=r["id"],
-                name=r["name"],
-                type=NodeType(r["type"]),
-                filemaker_id=r["filemaker_id"],
-                details=json.loads(r["details"]) if r["details"] else {},
-            ),
+            Node._from_row(r),
+            r["depth"],
+            [int(i) for i in r["path"].strip(",").split(",")],
             EdgeType(r["edge_type"]),
-            r["edge_id"],
         ) for r in rows]
 
     @classmethod
@@ -77,43 +103,80 @@ class Node:
         row = database.node_get_by_id(node_id)
         if not row:
             return None
-        return cls(
-            id=row["id"],
-            name=row["name"],
-            type=NodeType(row["type"]),
-            filemaker_id=row["filemaker_id"],
-            details=json.loads(row["details"]) if row["details"] else {},
-        )
+        return cls._from_row(row)
 
     @classmethod
     def load_by_filemaker_id(cls, filemaker_id: str) -> Optional["Node"]:
         row = database.node_get_by_filemaker_id(filemaker_id)
         if not row:
             return None
-        return cls(
-            id=row["id"],
-            name=row["name"],
-            type=NodeType(row["type"]),
-            filemaker_id=row["filemaker_id"],
-            details=json.loads(row["details"]) if row["details"] else {},
-        )
+        return cls._from_row(row)
+
+    @classmethod
+    def load_many(cls, node_ids: List[int], with_details: bool = True) -> Dict[int, "Node"]:
+        return {r["id"]: cls._from_row(r) for r in database.node_get_many(node_ids, with_details)}
+
+    @classmethod
+    def load_many_by_filemaker_id(cls, filemaker_ids: List[str], type: Optional[NodeType] = None,
+                                  with_details: bool = True) -> List["Node"]:
+        rows = database.node_get_many_by_filemaker_id(filemaker_ids, type.value if type else None, with_details)
+        return [cls._from_row(r) for r in rows]
+
+    @classmethod
+    def children_of_many(cls, node_ids: List[int], with_details: bool = True,
+        ) -> Dict[int, List[Tuple["Node", EdgeType, int]]]:
+        # One query for the children of every id, grouped by parent id
+        return cls._group_neighbors(node_ids, database.children_of_many(node_ids, with_details))
+
+    @classmethod
+    def parents_of_many(cls, node_ids: List[int], with_details: bool = True,
+        ) -> Dict[int, List[Tuple["Node", EdgeType, int]]]:
+        return cls._group_neighbors(node_ids, database.parents_of_many(node_ids, with_details))
+
+    @classmethod
+    def _group_neighbors(cls, node_ids: List[int], rows) -> Dict[int, List[Tuple["Node", EdgeType, int]]]:
+        grouped: Dict[int, List[Tuple[Node, EdgeType, int]]] = {node_id: [] for node_id in node_ids}
+        for r in rows:
+            grouped[r["source_id"]].append((cls._from_row(r), EdgeType(r["edge_type"]), r["edge_id"]))
+        return grouped
+
+    @classmethod
+    def _from_row(cls, row) -> "Node":
+        # Skips __init__; details stay undecoded (or unfetched, if the row has none)
+        node = cls.__new__(cls)
+        node.id = row["id"]
+        node.name = row["name"]
+        node.type = NodeType(row["type"])
+        node.filemaker_id = row["filemaker_id"]
+        node.import_key = None
+        node._details = None
+        try:
+            node._raw_details = row["details"]
+        except IndexError:
+            node._raw_details = None
+        return node
 
     @classmethod
-    def find(cls, where: Optional[str] = None, params: Tuple[Any, ...] = (),
+    def find(cls, where: Optional[str] = None, params: Tuple[Any, ...] = (), with_details: bool = True,
         ) -> List["Node"]:
-        rows = database.node_find(where, params)
-        return [
-            cls(
-                id=r["id"],
-                name=r["name"],
-                type=NodeType(r["type"]),
-                filemaker_id=r["filemaker_id"],
-                details=json.loads(r["details"]) if r["details"] else {},
-            )
-            for r in rows
-        ]
+        rows = database.node_find(where, params, with_details)
+        return [cls._from_row(r) for r in rows]
+
+    @classmethod
+    def find_by_attributes(cls, type: NodeType, with_details: bool = True, **attributes: Any) -> List["Node"]:
+        # Filters on database.PROMOTED_ATTRIBUTES in SQL, e.g.
+        # Node.find_by_attributes(NodeType.FIELD, field_type="Calculated")
+        rows = database.node_find_by_attributes(type.value, attributes, with_details)
+        return [cls._from_row(r) for r in rows]
+
+    @classmethod
+    def find_headers(cls, where: Optional[str] = None, params: Tuple[Any, ...] = ()) -> List[NodeHeader]:
+        rows = database.node_find(where, params, with_details=False)
+        return [NodeHeader(r["id"], r["name"], NodeType(r["type"]), r["filemaker_id"]) for r in rows]
 
 class Edge:
+    __slots__ = ("id", "type", "from_id", "to_id")
+
     def __init__(self, type: EdgeType = EdgeType.UNKNOWN, from_id: int = 0,
                  to_id: int = 0, id: Optional[int] = None):
         self.id = id
@@ -124,6 +187,8 @@ class Edge:
     def save(self) -> int:
         if self.id is None:
             self.id = database.edge_insert(self.type.value, self.from_id, self.to_id)
+            if self.id is None:  # buffered by bulk_insert
+                self.id = database.edge_id(self.type.value, self.from_id, self.to_id)
         else:
             database.edge_update(self.id, self.type.value, self.from_id, self.to_id)
         return self.id
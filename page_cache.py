@@ -0,0 +1,66 @@
+# Bounded LRU cache of rendered responses, valid for one graph version
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class PageCache:
+    # Entries belong to a scope (the database a page was rendered from) and are only
+    # returned for the graph version they were stored under. Each scope has its own
+    # version; the first lookup with a newer one drops that scope's entries at once.
+    # The size bound and LRU order are shared by all scopes.
+    def __init__(self, max_entries: int = 1000):
+        self.max_entries = max_entries
+        self.versions: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries: "OrderedDict[Tuple[Hashable, Hashable], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, scope: Hashable, version: int) -> None:
+        if version != self.versions.get(scope):
+            stale = [key for key in self._entries if key[0] == scope]
+            if stale:
+                self.invalidations += 1
+            for key in stale:
+                del self._entries[key]
+            self.versions[scope] = version
+
+    def get(self, key: Hashable, version: int, scope: Hashable = None) -> Optional[Any]:
+        with self._lock:
+            self._check_version(scope, version)
+            value = self._entries.get((scope, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((scope, key))
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, version: int, value: Any, scope: Hashable = None) -> None:
+        with self._lock:
+            current = self.versions.get(scope)
+            if current is not None and version < current:
+                return  # rendered before a change another request already saw
+            self._check_version(scope, version)
+            self._entries[(scope, key)] = value
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "versions": {str(scope): version for scope, version in self.versions.items()},
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
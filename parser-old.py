@@ -1,53 +1,73 @@
 # Converts the FileMaker Design Report XML to Nodes and adds them to the graph database
 
-import xml.etree.ElementTree as ET
-import xmltodict
+import argparse
+import itertools
 import json
+import os
 
 from models import Node, NodeType, EdgeType
+from importer import Importer
+from profiling import Profiler
+import analytics
 import database
+import design_report
+
+
+cli = argparse.ArgumentParser(description="Import a FileMaker Design Report into the graph database")
+cli.add_argument("xml", nargs="?", default="data/Example.xml")
+cli.add_argument("--incremental", action="store_true",
+                 help="update the existing graph in place instead of rebuilding it")
+cli.add_argument("--workers", type=int, default=1,
+                 help="processes converting XML records; the database is still written by this one")
+cli.add_argument("--db", default=database.DB_PATH)
+cli.add_argument("--solution", nargs="?", const="", metavar="NAME",
+                 help="import into this solution's own database under " + database.SOLUTIONS_DIR
+                      + "; without a NAME it is taken from the report's File name")
+cli.add_argument("--details-encoding", choices=database.DETAILS_ENCODINGS,
+                 help="storage encoding for node details; defaults to the database's current one")
+cli.add_argument("--report", metavar="PATH",
+                 help="where to write the JSON run report; defaults to <db>.import-report.json")
+cli.add_argument("--profile-db", action="store_true",
+                 help="add per-function and per-statement database timings and slow query plans to the report")
+cli.add_argument("--slow-query-ms", type=float, default=50,
+                 help="statements slower than this get their query plan captured (with --profile-db)")
+cli.add_argument("--cprofile", metavar="PATH", help="dump cProfile stats of the parse phase to PATH")
+args = cli.parse_args()
+
+XML_PATH = args.xml
+if args.solution is not None:
+    args.solution = args.solution or database.solution_name(design_report.report_file_name(XML_PATH) or "")
+    args.db = database.solution_path(args.solution)
+database.DB_PATH = args.db
+
+profiler = Profiler(slow_query_seconds=args.slow_query_ms / 1000)
+if args.profile_db:
+    profiler.instrument_database()
+
+# A full import rebuilds the graph; an incremental one diffs against it
+with profiler.phase("init_db"):
+    database.init_db(reset=not args.incremental, db_path=args.db, details_encoding=args.details_encoding)
+
+# Every node the importer creates is indexed so references resolve without queries
+with profiler.phase("load_existing"):
+    importer = Importer(incremental=args.incremental)
+index = importer.index
 
 
-
-use_backup = False
-
-if use_backup:
-    import os, shutil
-    if os.path.exists("data/graph.db"):
-        os.remove("data/graph.db")
-        shutil.copy("data/graph.db.bak", "data/graph.db")
-        database.init_db(reset=False)
-else:
-    database.init_db(reset=True)
-
-
-
-
-
-
-tree = ET.parse("data/Example.xml")
-root = tree.getroot()
-
-
-
-def output(some_json: dict):
-    with open(f"data/test.json", "w") as f:
-        f.write(json.dumps(some_json, indent=2))
-
 def as_list(x):
     if x is None:
         return []
     return x if isinstance(x, list) else [x]
 
-def parse_BaseTableCatalog(json_dict):
-    catalog = json_dict.get("BaseTableCatalog", {})
-    tables  = as_list(catalog.get("BaseTable"))
+# Each parse_<Section> function consumes the (record_path, record) pairs streamed
+# for its section by design_report.iter_records, in document order.
 
-    for table in tables:
+def parse_BaseTableCatalog(records):
+    for _, table in records:
         # save table node with FileMaker ID
         table_filemaker_id = table.get("@id")
         table_node = Node(table["@name"], NodeType.BASE_TABLE, table, filemaker_id=table_filemaker_id)
-        table_node.save()
+        importer.save(table_node)
 
         # get fields safely (could be missing/None or a single dict)
         field_catalog = table.get("FieldCatalog") or {}
@@ -60,158 +80,214 @@ def parse_BaseTableCatalog(json_dict):
         for field in fields:
             field_filemaker_id = field.get("@id")
             field_node = Node(field["@name"], NodeType.FIELD, field, filemaker_id=field_filemaker_id)
-            field_node.save()
-            table_node.add_child(field_node, EdgeType.CONTAINS)
-
-
-def parse_BaseDirectoryCatalog(json_dict):
-    pass
-
-
-def parse_RelationshipGraph(json_dict):
-    graph = json_dict.get("RelationshipGraph", {})
-    tables = as_list(graph.get("TableList", {}).get("Table"))
-
-    for table in tables:
-
-        base_id = table["@baseTableId"]
+            # Field ids are only unique within their table
+            importer.save(field_node, key=f"{table_filemaker_id}.{field_filemaker_id}")
+            importer.link(table_node, field_node, EdgeType.CONTAINS)
+            index.add_field(table_filemaker_id, field_node)
+
+
+def parse_BaseDirectoryCatalog(records):
+    # External data sources: other FileMaker files whose tables this file's
+    # relationship graph can show. solutions.py resolves them across solutions.
+    for _, source in records:
+        source_node = Node(source.get("@name") or source.get("@id") or "DataSource", NodeType.DATA_SOURCE, source,
+                           filemaker_id=source.get("@id"))
+        importer.save(source_node)
+
+
+def data_source_reference(table):
+    # (id, name) of the data source a table occurrence's base table comes from, or None
+    for tag in ("FileReference", "BaseDirectory", "DataSource"):
+        ref = table.get(tag)
+        if isinstance(ref, dict):
+            return ref.get("@id"), ref.get("@name")
+    if table.get("@dataSource"):
+        return None, table["@dataSource"]
+    return None
+
+
+def parse_RelationshipGraph(records):
+    # TableList comes before RelationshipList in the report, so every RelTable
+    # exists by the time the relationships referencing it are streamed
+    for path, record in records:
+        if path == "TableList.Table":
+            parse_RelTable(record)
+        elif path == "RelationshipList.Relationship":
+            parse_Relationship(record)
+
+
+def parse_RelTable(table):
+    base_id = table["@baseTableId"]
+
+    # Find the BaseTable node by FileMaker ID, or for a table of another file, the
+    # data source it comes through (its base table id is that file's, not ours)
+    source = data_source_reference(table)
+    if source:
+        source_id, source_name = source
+        table_node = (index.by_filemaker_id(NodeType.DATA_SOURCE, source_id) if source_id else None) \
+            or index.by_name(NodeType.DATA_SOURCE, source_name)
+    else:
+        table_node = index.by_filemaker_id(NodeType.BASE_TABLE, base_id)
+    if not table_node:
+        if importer.defer(parse_RelTable, table):
+            return
+        missing = f"Data source {source[1] or source[0]}" if source else f"BaseTable id {base_id}"
+        print(f"[warn] {missing} not found for rel table {table.get('@name')}")
+        return
+
+    # Create a node for the relationship-graph table instance with FileMaker ID
+    rel_table_filemaker_id = table.get("@id")
+    rel_table_node = Node(table["@name"], NodeType.REL_TABLE, table, filemaker_id=rel_table_filemaker_id)
+    importer.save(rel_table_node)
+    if source:
+        index.add_external_occurrence(rel_table_node)
+    else:
+        index.add_table_occurrence(rel_table_node.name, base_id)
+
+    # Make BaseTable (or DataSource) -> RelTable a parent relationship
+    importer.link(table_node, rel_table_node, EdgeType.PARENT)
+
+
+def parse_Relationship(rel):
+    left_name  = rel["LeftTable"]["@name"]
+    right_name = rel["RightTable"]["@name"]
+
+    # Find left/right REL_TABLE nodes by name
+    left_table_node = index.by_name(NodeType.REL_TABLE, left_name)
+    right_table_node = index.by_name(NodeType.REL_TABLE, right_name)
+
+    if (not left_table_node or not right_table_node) and importer.defer(parse_Relationship, rel):
+        return
+    if not left_table_node:
+        print(f"[warn] Left REL_TABLE '{left_name}' not found for relationship")
+        return
+    if not right_table_node:
+        print(f"[warn] Right REL_TABLE '{right_name}' not found for relationship")
+        return
+
+    # Create ONE relationship node for this relationship
+    rel_filemaker_id = rel.get("@id")
+    rel_node = Node(f"{left_name}->{right_name}", NodeType.RELATIONSHIP, rel, filemaker_id=rel_filemaker_id)
+    importer.save(rel_node)
+
+    # Connect relationship to both tables
+    importer.link(left_table_node, rel_node, EdgeType.PARENT)
+    importer.link(rel_node, right_table_node, EdgeType.PARENT)
+
+    # Process each join predicate to connect the relationship to the fields
+    join_predicates = rel["JoinPredicateList"]["JoinPredicate"]
+    if type(join_predicates) != list: 
+        join_predicates = [join_predicates]
+
+    for predicate in join_predicates:
+        for side in ("LeftField", "RightField"):
+            field = predicate[side]["Field"]
+            occurrence, field_name = field.get("@table", ""), field.get("@name", "")
+            # Field ids are only unique within a table, so the field is found through
+            # the predicate's occurrence and its name; fields of another file's tables
+            # stand for their occurrence, as they do on layouts
+            field_node = index.external_occurrence(occurrence) \
+                or index.field_by_occurrence(occurrence, field_name)
 
-        # Find the BaseTable node by FileMaker ID (much faster than JSON extraction)
-        table_node = Node.load_by_filemaker_id(str(base_id))
-        if not table_node:
-            print(f"[warn] BaseTable id {base_id} not found for rel table {table.get('@name')}")
+            # Connect relationship to the fields used in this predicate
+            if field_node:
+                importer.link(rel_node, field_node, EdgeType.USED_BY)
+            else:
+                print(f"[warn] {side} {occurrence}::{field_name} (ID {field.get('@id')}) not found for relationship")
+
+
+def split_objects(value):
+    # Returns value without the layout objects nested in it (portal rows, group and
+    # tab panel members, ...) and those objects, which become nodes of their own
+    if isinstance(value, list):
+        parts = [split_objects(v) for v in value]
+        return [own for own, _ in parts], [o for _, nested in parts for o in nested]
+    if not isinstance(value, dict):
+        return value, []
+    own, nested = {}, []
+    for key, child in value.items():
+        if key == "Object":
+            nested.extend(as_list(child))
+        else:
+            own[key], found = split_objects(child)
+            nested.extend(found)
+    return own, nested
+
+
+def field_reference(obj):
+    # (table occurrence, field name) a field object shows, or None
+    field_obj = obj.get("FieldObj")
+    if not isinstance(field_obj, dict):
+        return None
+    ddr_field = (field_obj.get("DDRInfo") or {}).get("Field")
+    if isinstance(ddr_field, dict) and ddr_field.get("@table") and ddr_field.get("@name"):
+        return ddr_field["@table"], ddr_field["@name"]
+    name = field_obj.get("Name")
+    if isinstance(name, str) and "::" in name:
+        occurrence, field_name = name.split("::", 1)
+        return occurrence, field_name
+    return None
+
+
+def parse_LayoutObjects(object_list, parent_node: Node, layout_node: Node, key_prefix: str):
+    for position, obj in enumerate(object_list):
+        if not isinstance(obj, dict):
             continue
+        details, nested = split_objects(obj)
+        reference = field_reference(obj)
 
-        # Create a node for the relationship-graph table instance with FileMaker ID
-        rel_table_filemaker_id = table.get("@id")
-        rel_table_node = Node(table["@name"], NodeType.REL_TABLE, table, filemaker_id=rel_table_filemaker_id)
-        rel_table_node.save()
-
-        # Make BaseTable -> RelTable a parent relationship
-        table_node.add_child(rel_table_node, EdgeType.PARENT)
-
-    relationships = as_list(graph.get("RelationshipList", {}).get("Relationship"))
-
-    for rel in relationships:
-        left_name  = rel["LeftTable"]["@name"]
-        right_name = rel["RightTable"]["@name"]
-
-        # Find left/right REL_TABLE nodes by name
-        left_table_nodes = Node.find(
-            where="type = ? AND name = ?",
-            params=(NodeType.REL_TABLE.value, left_name),
-        )
-        right_table_nodes = Node.find(
-            where="type = ? AND name = ?",
-            params=(NodeType.REL_TABLE.value, right_name),
-        )
-        
-        if not left_table_nodes:
-            print(f"[warn] Left REL_TABLE '{left_name}' not found for relationship")
-            continue
-        if not right_table_nodes:
-            print(f"[warn] Right REL_TABLE '{right_name}' not found for relationship")
-            continue
+        # Objects are keyed by their path in the layout, so keys stay unique per layout
+        key = f"{key_prefix}.{position}"
+        name = obj.get("@name") or (f"{reference[0]}::{reference[1]}" if reference else obj.get("@type", "Object"))
+        obj_node = Node(name, NodeType.LAYOUT_OBJECT, details, filemaker_id=obj.get("@key"))
+        importer.save(obj_node, key=key)
+        # Relate the object to the layout, or to the portal/group/panel containing it
+        importer.link(parent_node, obj_node, EdgeType.PARENT)
 
-        left_table_node = left_table_nodes[0]
-        right_table_node = right_table_nodes[0]
+        if reference:
+            link_field_reference(obj_node, layout_node, *reference)
 
-        # Create ONE relationship node for this relationship
-        rel_filemaker_id = rel.get("@id")
-        rel_node = Node(f"{left_name}->{right_name}", NodeType.RELATIONSHIP, rel, filemaker_id=rel_filemaker_id)
-        rel_node.save()
+        parse_LayoutObjects(nested, obj_node, layout_node, key)
 
-        # Connect relationship to both tables
-        left_table_node.add_child(rel_node, EdgeType.PARENT)
-        rel_node.add_child(right_table_node, EdgeType.PARENT)
 
-        # Process each join predicate to connect the relationship to the fields
-        join_predicates = rel["JoinPredicateList"]["JoinPredicate"]
-        if type(join_predicates) != list: 
-            join_predicates = [join_predicates]
+def link_field_reference(obj_node: Node, layout_node: Node, occurrence: str, field_name: str):
+    field_node = index.field_by_occurrence(occurrence, field_name)
+    # Fields of another file's tables are not in this graph; the object uses the
+    # occurrence instead, which solutions.py resolves to that file's base table
+    field_node = field_node or index.external_occurrence(occurrence)
+    if field_node:
+        importer.link(obj_node, field_node, EdgeType.USED_BY)
+    elif not importer.defer(link_field_reference, obj_node, layout_node, occurrence, field_name):
+        print(f"[warn] Field {occurrence}::{field_name} not found for an object on layout {layout_node.name}")
 
-        for predicate in join_predicates:
-            left_field_id = predicate["LeftField"]["Field"]["@id"]
-            right_field_id = predicate["RightField"]["Field"]["@id"]
 
-            # Find the field nodes by their FileMaker IDs
-            left_field_node = Node.load_by_filemaker_id(str(left_field_id))
-            right_field_node = Node.load_by_filemaker_id(str(right_field_id))
-            
-            # Connect relationship to the fields used in this predicate
-            if left_field_node:
-                rel_node.add_child(left_field_node, EdgeType.USED_BY)
-            else:
-                print(f"[warn] Left field ID {left_field_id} not found for relationship")
-                
-            if right_field_node:
-                rel_node.add_child(right_field_node, EdgeType.USED_BY)
-            else:
-                print(f"[warn] Right field ID {right_field_id} not found for relationship")
-
-
-def parse_LayoutObjects(object_list, layout_node: Node):
-    for obj in object_list:
-        # Create a node for the object with FileMaker ID
-        output(obj)
-        exit()
-        obj_filemaker_id = obj.get("@id")
-        obj_node = Node(obj["@name"], NodeType.LAYOUT_OBJECT, obj, filemaker_id=obj_filemaker_id)
-        obj_node.save()
-        # Relate the object to the layout
-        layout_node.add_child(obj_node, EdgeType.PARENT)
-
-        # Check if this object has a field reference
-        field_obj = obj.get("FieldObj")
-        if field_obj and field_obj.get("Name"):
-            # Removes the table name to get the field name
-            field_name = field_obj.get("Name").split("::", 1)[1]
-
-            # Try to find the field by name (could be improved if we had field FileMaker IDs in the field reference)
-            field_nodes = Node.find(
-                where="type = ? AND name = ?",
-                params=(NodeType.FIELD.value, field_name),
-            )
-            
-            if field_nodes:
-                # Create a relationship between the layout object and the field
-                obj_node.add_child(field_nodes[0], EdgeType.USED_BY)
-
-
-
-def parse_LayoutCatalog(json_dict):
-    catalog = json_dict.get("LayoutCatalog", {})
-    layouts = as_list(catalog.get("Layout"))
-
-    for layout in layouts:
-        # Create layout node with FileMaker ID
-        layout_filemaker_id = layout.get("@id")
-        layout_node = Node(layout["@name"], NodeType.LAYOUT, layout, filemaker_id=layout_filemaker_id)
-        layout_node.save()
-
-        # Find the relationship graph table by FileMaker ID (much faster)
-        table_id = layout["Table"]["@id"]
-        table_node = Node.load_by_filemaker_id(str(table_id))
-        if not table_node:
-            print(f"[warn] Layout table id {table_id} not found for layout {layout.get('@name')}")
-            continue
+def parse_LayoutCatalog(records):
+    for _, layout in records:
+        parse_Layout(layout)
 
-        # Relate the layout to the table
-        table_node.add_child(layout_node, EdgeType.USED_BY)
 
-        # "Object" is a list but if theres only 1 thing in the list then theres no wrapping square brackets
-        # So this code turns it into a list if not already
-        object_list = layout.get("Object", [])
-        object_list = object_list if isinstance(object_list, list) else [object_list]
-        parse_LayoutObjects(object_list, layout_node)
+def parse_Layout(layout):
+    # Find the relationship graph table by FileMaker ID
+    table_id = (layout.get("Table") or {}).get("@id")
+    table_node = index.by_filemaker_id(NodeType.REL_TABLE, table_id)
+    if not table_node and importer.defer(parse_Layout, layout):
+        return
 
+    # Create layout node with FileMaker ID. Its objects become nodes of their own,
+    # so the layout's details leave them out.
+    details, objects = split_objects(layout)
+    layout_filemaker_id = layout.get("@id")
+    layout_node = Node(layout["@name"], NodeType.LAYOUT, details, filemaker_id=layout_filemaker_id)
+    importer.save(layout_node)
 
+    if not table_node:
+        print(f"[warn] Layout table id {table_id} not found for layout {layout.get('@name')}")
+        return
 
-        if layout["@name"] not in ["Startup Screen", "Contactss | Addresses | 5160"]:
-            output(layout)
-            break
-        else:
-            print(f"[info] Skipping layout {layout['@name']} as it is not a test case.")
+    # Relate the layout to the table
+    importer.link(table_node, layout_node, EdgeType.USED_BY)
+
+    parse_LayoutObjects(objects, layout_node, layout_node, layout_node.filemaker_id)
 
 parser_functions = {
     "BaseTableCatalog": parse_BaseTableCatalog,
@@ -221,18 +297,52 @@ parser_functions = {
 }
 
 
-for section in root[0]:
+def run_section(name, parse, records):
+    # One transaction per section; inserts are buffered and written in batches.
+    # The time includes reading the section's records from the report.
+    changes_before = importer.summary.copy()
+    with profiler.phase(name) as phase:
+        with database.bulk_insert() as writer:
+            parse(records)
+        phase.counts.update(nodes_written=writer.nodes_written, edges_written=writer.edges_written)
+        phase.counts.update(importer.summary - changes_before)
+    print(f"  {phase.seconds:.2f}s, {writer.nodes_written} nodes and {writer.edges_written} edges written")
+
 
-    if section.tag in parser_functions:
-        if use_backup and section.tag != "LayoutCatalog":
-            # When using backup, skip sections that are already in the db (except LayoutCatalog for testing)
-            print(f"Skipping {section.tag} since its already in the db")
+with profiler.cprofile(args.cprofile):
+    # Records stream out grouped by section, so each parser sees only its own section
+    stream = design_report.iter_records_parallel(XML_PATH, args.workers)
+    for section, records in itertools.groupby(stream, key=lambda r: r[0]):
+        records = ((path, record) for _, path, record in records)
+
+        if section in parser_functions:
+            print("Processing section:", section)
+            run_section(f"section:{section}", parser_functions[section], records)
         else:
-            # Process all sections when not using backup, or LayoutCatalog when using backup
-            print("Processing section:", section.tag)
-            # Convert the section element to a dictionary using xmltodict
-            section_dict = xmltodict.parse(ET.tostring(section, encoding='unicode'))
-            parser_functions[section.tag](section_dict)
-    else:
-        print(f"No parser function for {section.tag}!")
-        break
+            print(f"No parser function for {section}!")
+            break
+
+    # Records whose references were not imported yet when they were read
+    print("Processing deferred records")
+    run_section("deferred", lambda _: importer.run_deferred(), None)
+
+with profiler.phase("finish"):
+    summary = importer.finish()
+
+# Degrees, components and the unused-field style reports the web app shows
+with profiler.phase("analytics") as phase:
+    findings = analytics.refresh()
+    phase.counts.update(findings)
+
+report = profiler.report(
+    xml=XML_PATH, db=args.db, solution=args.solution, workers=args.workers, incremental=args.incremental,
+    index_lookups=dict(index.stats), changes=dict(summary),
+)
+report_path = args.report or os.path.splitext(args.db)[0] + ".import-report.json"
+with open(report_path, "w") as f:
+    json.dump(report, f, indent=2)
+
+print("Import index lookups:", dict(index.stats))
+print("Changes:", dict(summary))
+print("Analytics findings:", findings)
+print(f"Imported in {report['total_seconds']:.2f}s with {args.workers} worker(s); report in {report_path}")
@@ -0,0 +1,183 @@
+# Where an import spends its time: wall time and rows written per phase, calls and
+# time per database.py function, every SQL statement's round trips, and the query
+# plans of slow statements. Collected into one JSON-ready report.
+
+import cProfile
+import functools
+import inspect
+import re
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import database
+
+SLOW_QUERY_SECONDS = 0.05
+MAX_SLOW_QUERIES = 50
+MAX_STATEMENTS = 50
+
+# Functions that return context managers; timing them would only time their setup
+_NOT_TIMED = {"bulk_insert", "pooled_connection", "session", "use_database", "replacing_graph"}
+_PLANNABLE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+
+class Phase:
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.counts: Dict[str, int] = defaultdict(int)
+
+    def as_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"name": self.name, "seconds": round(self.seconds, 4)}
+        for key, value in self.counts.items():
+            result[key] = value
+            if self.seconds > 0:
+                result[f"{key}_per_second"] = round(value / self.seconds, 1)
+        return result
+
+class Profiler:
+    def __init__(self, slow_query_seconds: float = SLOW_QUERY_SECONDS):
+        self.slow_query_seconds = slow_query_seconds
+        self.started = time.perf_counter()
+        self.phases: List[Phase] = []
+        self.functions: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])   # name -> [calls, seconds]
+        self.statements: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])  # sql -> [round trips, seconds]
+        self.slow_queries: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._originals: Dict[Any, Dict[str, Callable[..., Any]]] = {}
+
+    # --- Phases ---
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Phase]:
+        # Callers add row counts to phase.counts; per-second rates are derived from them
+        phase = Phase(name)
+        start = time.perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.seconds = time.perf_counter() - start
+            self.phases.append(phase)
+
+    @contextmanager
+    def cprofile(self, path: Optional[str]) -> Iterator[None]:
+        # Dumps cProfile stats for the block to path (read them with pstats); no-op without one
+        if not path:
+            yield
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(path)
+
+    # --- Database instrumentation ---
+
+    def instrument_database(self) -> None:
+        # Times every public database.py function and BatchWriter.flush/commit, and
+        # makes connections opened from now on report each statement they run
+        database.close_connections()
+        database.CONNECTION_FACTORY = _profiled_connection(self)
+        self._wrap(database, [
+            name for name, fn in vars(database).items()
+            if inspect.isfunction(fn) and fn.__module__ == database.__name__
+            and not name.startswith("_") and name not in _NOT_TIMED
+        ], "")
+        self._wrap(database.BatchWriter, ["flush", "commit"], "BatchWriter.")
+
+    def uninstrument_database(self) -> None:
+        for owner, originals in self._originals.items():
+            for name, fn in originals.items():
+                setattr(owner, name, fn)
+        self._originals.clear()
+        database.close_connections()
+        database.CONNECTION_FACTORY = sqlite3.Connection
+
+    def _wrap(self, owner: Any, names: List[str], prefix: str) -> None:
+        originals = self._originals.setdefault(owner, {})
+        for name in names:
+            fn = originals.setdefault(name, getattr(owner, name))
+            setattr(owner, name, self._timed(prefix + name, fn))
+
+    def _timed(self, label: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._add(self.functions, label, time.perf_counter() - start)
+        return timed
+
+    def _add(self, table: Dict[str, List[float]], key: str, seconds: float) -> None:
+        with self._lock:
+            entry = table[key]
+            entry[0] += 1
+            entry[1] += seconds
+
+    def _statement(self, conn: sqlite3.Connection, sql: str, params: Any, seconds: float) -> None:
+        self._add(self.statements, sql, seconds)
+        if seconds < self.slow_query_seconds or len(self.slow_queries) >= MAX_SLOW_QUERIES:
+            return
+        slow: Dict[str, Any] = {"sql": sql, "seconds": round(seconds, 4)}
+        # executemany/executescript have no single parameter set to plan with
+        if params is not None and _PLANNABLE.match(sql):
+            try:
+                rows = sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, params)
+                slow["plan"] = [row[3] for row in rows]
+            except sqlite3.Error as e:
+                slow["plan_error"] = str(e)
+        with self._lock:
+            self.slow_queries.append(slow)
+
+    # --- Report ---
+
+    def report(self, **extra: Any) -> Dict[str, Any]:
+        def top(table: Dict[str, List[float]], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+            ordered = sorted(table.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+            return [{"name": name, "calls": calls, "seconds": round(seconds, 4)} for name, (calls, seconds) in ordered]
+
+        return {
+            **extra,
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "phases": [phase.as_dict() for phase in self.phases],
+            "database": {
+                "functions": top(self.functions),
+                "round_trips": sum(int(calls) for calls, _ in self.statements.values()),
+                "round_trip_seconds": round(sum(seconds for _, seconds in self.statements.values()), 4),
+                "statements": top(self.statements, MAX_STATEMENTS),
+                "slow_query_seconds": self.slow_query_seconds,
+                "slow_queries": self.slow_queries,
+            },
+        }
+
+def _profiled_connection(profiler: Profiler) -> type:
+    class ProfiledConnection(sqlite3.Connection):
+        # Reports every statement run through execute/executemany/executescript.
+        # Rows fetched after execute returns are not included in its time.
+        def execute(self, sql, parameters=()):
+            start = time.perf_counter()
+            try:
+                return super().execute(sql, parameters)
+            finally:
+                profiler._statement(self, sql, parameters, time.perf_counter() - start)
+
+        def executemany(self, sql, seq_of_parameters):
+            start = time.perf_counter()
+            try:
+                return super().executemany(sql, seq_of_parameters)
+            finally:
+                profiler._statement(self, sql, None, time.perf_counter() - start)
+
+        def executescript(self, sql_script):
+            start = time.perf_counter()
+            try:
+                return super().executescript(sql_script)
+            finally:
+                profiler._statement(self, sql_script, None, time.perf_counter() - start)
+
+    return ProfiledConnection
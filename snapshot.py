@@ -0,0 +1,229 @@
+# Read-only in-memory copy of the graph for the browser and analysis queries.
+# Nodes and edges are read once into flat arrays with CSR-style forward and reverse
+# adjacency; details stay in SQLite and are fetched by Node.details on first access.
+# Given a graph file (see graph_file.py) the arrays are instead views of the mapped
+# file, details included, and no database is needed.
+
+import bisect
+import os
+import threading
+from array import array
+from collections import deque
+from typing import List, Optional, Tuple
+
+from models import Node, NodeType, EdgeType
+from graph_file import GraphFile
+import database
+
+class _Adjacency:
+    # Neighbors of the node at index i are targets[offsets[i]:offsets[i + 1]]
+    __slots__ = ("offsets", "targets", "types", "edge_ids")
+
+    def __init__(self, node_count: int, edges: List[Tuple[int, int, int, int]]):
+        # edges: (source index, target index, edge type index, edge id), sorted by source
+        self.offsets = array("q", [0]) * (node_count + 1)
+        for source, _, _, _ in edges:
+            self.offsets[source + 1] += 1
+        for i in range(node_count):
+            self.offsets[i + 1] += self.offsets[i]
+        self.targets = array("q", (e[1] for e in edges))
+        self.types = array("B", (e[2] for e in edges))
+        self.edge_ids = array("q", (e[3] for e in edges))
+
+    @classmethod
+    def mapped(cls, graph: GraphFile, prefix: str) -> "_Adjacency":
+        # The adjacency a graph file stores, as views of the mapped file
+        adjacency = cls.__new__(cls)
+        adjacency.offsets = graph.array(f"{prefix}_offsets")
+        adjacency.targets = graph.array(f"{prefix}_targets")
+        adjacency.types = _codes(graph.array(f"{prefix}_types"), graph.edge_types(), _EDGE_TYPES)
+        adjacency.edge_ids = graph.array(f"{prefix}_edge_ids")
+        return adjacency
+
+class _State:
+    __slots__ = ("signature", "ids", "names", "types", "filemaker_ids", "details", "out", "into")
+
+def _codes(codes, names: List[str], known: list):
+    # A file's type codes as indexes into known, reusing the mapped codes when they agree
+    index = {t.value: i for i, t in enumerate(known)}
+    translated = [index.get(name, 0) for name in names]
+    if translated == list(range(len(names))):
+        return codes
+    return array("B", (translated[c] for c in codes))
+
+class GraphSnapshot:
+    def __init__(self, db_path: Optional[str] = None, graph_file: Optional[str] = None):
+        self.db_path = db_path or database.current_db_path()
+        self.graph_file = graph_file
+        self._lock = threading.Lock()
+        self._state: Optional[_State] = None
+        self.loads = 0
+
+    # --- Loading ---
+
+    def _signature(self) -> Tuple[int, ...]:
+        # Changes whenever a write lands in the database file or its WAL
+        signature = []
+        paths = (self.graph_file,) if self.graph_file else (self.db_path, self.db_path + "-wal")
+        for path in paths:
+            try:
+                st = os.stat(path)
+                signature += [st.st_mtime_ns, st.st_size]
+            except FileNotFoundError:
+                signature += [0, 0]
+        return tuple(signature)
+
+    def _current(self) -> _State:
+        signature = self._signature()
+        state = self._state
+        if state is None or state.signature != signature:
+            with self._lock:
+                state = self._state
+                if state is None or state.signature != signature:
+                    state = self._state = self._load(signature)
+        return state
+
+    def _load(self, signature: Tuple[int, ...]) -> _State:
+        if self.graph_file:
+            return self._load_file(signature)
+        type_index = {t.value: i for i, t in enumerate(_NODE_TYPES)}
+        edge_type_index = {t.value: i for i, t in enumerate(_EDGE_TYPES)}
+
+        state = _State()
+        state.signature = signature
+        state.ids = array("q")
+        state.types = array("B")
+        state.names = []
+        state.filemaker_ids = []
+        state.details = None
+        conn = database.open_connection(self.db_path)
+        try:
+            for r in conn.execute("SELECT id, name, type, filemaker_id FROM nodes ORDER BY id"):
+                state.ids.append(r[0])
+                state.names.append(r[1])
+                state.types.append(type_index.get(r[2], 0))
+                state.filemaker_ids.append(r[3])
+
+            index = {node_id: i for i, node_id in enumerate(state.ids)}
+            edges = [
+                (index[r[0]], index[r[1]], edge_type_index.get(r[2], 0), r[3])
+                for r in conn.execute("SELECT from_id, to_id, type, id FROM edges ORDER BY type")
+                if r[0] in index and r[1] in index
+            ]
+        finally:
+            conn.close()
+
+        # Neighbors by id, then edge type, as database.children_of orders them; the
+        # sorts are stable, so edges between the same nodes keep their type order
+        edges.sort(key=lambda e: (e[0], state.ids[e[1]]))
+        state.out = _Adjacency(len(state.ids), edges)
+        edges = [(e[1], e[0], e[2], e[3]) for e in edges]
+        edges.sort(key=lambda e: (e[0], state.ids[e[1]]))
+        state.into = _Adjacency(len(state.ids), edges)
+        self.loads += 1
+        return state
+
+    def _load_file(self, signature: Tuple[int, ...]) -> _State:
+        # Exports replace the file rather than rewrite it, so the mapping of the old
+        # one stays valid for as long as earlier states are in use
+        graph = GraphFile(self.graph_file)
+        state = _State()
+        state.signature = signature
+        state.ids = graph.array("id")
+        state.names = graph.column("name")
+        state.types = _codes(graph.array("type"), graph.node_types(), _NODE_TYPES)
+        state.filemaker_ids = graph.column("filemaker_id")
+        state.details = graph.column("details")
+        state.out = _Adjacency.mapped(graph, "out")
+        state.into = _Adjacency.mapped(graph, "in")
+        self.loads += 1
+        return state
+
+    # --- Queries ---
+
+    def _index(self, state: _State, node_id: int) -> Optional[int]:
+        i = bisect.bisect_left(state.ids, node_id)
+        if i < len(state.ids) and state.ids[i] == node_id:
+            return i
+        return None
+
+    def _node(self, state: _State, i: int) -> Node:
+        # Without a graph file details are not in the snapshot; Node fetches them
+        # lazily by id if read. From a file they are decoded on first access.
+        node = Node.__new__(Node)
+        node.id = state.ids[i]
+        node.name = state.names[i]
+        node.type = _NODE_TYPES[state.types[i]]
+        node.filemaker_id = state.filemaker_ids[i]
+        node.import_key = None
+        node._details = None
+        node._raw_details = None if state.details is None else state.details[i]
+        return node
+
+    def _neighbors(self, state: _State, adjacency: _Adjacency, i: int) -> List[Tuple[Node, EdgeType, int]]:
+        return [
+            (self._node(state, adjacency.targets[k]), _EDGE_TYPES[adjacency.types[k]], adjacency.edge_ids[k])
+            for k in range(adjacency.offsets[i], adjacency.offsets[i + 1])
+        ]
+
+    def load(self, node_id: int) -> Optional[Node]:
+        state = self._current()
+        i = self._index(state, node_id)
+        return None if i is None else self._node(state, i)
+
+    def get_children(self, node_id: int) -> List[Tuple[Node, EdgeType, int]]:
+        state = self._current()
+        i = self._index(state, node_id)
+        return [] if i is None else self._neighbors(state, state.out, i)
+
+    def get_parents(self, node_id: int) -> List[Tuple[Node, EdgeType, int]]:
+        state = self._current()
+        i = self._index(state, node_id)
+        return [] if i is None else self._neighbors(state, state.into, i)
+
+    def node_view(self, node_id: int) -> Tuple[Optional[Node], List[Tuple[Node, EdgeType, int]], List[Tuple[Node, EdgeType, int]]]:
+        # Node, parents and children from one consistent snapshot
+        state = self._current()
+        i = self._index(state, node_id)
+        if i is None:
+            return None, [], []
+        return self._node(state, i), self._neighbors(state, state.into, i), self._neighbors(state, state.out, i)
+
+    def traverse(self, start_id: int, direction: str = "out", edge_types: Optional[List[EdgeType]] = None,
+                 max_depth: int = 5, limit: int = -1, offset: int = 0,
+                 ) -> List[Tuple[Node, int, List[int], EdgeType]]:
+        # Same results and order as Node.traverse: each reachable node once at its
+        # shallowest depth, ordered by (depth, id), with the id path that reached it
+        state = self._current()
+        start = self._index(state, start_id)
+        if start is None:
+            return []
+        adjacencies = {"out": [state.out], "in": [state.into], "both": [state.out, state.into]}[direction]
+        allowed = {_EDGE_TYPES.index(t) for t in edge_types} if edge_types else None
+
+        # Breadth-first, so the first visit of a node is at its shallowest depth
+        reached = {start: (0, [start], None)}
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            depth, path, _ = reached[i]
+            if depth >= max_depth:
+                continue
+            for adjacency in adjacencies:
+                for k in range(adjacency.offsets[i], adjacency.offsets[i + 1]):
+                    j = adjacency.targets[k]
+                    if j in reached or (allowed is not None and adjacency.types[k] not in allowed):
+                        continue
+                    reached[j] = (depth + 1, path + [j], _EDGE_TYPES[adjacency.types[k]])
+                    queue.append(j)
+
+        del reached[start]
+        ordered = sorted(reached.items(), key=lambda item: (item[1][0], state.ids[item[0]]))
+        ordered = ordered[offset:] if limit < 0 else ordered[offset:offset + limit]
+        return [
+            (self._node(state, i), depth, [state.ids[p] for p in path], edge_type)
+            for i, (depth, path, edge_type) in ordered
+        ]
+
+_NODE_TYPES = list(NodeType)
+_EDGE_TYPES = list(EdgeType)
@@ -0,0 +1,79 @@
+# Many FileMaker files in one store. Each solution (file) has its own database under
+# database.SOLUTIONS_DIR, so imports of different solutions run side by side and a
+# query on one never reads another's rows. Tables shared between files go through
+# data sources (NodeType.DATA_SOURCE); the occurrences built on them are resolved
+# against the other solution's database here, since rows in one SQLite file cannot
+# reference rows in another.
+
+import json
+import re
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterator, List, Optional
+
+from models import Node, NodeType, EdgeType
+import database
+
+@contextmanager
+def _using(solution: Optional[str]) -> Iterator[None]:
+    # The named solution's database, or the thread's current one for None
+    with database.use_database(database.solution_path(solution)) if solution else nullcontext():
+        yield
+
+def data_source_file(details: Dict[str, Any]) -> Optional[str]:
+    # Solution a data source points at: the file of its first path ("file:Invoices",
+    # "fmnet:/host/Invoices.fmp12", ...), else its name
+    paths = details.get("UniversalPathList") or details.get("@path") or ""
+    if isinstance(paths, dict):
+        paths = paths.get("#text", "")
+    if isinstance(paths, list):
+        paths = "\n".join(p for p in paths if isinstance(p, str))
+    for path in str(paths).splitlines():
+        file_name = re.sub(r"^\w+:", "", path.strip()).rstrip("/").rsplit("/", 1)[-1]
+        if file_name:
+            return database.solution_name(file_name)
+    name = details.get("@name")
+    return database.solution_name(name) if name else None
+
+def external_occurrences(solution: Optional[str] = None) -> List[Dict[str, Any]]:
+    # Table occurrences of the solution whose tables live in other solutions, each
+    # with the base table it resolves to there (base_table_id None if unresolved)
+    with _using(solution):
+        sources = Node.find("type = ?", (NodeType.DATA_SOURCE.value,))
+        rows = database.children_of_many([s.id for s in sources], with_details=True)
+    sources_by_id = {s.id: s for s in sources}
+
+    occurrences = []
+    for r in rows:
+        if r["edge_type"] != EdgeType.PARENT.value or r["type"] != NodeType.REL_TABLE.value:
+            continue
+        source = sources_by_id[r["source_id"]]
+        occurrence = Node._from_row(r)
+        occurrences.append({
+            "occurrence_id": occurrence.id,
+            "occurrence": occurrence.name,
+            "data_source": source.name,
+            "solution": data_source_file(source.details),
+            "base_table": occurrence.details.get("@baseTable"),
+            "base_table_id": None,
+        })
+
+    # One lookup per referenced solution that has been imported
+    existing = set(database.list_solutions())
+    for target in {o["solution"] for o in occurrences if o["solution"] in existing}:
+        wanted = [o for o in occurrences if o["solution"] == target]
+        with _using(target):
+            by_name = {h.name: h.id for h in Node.find_headers(
+                "type = ? AND name IN (SELECT value FROM json_each(?))",
+                (NodeType.BASE_TABLE.value, json.dumps([o["base_table"] for o in wanted])),
+            )}
+        for o in wanted:
+            o["base_table_id"] = by_name.get(o["base_table"])
+    return occurrences
+
+def dependents(solution: str) -> List[Dict[str, Any]]:
+    # External occurrences in every other solution that use this solution's tables
+    return [
+        dict(o, from_solution=other)
+        for other in database.list_solutions() if other != solution
+        for o in external_occurrences(other) if o["solution"] == solution
+    ]
@@ -0,0 +1,68 @@
+import os
+import subprocess
+import sys
+
+import database
+
+PARSER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser-old.py")
+
+# Two base tables whose fields share ids (FileMaker numbers fields per table),
+# joined on Contacts::ID = Addresses::ContactID
+SHARED_FIELD_IDS = """<?xml version="1.0" encoding="UTF-8"?>
+<FMPReport link="Summary.html" type="Report" version="19">
+ <File name="Shared" path="x">
+  <BaseTableCatalog>
+   <BaseTable id="129" name="Contacts">
+    <FieldCatalog>
+     <Field id="1" dataType="Number" fieldType="Normal" name="ID"/>
+     <Field id="2" dataType="Text" fieldType="Normal" name="Name"/>
+    </FieldCatalog>
+   </BaseTable>
+   <BaseTable id="130" name="Addresses">
+    <FieldCatalog>
+     <Field id="1" dataType="Number" fieldType="Normal" name="ID"/>
+     <Field id="2" dataType="Number" fieldType="Normal" name="ContactID"/>
+    </FieldCatalog>
+   </BaseTable>
+  </BaseTableCatalog>
+  <RelationshipGraph>
+   <TableList>
+    <Table baseTable="Contacts" baseTableId="129" id="1065089" name="Contacts"/>
+    <Table baseTable="Addresses" baseTableId="130" id="1065090" name="Contacts_Addresses"/>
+   </TableList>
+   <RelationshipList>
+    <Relationship id="1">
+     <LeftTable name="Contacts"/>
+     <RightTable name="Contacts_Addresses"/>
+     <JoinPredicateList>
+      <JoinPredicate type="Equal">
+       <LeftField><Field id="1" name="ID" table="Contacts"/></LeftField>
+       <RightField><Field id="2" name="ContactID" table="Contacts_Addresses"/></RightField>
+      </JoinPredicate>
+     </JoinPredicateList>
+    </Relationship>
+   </RelationshipList>
+  </RelationshipGraph>
+  <LayoutCatalog/>
+ </File>
+</FMPReport>
+"""
+
+def test_join_predicates_resolve_fields_through_their_occurrence(tmp_path):
+    xml = os.path.join(tmp_path, "Shared.xml")
+    db_path = os.path.join(tmp_path, "graph.db")
+    with open(xml, "w", encoding="utf-8") as f:
+        f.write(SHARED_FIELD_IDS)
+    subprocess.run([sys.executable, PARSER, xml, "--db", db_path], check=True, cwd=tmp_path,
+                   stdout=subprocess.DEVNULL)
+
+    with database.use_database(db_path):
+        relationship = database.node_find("type = 'Relationship'", with_details=False)[0]
+        used = {
+            (database.parents_of(r["id"], with_details=False)[0]["name"], r["name"])
+            for r in database.children_of(relationship["id"], with_details=False)
+            if r["edge_type"] == "UsedBy"
+        }
+    database.close_connections()
+    # Not Contacts::Name, the first field with id 2
+    assert used == {("Contacts", "ID"), ("Addresses", "ContactID")}
@@ -0,0 +1,148 @@
+# The hot queries of database.py and of the app.py and api.py pages, run through
+# EXPLAIN QUERY PLAN on a generated database. A test fails when its query reads a
+# whole table or index instead of searching it. app.py itself needs Flask, so the
+# cases call the functions its routes call.
+
+import os
+import re
+import sqlite3
+from typing import Any, Callable, Dict, List, Set, Tuple
+
+import pytest
+
+import analytics
+import database
+import solutions
+from benchmarks import synthetic
+from models import Node, NodeType, EdgeType
+
+_PLANNABLE = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+_TABLE_REFS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_SCAN = re.compile(r"^SCAN (\w+)")
+
+# Statements run by the case being planned, as (sql, parameters)
+statements: List[Tuple[str, Any]] = []
+
+class RecordingConnection(sqlite3.Connection):
+    def execute(self, sql, parameters=()):
+        statements.append((sql, parameters))
+        return super().execute(sql, parameters)
+
+USED_BY = [EdgeType.USED_BY.value]
+
+# (name, call with the sample nodes, tables it may scan whole). Scans are allowed
+# only where the query is an aggregate over the whole table by design.
+CASES: List[Tuple[str, Callable[[Dict[str, Any]], Any], Set[str]]] = [
+    ("node_get_by_id", lambda s: database.node_get_by_id(s["field"]["id"]), set()),
+    ("node_get_by_filemaker_id", lambda s: database.node_get_by_filemaker_id(s["field"]["filemaker_id"]), set()),
+    ("node_get_details", lambda s: database.node_get_details(s["field"]["id"]), set()),
+    ("node_get_many", lambda s: database.node_get_many(s["ids"]), set()),
+    ("node_get_many_by_filemaker_id", lambda s: database.node_get_many_by_filemaker_id(
+        ["1", "2"], NodeType.FIELD.value), set()),
+    ("node_headers_by_type", lambda s: database.node_headers_by_type(NodeType.FIELD.value, s["ids"][0]), set()),
+    ("node_type_counts", lambda s: database.node_type_counts(), {"nodes"}),
+    ("node_find_by_attributes", lambda s: database.node_find_by_attributes(
+        NodeType.FIELD.value, {"field_type": "Calculated", "data_type": "Text"}), set()),
+    ("node_attributes", lambda s: database.node_attributes(s["field"]["id"]), set()),
+    ("node_attributes_many", lambda s: database.node_attributes_many(s["ids"]), set()),
+    ("edge_get_by_id", lambda s: database.edge_get_by_id(s["edge"]["id"]), set()),
+    ("edge_insert_existing", lambda s: database.edge_insert(
+        s["edge"]["type"], s["edge"]["from_id"], s["edge"]["to_id"]), set()),
+    ("edge_id", lambda s: database.edge_id(s["edge"]["type"], s["edge"]["from_id"], s["edge"]["to_id"]), set()),
+    ("children_of", lambda s: database.children_of(s["layout"]["id"]), set()),
+    ("parents_of", lambda s: database.parents_of(s["field"]["id"]), set()),
+    ("children_of_many", lambda s: Node.children_of_many(s["ids"]), set()),
+    ("parents_of_many", lambda s: Node.parents_of_many(s["ids"]), set()),
+    ("traverse_out", lambda s: database.traverse(s["layout"]["id"], "out", max_depth=3), set()),
+    ("traverse_in_used_by", lambda s: database.traverse(s["field"]["id"], "in", USED_BY, max_depth=3), set()),
+    ("traverse_both", lambda s: database.traverse(s["field"]["id"], "both", max_depth=2, limit=100), set()),
+    ("search", lambda s: database.search("Field 1*", NodeType.FIELD.value), set()),
+    ("graph_version", lambda s: database.graph_version(), set()),
+    ("analytics_is_stale", lambda s: analytics.is_stale(), set()),
+    ("analytics_report_counts", lambda s: analytics.report_counts(), {"analytics_findings"}),
+    ("analytics_findings", lambda s: analytics.findings("hotspots", limit=50), set()),
+    ("analytics_findings_by_type", lambda s: analytics.findings("unused_fields", NodeType.FIELD.value), set()),
+    ("analytics_component_sizes", lambda s: analytics.component_sizes(), {"node_component"}),
+    ("solutions_external_occurrences", lambda s: solutions.external_occurrences(), set()),
+]
+
+@pytest.fixture(scope="module")
+def sample(tmp_path_factory):
+    # A generated graph, and nodes of it for the cases to query
+    db_path = os.path.join(tmp_path_factory.mktemp("plans"), "graph.db")
+    database.init_db(reset=True, db_path=db_path)
+    with database.use_database(db_path):
+        with database.bulk_insert():
+            synthetic.load_graph(tables=20, fields_per_table=30, layouts=40, objects_per_layout=30)
+        analytics.refresh()
+        fields = database.node_headers_by_type(NodeType.FIELD.value, limit=20)
+        database.close_connections()
+        database.CONNECTION_FACTORY = RecordingConnection
+        try:
+            yield {
+                "field": database.node_get_by_id(fields[0]["id"]),
+                "layout": database.node_find("type = ?", (NodeType.LAYOUT.value,), with_details=False)[0],
+                "ids": [r["id"] for r in fields],
+                "edge": database.edge_find("type = ?", (EdgeType.USED_BY.value,))[0],
+            }
+        finally:
+            database.close_connections()
+            database.CONNECTION_FACTORY = sqlite3.Connection
+
+def full_scans(conn: sqlite3.Connection, sql: str, parameters: Any, allowed: Set[str]) -> List[str]:
+    # Plan lines scanning a table, or a whole index of one, that is not allowed
+    tables = {r[0] for r in sqlite3.Connection.execute(
+        conn, "SELECT name FROM sqlite_master WHERE type = 'table'")}
+    aliases = {}
+    for table, alias in _TABLE_REFS.findall(sql):
+        if table in tables:
+            aliases[table] = table
+            if alias and alias.upper() not in ("WHERE", "ON", "JOIN", "ORDER", "GROUP", "LIMIT", "USING"):
+                aliases[alias] = table
+    plan = [r[3] for r in sqlite3.Connection.execute(conn, "EXPLAIN QUERY PLAN " + sql, parameters)]
+    scans = []
+    for line in plan:
+        match = _SCAN.match(line)
+        if match and "VIRTUAL TABLE" not in line and aliases.get(match.group(1)) not in allowed | {None}:
+            scans.append(line)
+    return scans
+
+@pytest.mark.parametrize("name, call, allowed", CASES, ids=[case[0] for case in CASES])
+def test_hot_query_does_not_scan(sample, name, call, allowed):
+    statements.clear()
+    call(sample)
+    planned = [(sql, p) for sql, p in statements if _PLANNABLE.match(sql)]
+    assert planned, f"{name} ran no query"
+    with database.session() as conn:
+        problems = [f"{sql}\n  {'; '.join(scans)}" for sql, p in planned
+                    if (scans := full_scans(conn, sql, p, allowed))]
+    assert not problems, "full scans:\n" + "\n".join(problems)
+
+def test_migrations_bring_old_databases_to_the_current_schema(tmp_path):
+    # A database with the original schema and duplicate edges, as early imports left them
+    db_path = os.path.join(tmp_path, "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE nodes (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, type TEXT NOT NULL,
+                            filemaker_id TEXT, details TEXT NOT NULL DEFAULT '{}');
+        CREATE TABLE edges (id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL,
+                            from_id INTEGER NOT NULL, to_id INTEGER NOT NULL);
+        CREATE INDEX idx_edges_from ON edges(from_id);
+        CREATE INDEX idx_edges_to ON edges(to_id);
+        INSERT INTO nodes (name, type, details) VALUES ('Table', 'BaseTable', '{}'),
+            ('Notes', 'Field', '{"@dataType": "Text", "Comment": "free text"}');
+        INSERT INTO edges (type, from_id, to_id) VALUES ('Contains', 1, 2), ('Contains', 1, 2);
+    """)
+    conn.close()
+
+    database.init_db(db_path=db_path)
+    with database.use_database(db_path):
+        assert database.schema_version() == len(database.MIGRATIONS)
+        assert len(database.edge_find()) == 1
+        assert [r["name"] for r in database.search("free")] == ["Notes"]
+        assert [tuple(r) for r in database.node_attributes(2)] == [("data_type", "Text")]
+        assert analytics.refresh()["unused_fields"] == 1
+        # Applied migrations are not run again
+        database.init_db()
+        assert database.schema_version() == len(database.MIGRATIONS)
+    database.close_connections()
@@ -0,0 +1,90 @@
+import os
+
+import database
+from models import Node
+from snapshot import GraphSnapshot
+
+def layered_graph(db_path: str, layers: int, width: int) -> int:
+    # Every node of a layer linked to every node of the next, so the number of
+    # paths from the first node grows as width ** depth. Returns the first node's id.
+    database.init_db(reset=True, db_path=db_path)
+    with database.use_database(db_path), database.bulk_insert():
+        ids = [[database.node_insert(f"N{l}.{w}", "Field", {}) for w in range(width)] for l in range(layers)]
+        for upper, lower in zip(ids, ids[1:]):
+            for a in upper:
+                for b in lower:
+                    database.edge_insert("UsedBy", a, b)
+    return ids[0][0]
+
+def vm_steps(db_path: str, call) -> int:
+    # SQLite virtual machine instructions run by call, in thousands; unlike
+    # wall time this does not depend on the machine
+    steps = [0]
+    with database.use_database(db_path):
+        with database.session() as conn:
+            conn.set_progress_handler(lambda: steps.__setitem__(0, steps[0] + 1), 1000)
+            try:
+                call()
+            finally:
+                conn.set_progress_handler(None, 0)
+    return steps[0]
+
+def test_traverse_visits_each_node_once_at_its_shallowest_depth(tmp_path):
+    db_path = os.path.join(tmp_path, "graph.db")
+    start = layered_graph(db_path, layers=6, width=5)
+    with database.use_database(db_path):
+        rows = database.traverse(start, "both", max_depth=10)
+        assert len(rows) == 6 * 5 - 1
+        assert len({r["id"] for r in rows}) == len(rows)
+        by_name = {r["name"]: r["depth"] for r in rows}
+        # The first layer's other nodes are two steps away, through the second layer
+        assert by_name["N0.1"] == 2 and by_name["N1.0"] == 1 and by_name["N5.4"] == 5
+        assert [r["depth"] for r in rows] == sorted(r["depth"] for r in rows)
+        assert len(database.traverse(start, "both", max_depth=10, limit=7, offset=2)) == 7
+    database.close_connections()
+
+def test_traverse_work_grows_with_the_graph_not_the_paths(tmp_path):
+    # 8 ** 10 paths within depth 10 in the small graph; walking them would not finish
+    small = os.path.join(tmp_path, "small.db")
+    large = os.path.join(tmp_path, "large.db")
+    small_start = layered_graph(small, layers=12, width=8)
+    large_start = layered_graph(large, layers=12, width=16)
+    small_steps = vm_steps(small, lambda: database.traverse(small_start, "both", max_depth=10))
+    large_steps = vm_steps(large, lambda: database.traverse(large_start, "both", max_depth=10))
+    # Four times the edges may cost about four times the work, however many more paths
+    assert large_steps <= 6 * max(small_steps, 1)
+    # And deeper walks over the same graph cost little once every node is reached
+    deeper = vm_steps(small, lambda: database.traverse(small_start, "both", max_depth=20))
+    assert deeper <= 2 * max(small_steps, 1)
+    database.close_connections()
+
+def test_snapshot_and_sqlite_agree_on_mixed_edge_types(tmp_path):
+    # Nodes joined by several edge types, inserted out of type order so edge ids
+    # and types sort differently
+    db_path = os.path.join(tmp_path, "graph.db")
+    database.init_db(reset=True, db_path=db_path)
+    with database.use_database(db_path):
+        with database.bulk_insert():
+            ids = [database.node_insert(f"N{i}", "Field", {}) for i in range(6)]
+            for a, b, types in [(0, 1, ["UsedBy", "Parent", "Contains"]), (0, 2, ["Parent"]),
+                                (1, 2, ["UsedBy", "Contains"]), (3, 0, ["UsedBy", "Parent"]),
+                                (2, 4, ["Parent", "UsedBy"]), (4, 5, ["UsedBy"]), (5, 0, ["Contains"])]:
+                for type_value in types:
+                    database.edge_insert(type_value, ids[a], ids[b])
+        snapshot = GraphSnapshot(db_path)
+
+        def listed(neighbors):
+            return [(n.id, edge_type, edge_id) for n, edge_type, edge_id in neighbors]
+
+        def walked(results):
+            return [(n.id, depth, path, edge_type) for n, depth, path, edge_type in results]
+
+        children, parents = Node.children_of_many(ids), Node.parents_of_many(ids)
+        for node_id in ids:
+            assert listed(snapshot.get_children(node_id)) == listed(children[node_id])
+            assert listed(snapshot.get_parents(node_id)) == listed(parents[node_id])
+            for direction in ("out", "in", "both"):
+                for window in ({}, {"limit": 2, "offset": 1}):
+                    assert walked(snapshot.traverse(node_id, direction, max_depth=4, **window)) == \
+                        walked(Node.load(node_id).traverse(direction, None, 4, **window))
+    database.close_connections()